@@ -0,0 +1,6 @@
+"""Offline benchmarks of the data pipeline and TAP solve on synthetic, national-scale inputs.
+
+Benchmarks use pytest-benchmark and are kept out of the unit test run (they live in `bench_*.py` files).
+Run them with `pytest src/ireiat/benchmarks` and choose the input size with the `IREIAT_BENCHMARK_SIZE`
+environment variable (one of `small`, `medium` or `national`; default `small`). Compare against a saved
+run with pytest-benchmark's `--benchmark-autosave` / `--benchmark-compare` options."""
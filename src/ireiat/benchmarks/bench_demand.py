@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from ireiat.benchmarks import synthetic
+from ireiat.config.constants import SUM_TONS_TOLERANCE
+from ireiat.config.data_pipeline import FAF5_DEFAULT_TONS_FIELD
+from ireiat.data_pipeline.assets.demand.faf5_helpers import faf5_compute_county_tons_for_mode
+from ireiat.data_pipeline.assets.tap.tons import _filter_tons_dataframe, _generate_tons_dataframe
+
+ROUNDS = 3
+
+
+@pytest.fixture(scope="module")
+def county_tons(size):
+    return synthetic.county_tons(size)
+
+
+def test_faf5_compute_county_tons_for_mode(benchmark, size):
+    faf_demand, allocation_map = synthetic.faf_demand(size)
+    benchmark.pedantic(
+        faf5_compute_county_tons_for_mode,
+        args=(faf_demand, allocation_map, FAF5_DEFAULT_TONS_FIELD, SUM_TONS_TOLERANCE),
+        rounds=ROUNDS,
+    )
+
+
+def test_filter_tons_dataframe(benchmark, helper_context, county_tons):
+    benchmark.pedantic(
+        _filter_tons_dataframe,
+        args=(helper_context, county_tons),
+        kwargs={"quantile_threshold": 0.5},
+        rounds=ROUNDS,
+    )
+
+
+def test_generate_tons_dataframe(benchmark, size, helper_context, county_tons):
+    rng = np.random.default_rng(0)
+    county_to_node = {
+        k: int(v)
+        for k, v in zip(
+            synthetic.county_fips_to_centroid(size),
+            rng.integers(0, size.rows * size.cols, size.n_counties),
+        )
+    }
+    benchmark.pedantic(
+        _generate_tons_dataframe,
+        args=(helper_context, county_tons, county_to_node),
+        rounds=ROUNDS,
+    )
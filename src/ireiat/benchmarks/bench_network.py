@@ -0,0 +1,195 @@
+import copy
+
+import dagster
+import pytest
+
+from ireiat.benchmarks import synthetic
+from ireiat.config.data_pipeline import (
+    NetworkSnapConfig,
+    RailImpedanceConfig,
+    RailTerminalSkimConfig,
+    TAPRailConfig,
+    default_tap_highway_config,
+    default_tap_rail_config,
+)
+from ireiat.data_pipeline.assets.highway_network.highway_graph import (
+    strongly_connected_highway_graph,
+    undirected_highway_edges,
+)
+from ireiat.data_pipeline.assets.marine_network.marine_graph import (
+    strongly_connected_marine_graph,
+    undirected_marine_edges,
+)
+from ireiat.data_pipeline.assets.rail_network.rail_graph import (
+    impedance_rail_graph,
+    impedance_rail_graph_with_terminals,
+    impedance_rail_graph_with_terminals_reduced,
+    rail_terminal_skim,
+    strongly_connected_rail_graph,
+    undirected_rail_edges,
+)
+from ireiat.data_pipeline.assets.tap.county_connections import rail_county_association
+from ireiat.data_pipeline.assets.tap.network import (
+    tap_highway_network_dataframe,
+    tap_highway_network_dataframe_contracted,
+    tap_rail_network_dataframe,
+)
+from ireiat.util.graph import generate_ball_tree
+
+ROUNDS = 3
+
+
+@pytest.fixture(scope="module")
+def highway_graph(size):
+    return strongly_connected_highway_graph(
+        dagster.build_asset_context(), synthetic.highway_edges(size)
+    )
+
+
+@pytest.fixture(scope="module")
+def rail_graph(size):
+    return strongly_connected_rail_graph(dagster.build_asset_context(), synthetic.rail_edges(size))
+
+
+@pytest.fixture(scope="module")
+def rail_impedance_graph(rail_graph):
+    return impedance_rail_graph(dagster.build_asset_context(), rail_graph, RailImpedanceConfig())
+
+
+@pytest.fixture(scope="module")
+def rail_impedance_graph_with_terminals(size, rail_impedance_graph):
+    return impedance_rail_graph_with_terminals(
+        dagster.build_asset_context(),
+        synthetic.intermodal_terminals(size),
+        rail_impedance_graph.copy(),
+    )
+
+
+@pytest.fixture(scope="module")
+def rail_reduced_graph(rail_impedance_graph_with_terminals):
+    return impedance_rail_graph_with_terminals_reduced(
+        dagster.build_asset_context(), rail_impedance_graph_with_terminals
+    )
+
+
+def _run(benchmark, asset, *args, **kwargs):
+    """Benchmarks a directly invoked asset on deep copies of its inputs, since several assets modify
+    their inputs in place"""
+
+    def setup():
+        return (dagster.build_asset_context(), *copy.deepcopy(args)), kwargs
+
+    return benchmark.pedantic(asset, setup=setup, rounds=ROUNDS)
+
+
+def test_undirected_highway_edges(benchmark, size):
+    _run(
+        benchmark,
+        undirected_highway_edges,
+        synthetic.highway_links(size),
+        config=NetworkSnapConfig(),
+    )
+
+
+def test_strongly_connected_highway_graph(benchmark, size):
+    _run(benchmark, strongly_connected_highway_graph, synthetic.highway_edges(size))
+
+
+def test_highway_ball_tree(benchmark, highway_graph):
+    benchmark.pedantic(generate_ball_tree, args=(highway_graph,), rounds=ROUNDS)
+
+
+def test_tap_highway_network_dataframe(benchmark, highway_graph):
+    _run(
+        benchmark,
+        tap_highway_network_dataframe,
+        highway_graph,
+        config=default_tap_highway_config,
+    )
+
+
+def test_tap_highway_network_dataframe_contracted(benchmark, highway_graph):
+    tap_network = tap_highway_network_dataframe(
+        dagster.build_asset_context(), highway_graph, config=default_tap_highway_config
+    )
+    county_nodes = {(str(i), "000"): i for i in range(0, highway_graph.vcount(), 50)}
+    contracted = _run(
+        benchmark, tap_highway_network_dataframe_contracted, tap_network, county_nodes
+    )
+    benchmark.extra_info["edges"] = len(tap_network)
+    benchmark.extra_info["contracted_links"] = len(contracted)
+
+
+def test_undirected_rail_edges(benchmark, size):
+    _run(benchmark, undirected_rail_edges, synthetic.rail_links(size), config=NetworkSnapConfig())
+
+
+def test_strongly_connected_rail_graph(benchmark, size):
+    _run(benchmark, strongly_connected_rail_graph, synthetic.rail_edges(size))
+
+
+def test_impedance_rail_graph(benchmark, rail_graph):
+    _run(benchmark, impedance_rail_graph, rail_graph, config=RailImpedanceConfig())
+
+
+def test_impedance_rail_graph_with_terminals(benchmark, size, rail_impedance_graph):
+    _run(
+        benchmark,
+        impedance_rail_graph_with_terminals,
+        synthetic.intermodal_terminals(size),
+        rail_impedance_graph,
+    )
+
+
+def test_impedance_rail_graph_with_terminals_reduced(
+    benchmark, rail_impedance_graph_with_terminals
+):
+    _run(
+        benchmark,
+        impedance_rail_graph_with_terminals_reduced,
+        rail_impedance_graph_with_terminals,
+    )
+
+
+def test_rail_terminal_skim(benchmark, rail_impedance_graph_with_terminals):
+    _run(
+        benchmark,
+        rail_terminal_skim,
+        rail_impedance_graph_with_terminals,
+        config=RailTerminalSkimConfig(keep_path_edges=True),
+    )
+
+
+def test_rail_county_association(benchmark, size, rail_reduced_graph):
+    _run(
+        benchmark,
+        rail_county_association,
+        rail_reduced_graph,
+        synthetic.county_fips_to_centroid(size),
+        config=TAPRailConfig(),
+    )
+
+
+def test_tap_rail_network_dataframe(benchmark, size, rail_reduced_graph):
+    rail_graph_with_counties, _ = rail_county_association(
+        dagster.build_asset_context(),
+        rail_reduced_graph.copy(),
+        synthetic.county_fips_to_centroid(size),
+        config=TAPRailConfig(),
+    )
+    _run(
+        benchmark,
+        tap_rail_network_dataframe,
+        rail_graph_with_counties,
+        config=default_tap_rail_config,
+    )
+
+
+def test_undirected_marine_edges(benchmark, size):
+    _run(
+        benchmark, undirected_marine_edges, synthetic.marine_links(size), config=NetworkSnapConfig()
+    )
+
+
+def test_strongly_connected_marine_graph(benchmark, size):
+    _run(benchmark, strongly_connected_marine_graph, synthetic.marine_edges(size))
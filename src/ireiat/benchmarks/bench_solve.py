@@ -0,0 +1,76 @@
+import shutil
+import subprocess
+from importlib import resources
+
+import dagster
+import pytest
+
+from ireiat import r_source
+from ireiat.benchmarks import synthetic
+from ireiat.benchmarks.conftest import HelperContext
+from ireiat.config.data_pipeline import default_tap_highway_config
+from ireiat.data_pipeline.assets.highway_network.highway_graph import (
+    strongly_connected_highway_graph,
+)
+from ireiat.data_pipeline.assets.tap.county_connections import (
+    _generate_network_indices_from_ball_tree,
+)
+from ireiat.data_pipeline.assets.tap.network import tap_highway_network_dataframe
+from ireiat.data_pipeline.assets.tap.tons import _filter_tons_dataframe, _generate_tons_dataframe
+from ireiat.util.graph import generate_ball_tree
+
+
+@pytest.fixture(scope="module")
+def highway_tap_inputs(size, tmp_path_factory):
+    """Writes a synthetic highway TAP network and O-D tons to parquet files, as the pipeline would"""
+    context = dagster.build_asset_context()
+    graph = strongly_connected_highway_graph(context, synthetic.highway_edges(size))
+    network = tap_highway_network_dataframe(
+        dagster.build_asset_context(), graph, config=default_tap_highway_config
+    )
+
+    helper_context = HelperContext()
+    county_to_node = _generate_network_indices_from_ball_tree(
+        helper_context, synthetic.county_fips_to_centroid(size), generate_ball_tree(graph)
+    )
+    tons, _ = _generate_tons_dataframe(
+        helper_context,
+        _filter_tons_dataframe(helper_context, synthetic.county_tons(size)),
+        county_to_node,
+    )
+
+    path = tmp_path_factory.mktemp("tap")
+    network.to_parquet(path / "network.parquet", index=False)
+    tons.to_parquet(path / "tons.parquet", index=False)
+    return path
+
+
+@pytest.mark.skipif(shutil.which("Rscript") is None, reason="Rscript is not available")
+def test_solve_highway_tap_in_r(benchmark, highway_tap_inputs):
+    r_file = highway_tap_inputs / "tap.r"
+    r_file.write_text(resources.files(r_source).joinpath("tap.r").read_text())
+    cmd = [
+        "Rscript",
+        str(r_file),
+        str(highway_tap_inputs / "network.parquet"),
+        str(highway_tap_inputs / "tons.parquet"),
+        str(1e-4),
+        str(highway_tap_inputs / "traffic.parquet"),
+        str(5),
+    ]
+    benchmark.pedantic(subprocess.run, args=(cmd,), kwargs={"check": True}, rounds=1)
+
+
+def test_solve_highway_tap_in_python(benchmark, highway_tap_inputs):
+    from ireiat.solver.io import solve_files
+
+    benchmark.pedantic(
+        solve_files,
+        args=(
+            highway_tap_inputs / "network.parquet",
+            highway_tap_inputs / "tons.parquet",
+            highway_tap_inputs / "traffic_python.parquet",
+        ),
+        kwargs={"max_gap": 1e-4, "max_iterations": 5},
+        rounds=1,
+    )
@@ -0,0 +1,41 @@
+import logging
+import os
+
+import dagster
+import pytest
+
+from ireiat.benchmarks import synthetic
+from ireiat.benchmarks.synthetic import SyntheticSize
+
+BENCHMARK_SIZE_ENV_VAR = "IREIAT_BENCHMARK_SIZE"
+
+
+class HelperContext:
+    """Stands in for the asset execution context passed to asset helper functions, which only log and
+    publish metadata"""
+
+    log = logging.getLogger("ireiat.benchmarks")
+
+    def __init__(self):
+        self.metadata = {}
+
+    def add_output_metadata(self, metadata: dict):
+        self.metadata.update(metadata)
+
+
+@pytest.fixture(scope="session")
+def size() -> SyntheticSize:
+    size_name = os.environ.get(BENCHMARK_SIZE_ENV_VAR, "small")
+    if size_name not in synthetic.SIZES:
+        raise ValueError(f"{BENCHMARK_SIZE_ENV_VAR} must be one of {list(synthetic.SIZES)}")
+    return synthetic.SIZES[size_name]
+
+
+@pytest.fixture
+def asset_context() -> dagster.AssetExecutionContext:
+    return dagster.build_asset_context()
+
+
+@pytest.fixture
+def helper_context() -> HelperContext:
+    return HelperContext()
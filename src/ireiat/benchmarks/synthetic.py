@@ -0,0 +1,304 @@
+"""Synthetic networks and demand with the same schemas as the data pipeline's intermediate assets.
+
+Networks are jittered grids spanning the continental US: every grid point is a node and links join
+horizontal and vertical neighbours (a fraction of links is dropped to make the network irregular). Demand
+is drawn from lognormal distributions over synthetic counties. Everything is seeded and deterministic."""
+
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import geopandas
+import numpy as np
+import pandas as pd
+import shapely
+
+from ireiat.config.constants import (
+    ALBERS_CRS,
+    EXCLUDED_FIPS_CODES_MAP,
+    LATLONG_CRS,
+    METERS_PER_MILE,
+)
+from ireiat.config.data_pipeline import FAF5_DEFAULT_TONS_FIELD
+from ireiat.data_pipeline.assets.rail_network import SEPARATION_ATTRIBUTE_NAME
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary
+
+CONUS_BOUNDS = (-124.0, 25.0, -67.0, 49.0)  # min long, min lat, max long, max lat
+RAIL_OWNERS = ["BNSF", "UP", "CSXT", "NS", "CN", "CPKC", "FEC", "GWRR"]
+COORDINATE_COLUMNS = [
+    "origin_longitude",
+    "destination_longitude",
+    "origin_latitude",
+    "destination_latitude",
+]
+
+
+@dataclass(frozen=True)
+class SyntheticSize:
+    """Dimensions of a synthetic dataset. The highway and rail grids have roughly 2 * rows * cols links;
+    the marine grid is a coarser version of them."""
+
+    rows: int
+    cols: int
+    n_counties: int
+    n_county_pairs: int
+    n_faf_zones: int
+    n_terminals: int
+    n_rail_owners: int
+
+
+SIZES: Dict[str, SyntheticSize] = {
+    "small": SyntheticSize(
+        rows=40,
+        cols=60,
+        n_counties=100,
+        n_county_pairs=2_000,
+        n_faf_zones=10,
+        n_terminals=10,
+        n_rail_owners=3,
+    ),
+    "medium": SyntheticSize(
+        rows=120,
+        cols=180,
+        n_counties=1_000,
+        n_county_pairs=100_000,
+        n_faf_zones=60,
+        n_terminals=60,
+        n_rail_owners=5,
+    ),
+    "national": SyntheticSize(
+        rows=400,
+        cols=600,
+        n_counties=3_100,
+        n_county_pairs=2_000_000,
+        n_faf_zones=130,
+        n_terminals=200,
+        n_rail_owners=7,
+    ),
+}
+
+
+def _grid_links(
+    rows: int, cols: int, seed: int, drop_fraction: float = 0.1, multiline_fraction: float = 0.0
+) -> Tuple[geopandas.GeoDataFrame, np.ndarray, np.ndarray]:
+    """Returns a GeoDataFrame of links over a jittered `rows` x `cols` grid of nodes, along with the grid
+    (row, col) of each link's origin node. Each link has a jittered midpoint; `multiline_fraction` of the
+    links are MultiLineStrings split at that midpoint."""
+    rng = np.random.default_rng(seed)
+    min_long, min_lat, max_long, max_lat = CONUS_BOUNDS
+    cell_long, cell_lat = (max_long - min_long) / cols, (max_lat - min_lat) / rows
+    node_row, node_col = np.divmod(np.arange(rows * cols), cols)
+    node_long = min_long + (node_col + 0.5 + rng.uniform(-0.3, 0.3, rows * cols)) * cell_long
+    node_lat = min_lat + (node_row + 0.5 + rng.uniform(-0.3, 0.3, rows * cols)) * cell_lat
+
+    node_idx = np.arange(rows * cols).reshape(rows, cols)
+    origins = np.concatenate([node_idx[:, :-1].ravel(), node_idx[:-1, :].ravel()])
+    destinations = np.concatenate([node_idx[:, 1:].ravel(), node_idx[1:, :].ravel()])
+    kept = rng.random(len(origins)) >= drop_fraction
+    origins, destinations = origins[kept], destinations[kept]
+
+    n_links = len(origins)
+    midpoint_long = (node_long[origins] + node_long[destinations]) / 2
+    midpoint_lat = (node_lat[origins] + node_lat[destinations]) / 2
+    midpoint_long += rng.uniform(-0.1, 0.1, n_links) * cell_long
+    midpoint_lat += rng.uniform(-0.1, 0.1, n_links) * cell_lat
+    coords = np.stack(
+        [
+            np.stack([node_long[origins], node_lat[origins]], axis=1),
+            np.stack([midpoint_long, midpoint_lat], axis=1),
+            np.stack([node_long[destinations], node_lat[destinations]], axis=1),
+        ],
+        axis=1,
+    )  # (links, 3 points, 2)
+    geometry = shapely.linestrings(coords)
+
+    is_multiline = rng.random(n_links) < multiline_fraction
+    if is_multiline.any():
+        halves = np.stack(
+            [
+                shapely.linestrings(coords[is_multiline][:, :2]),
+                shapely.linestrings(coords[is_multiline][:, 1:]),
+            ],
+            axis=1,
+        )
+        geometry[is_multiline] = shapely.multilinestrings(
+            halves.ravel(), indices=np.repeat(np.arange(len(halves)), 2)
+        )
+
+    gdf = geopandas.GeoDataFrame(geometry=geometry, crs=LATLONG_CRS)
+    return gdf, node_row[origins], node_col[origins]
+
+
+def _length_miles(gdf: geopandas.GeoDataFrame) -> np.ndarray:
+    return (gdf.to_crs(ALBERS_CRS).geometry.length / METERS_PER_MILE).to_numpy()
+
+
+def _with_coordinates(gdf: geopandas.GeoDataFrame) -> pd.DataFrame:
+    """Appends the origin / destination coordinate columns (as produced by `get_coordinates_from_geoframe`)
+    to single-part links"""
+    first = shapely.get_coordinates(shapely.get_point(gdf.geometry.values, 0))
+    last = shapely.get_coordinates(shapely.get_point(gdf.geometry.values, -1))
+    coords = pd.DataFrame(
+        np.round(np.stack([first[:, 0], last[:, 0], first[:, 1], last[:, 1]], axis=1), 6),
+        columns=COORDINATE_COLUMNS,
+        index=gdf.index,
+    )
+    return pd.concat([gdf, coords], axis=1)
+
+
+def highway_links(
+    size: SyntheticSize, seed: int = 0, multiline_fraction: float = 0.02
+) -> geopandas.GeoDataFrame:
+    """Highway links as read from the FAF5 network (input to `undirected_highway_edges`)"""
+    rng = np.random.default_rng(seed + 1)
+    gdf, _, _ = _grid_links(size.rows, size.cols, seed, multiline_fraction=multiline_fraction)
+    n_links = len(gdf)
+    gdf.insert(0, "id", np.arange(1, n_links + 1))
+    gdf.insert(1, "dir", rng.choice([0, 1, -1], size=n_links, p=[0.9, 0.05, 0.05]))
+    gdf.insert(2, "length", _length_miles(gdf))
+    gdf.insert(3, "ab_finalsp", rng.choice([0.0, 35.0, 45.0, 55.0, 65.0, 70.0], size=n_links))
+    return gdf
+
+
+def highway_edges(size: SyntheticSize, seed: int = 0) -> pd.DataFrame:
+    """Highway edges with the schema of `undirected_highway_edges`"""
+    links = highway_links(size, seed, multiline_fraction=0.0)
+    return _with_coordinates(links[["dir", "length", "ab_finalsp", "geometry"]])
+
+
+def rail_links(size: SyntheticSize, seed: int = 0) -> geopandas.GeoDataFrame:
+    """Rail links with the schema of `filtered_and_processed_rail_network_links`. Owners hold contiguous
+    territories (bands of grid columns) and links along a territory boundary are jointly owned, as are
+    a small fraction of links with trackage rights for a neighbouring owner."""
+    rng = np.random.default_rng(seed + 2)
+    gdf, _, origin_col = _grid_links(size.rows, size.cols, seed + 2, drop_fraction=0.25)
+    owners = RAIL_OWNERS[: size.n_rail_owners]
+    territory = origin_col * len(owners) // size.cols
+    neighbour = np.minimum(territory + 1, len(owners) - 1)
+    is_shared = (rng.random(len(gdf)) < 0.05) | (
+        (origin_col + 1) * len(owners) // size.cols != territory
+    )
+    gdf.insert(0, "FRAARCID", np.arange(1, len(gdf) + 1))
+    gdf.insert(1, "MILES", _length_miles(gdf))
+    gdf.insert(2, "TRACKS", rng.choice([1, 1, 1, 2, 3], size=len(gdf)))
+    owner_sets = [
+        {owners[t], owners[n]} if shared else {owners[t]}
+        for t, n, shared in zip(territory, neighbour, is_shared)
+    ]
+    vocabulary = OwnerVocabulary.from_owners(o for owner_set in owner_sets for o in owner_set)
+    gdf.insert(
+        3,
+        SEPARATION_ATTRIBUTE_NAME,
+        [vocabulary.to_bytes(vocabulary.encode(owner_set)) for owner_set in owner_sets],
+    )
+    return vocabulary.attach(gdf)
+
+
+def rail_edges(size: SyntheticSize, seed: int = 0) -> pd.DataFrame:
+    """Rail edges with the schema of `undirected_rail_edges`"""
+    links = rail_links(size, seed)
+    edges = _with_coordinates(
+        links[["FRAARCID", SEPARATION_ATTRIBUTE_NAME, "MILES", "TRACKS", "geometry"]]
+    )
+    return OwnerVocabulary.from_frame(links).attach(edges)
+
+
+def intermodal_terminals(size: SyntheticSize, seed: int = 0) -> pd.DataFrame:
+    """Intermodal terminals (input to `impedance_rail_graph_with_terminals`) placed on rail nodes, served
+    by the owner(s) of an adjacent rail link"""
+    rng = np.random.default_rng(seed + 3)
+    links = rail_links(size, seed)
+    vocabulary = OwnerVocabulary.from_frame(links)
+    picked = rng.choice(len(links), size=size.n_terminals, replace=False)
+    origins = shapely.get_coordinates(shapely.get_point(links.geometry.values[picked], 0))
+    return pd.DataFrame(
+        {
+            "TERMINAL": [f"Terminal {i}" for i in range(size.n_terminals)],
+            "RAIL_CO": [
+                vocabulary.label(vocabulary.from_bytes(links[SEPARATION_ATTRIBUTE_NAME].iloc[i]))
+                for i in picked
+            ],
+            "LAT": np.round(origins[:, 1], 6),
+            "LON": np.round(origins[:, 0], 6),
+        }
+    )
+
+
+def marine_links(size: SyntheticSize, seed: int = 0) -> geopandas.GeoDataFrame:
+    """Marine links as read from the USACE network (input to `undirected_marine_edges`)"""
+    gdf, _, _ = _grid_links(max(size.rows // 4, 2), max(size.cols // 4, 2), seed, drop_fraction=0.3)
+    gdf.insert(0, "ID", np.arange(1, len(gdf) + 1))
+    return gdf
+
+
+def marine_edges(size: SyntheticSize, seed: int = 0) -> geopandas.GeoDataFrame:
+    """Marine edges with the schema of `undirected_marine_edges`"""
+    links = marine_links(size, seed)
+    coords = _with_coordinates(links)[COORDINATE_COLUMNS]
+    distance_miles = pd.Series(_length_miles(links), name="distance_miles", index=links.index)
+    return geopandas.GeoDataFrame(pd.concat([coords, distance_miles, links], axis=1))
+
+
+def _county_fips(size: SyntheticSize) -> list[Tuple[str, str]]:
+    """(STATE FIPS, COUNTY FIPS) tuples spread over the states of the continental US"""
+    excluded = set(EXCLUDED_FIPS_CODES_MAP.values())
+    states = [f"{s:02d}" for s in range(1, 57) if f"{s:02d}" not in excluded]
+    return [
+        (states[i % len(states)], f"{2 * (i // len(states)) + 1:03d}")
+        for i in range(size.n_counties)
+    ]
+
+
+def county_fips_to_centroid(
+    size: SyntheticSize, seed: int = 0
+) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(STATE FIPS, COUNTY FIPS) -> (latitude, longitude), as in `county_fips_to_centroid`"""
+    rng = np.random.default_rng(seed + 4)
+    min_long, min_lat, max_long, max_lat = CONUS_BOUNDS
+    lats = np.round(rng.uniform(min_lat, max_lat, size.n_counties), 6)
+    longs = np.round(rng.uniform(min_long, max_long, size.n_counties), 6)
+    return {k: (float(lat), float(long)) for k, lat, long in zip(_county_fips(size), lats, longs)}
+
+
+def county_tons(size: SyntheticSize, seed: int = 0) -> pd.DataFrame:
+    """County to county tons with the schema of `county_to_county_*_tons`"""
+    rng = np.random.default_rng(seed + 5)
+    fips = np.array(_county_fips(size))
+    n_pairs = min(size.n_county_pairs, size.n_counties * (size.n_counties - 1))
+    pair_idx = rng.choice(size.n_counties * size.n_counties, size=2 * n_pairs, replace=False)
+    orig, dest = np.divmod(pair_idx, size.n_counties)
+    not_self = orig != dest
+    orig, dest = orig[not_self][:n_pairs], dest[not_self][:n_pairs]
+    return pd.DataFrame(
+        {
+            "state_orig": fips[orig, 0],
+            "county_orig": fips[orig, 1],
+            "state_dest": fips[dest, 0],
+            "county_dest": fips[dest, 1],
+            "tons": rng.lognormal(mean=0, sigma=2, size=len(orig)),
+        }
+    ).sort_values("tons")
+
+
+def faf_demand(
+    size: SyntheticSize, seed: int = 0
+) -> Tuple[pd.DataFrame, Dict[str, Dict[Tuple[str, str], float]]]:
+    """FAF zone to zone demand (schema of `faf5_*_demand`) along with a FAF zone -> county -> % allocation
+    map (as in `faf_id_to_county_id_allocation_map`) that assigns each county to a single zone"""
+    rng = np.random.default_rng(seed + 6)
+    zones = [f"{z + 11}" for z in range(size.n_faf_zones)]
+    allocation: Dict[str, Dict[Tuple[str, str], float]] = {}
+    fips = _county_fips(size)
+    for z, zone in enumerate(zones):
+        zone_counties = fips[z :: size.n_faf_zones]
+        shares = rng.dirichlet(np.ones(len(zone_counties)))
+        allocation[zone] = dict(zip(zone_counties, shares))
+
+    orig, dest = np.meshgrid(np.arange(size.n_faf_zones), np.arange(size.n_faf_zones))
+    demand = pd.DataFrame(
+        {
+            "dms_orig": np.array(zones)[orig.ravel()],
+            "dms_dest": np.array(zones)[dest.ravel()],
+            FAF5_DEFAULT_TONS_FIELD: rng.lognormal(mean=2, sigma=1.5, size=orig.size),
+        }
+    )
+    return demand, allocation
@@ -15,6 +15,7 @@ ALBERS_CRS = "EPSG:5070"
 
 # FAF-related parameters
 SUM_TONS_TOLERANCE = 1e-5
+COMMODITY_FIELD = "sctg2"  # FAF commodity (SCTG 2-digit) code used to keep commodities separate
 
 #: Exclude some states, regions from the input data
 EXCLUDED_FIPS_CODES_MAP = {
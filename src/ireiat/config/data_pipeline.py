@@ -80,6 +80,16 @@ class FAF5MasterConfig(Config):
         default=FAF5_DEFAULT_TONS_FIELD,
         description="The field in FAF used to aggregate demand ( in tons)",
     )
+    horizon_demand_fields: list[str] = Field(
+        default_factory=list,
+        description="Further FAF demand fields (e.g. tons_2030, tons_2040) carried alongside the demand "
+        "field, so that the demand of every year of a horizon comes from a single pipeline pass",
+    )
+
+    @property
+    def demand_fields(self) -> list[str]:
+        """The demand field followed by the horizon demand fields"""
+        return list(dict.fromkeys([self.faf_demand_field, *self.horizon_demand_fields]))
 
 
 class FAF5FilterConfig(FAF5MasterConfig):
@@ -87,6 +97,10 @@ class FAF5FilterConfig(FAF5MasterConfig):
     https://www.bts.gov/sites/bts.dot.gov/files/2021-02/FAF5-User-Guide.pdf"""
 
     faf_commodities: list[FAFCommodity] = Field(default_factory=default_faf_commodity_factory)
+    by_commodity: bool = Field(
+        default=False,
+        description="Keep demand separate by SCTG2 commodity for multi-class assignment",
+    )
 
 
 class FAF5DemandConfig(FAF5MasterConfig):
@@ -150,6 +164,26 @@ class RailImpedanceConfig(Config):
     geographic_overrides: list[GeographicImpedance] = Field(default_factory=list)
 
 
+class RailTerminalSkimConfig(Config):
+    """Used to specify what the IM terminal to IM terminal rail skim keeps"""
+
+    keep_path_edges: bool = Field(
+        default=False,
+        description="Also keep the edges of every terminal to terminal path (in CSR form)",
+    )
+
+
+class NetworkSnapConfig(Config):
+    """Used to merge nearly coincident link endpoints into one node before building a network graph"""
+
+    snap_tolerance_meters: float = Field(
+        default=5.0,
+        description="Link endpoints closer than this distance (in meters) are merged into a single node. "
+        "0 only merges identical coordinates",
+        ge=0,
+    )
+
+
 class TAPFilterTonsConfig(Config):
     """Used to specify an optional quantile threshold to filter county|county tons for the mode"""
 
@@ -249,15 +283,19 @@ default_tap_rail_config = TAPRailConfig(
 def default_asset_mapping() -> dict:
     return {
         "faf_filtered_grouped_tons": {"config": FAF5FilterConfig()},
-        "faf5_truck_demand": {"config": FAF5DemandConfig(**{"unknown_mode_percent": 0.3})},
-        "faf5_rail_demand": {"config": FAF5DemandConfig(**{"unknown_mode_percent": 0.5})},
-        "faf5_water_demand": {"config": FAF5DemandConfig(**{"unknown_mode_percent": 0.2})},
+        "faf5_truck_demand": {"config": FAF5DemandConfig(unknown_mode_percent=0.3)},
+        "faf5_rail_demand": {"config": FAF5DemandConfig(unknown_mode_percent=0.5)},
+        "faf5_water_demand": {"config": FAF5DemandConfig(unknown_mode_percent=0.2)},
+        "undirected_highway_edges": {"config": NetworkSnapConfig()},
+        "undirected_rail_edges": {"config": NetworkSnapConfig()},
+        "undirected_marine_edges": {"config": NetworkSnapConfig()},
         "county_to_county_highway_tons": {
-            "config": FAF5CountyConfig(**{"county_to_county_ktons_threshold": 1})
+            "config": FAF5CountyConfig(county_to_county_ktons_threshold=1)
         },
         "county_to_county_rail_tons": {"config": FAF5MasterConfig()},
         "county_to_county_marine_tons": {"config": FAF5MasterConfig()},
         "impedance_rail_graph": {"config": RailImpedanceConfig()},
+        "rail_terminal_skim": {"config": RailTerminalSkimConfig()},
         "tap_highway_tons": {"config": TAPFilterTonsConfig(**{"quantile_threshold": None})},
         "tap_rail_tons": {"config": TAPFilterTonsConfig(**{"quantile_threshold": 0.8})},
         "tap_marine_tons": {"config": TAPFilterTonsConfig(**{"quantile_threshold": 0.6})},
@@ -11,6 +11,14 @@ raw_path = CACHE_PATH / RAW_PATH
 default_highway_traffic_output_path = CACHE_PATH / "highway_traffic.parquet"
 default_marine_traffic_output_path = CACHE_PATH / "marine_traffic.parquet"
 default_rail_traffic_output_path = CACHE_PATH / "rail_traffic.parquet"
+faf_allocation_map_path = intermediate_path / "faf_id_to_county_id_allocation_map"
+
+
+def contracted_network_file_path(network_file_path: Path) -> Path:
+    """Path of the contracted version (`tap_*_network_dataframe_contracted`) of a TAP network file"""
+    return network_file_path.with_name(
+        f"{network_file_path.stem}_contracted{network_file_path.suffix}"
+    )
 
 
 @dataclass
@@ -20,13 +28,18 @@ class RunConfig:
     default_network_file_path: Path = None
     default_od_file_path: Path = None
     default_output_file_path: Path = None
+    default_county_pairs_file_path: Path = None
 
     passed_network_file_path: Optional[Path] = None
     passed_od_file_path: Optional[Path] = None
     passed_output_file_path: Optional[Path] = None
+    passed_county_pairs_file_path: Optional[Path] = None
+    contracted: bool = False
 
     @property
     def network_file_path(self):
+        if self.passed_network_file_path is None and self.contracted:
+            return contracted_network_file_path(self.default_network_file_path)
         return self.passed_network_file_path or self.default_network_file_path
 
     @property
@@ -37,11 +50,16 @@ class RunConfig:
     def output_file_path(self):
         return self.passed_output_file_path or self.default_output_file_path
 
+    @property
+    def county_pairs_file_path(self):
+        return self.passed_county_pairs_file_path or self.default_county_pairs_file_path
+
 
 marine_config = partial(
     RunConfig,
     default_network_file_path=intermediate_path / "tap_marine_network_dataframe.parquet",
     default_od_file_path=intermediate_path / "tap_marine_tons.parquet",
+    default_county_pairs_file_path=intermediate_path / "tap_marine_tons_county_pairs.parquet",
     default_output_file_path=default_marine_traffic_output_path,
 )
 
@@ -49,6 +67,7 @@ highway_config = partial(
     RunConfig,
     default_network_file_path=intermediate_path / "tap_highway_network_dataframe.parquet",
     default_od_file_path=intermediate_path / "tap_highway_tons.parquet",
+    default_county_pairs_file_path=intermediate_path / "tap_highway_tons_county_pairs.parquet",
     default_output_file_path=default_highway_traffic_output_path,
 )
 
@@ -56,6 +75,7 @@ rail_config = partial(
     RunConfig,
     default_network_file_path=intermediate_path / "tap_rail_network_dataframe.parquet",
     default_od_file_path=intermediate_path / "tap_rail_tons.parquet",
+    default_county_pairs_file_path=intermediate_path / "tap_rail_tons_county_pairs.parquet",
     default_output_file_path=default_rail_traffic_output_path,
 )
 
@@ -69,10 +89,13 @@ class PostprocessConfig:
     default_traffic_path: Path = None
     default_network_graph_path: Path = None
     default_geo_file_path: Path = None
+    default_network_file_path: Path = None
 
     passed_traffic_path: Optional[Path] = None
     passed_network_graph_path: Optional[Path] = None
     passed_geo_file_path: Optional[Path] = None
+    passed_network_file_path: Optional[Path] = None
+    contracted: bool = False
 
     @property
     def traffic_file_path(self):
@@ -86,12 +109,19 @@ class PostprocessConfig:
     def shp_file_path(self):
         return self.passed_geo_file_path or self.default_geo_file_path
 
+    @property
+    def network_file_path(self):
+        if self.passed_network_file_path is None and self.contracted:
+            return contracted_network_file_path(self.default_network_file_path)
+        return self.passed_network_file_path or self.default_network_file_path
+
 
 highway_postprocess_config = partial(
     PostprocessConfig,
     default_traffic_path=default_highway_traffic_output_path,
     default_network_graph_path=intermediate_path / "strongly_connected_highway_graph",
     default_geo_file_path=intermediate_path / "undirected_highway_edges.parquet",
+    default_network_file_path=intermediate_path / "tap_highway_network_dataframe.parquet",
 )
 
 marine_postprocess_config = partial(
@@ -99,6 +129,7 @@ marine_postprocess_config = partial(
     default_traffic_path=default_marine_traffic_output_path,
     default_network_graph_path=intermediate_path / "strongly_connected_marine_graph",
     default_geo_file_path=intermediate_path / "undirected_marine_edges.parquet",
+    default_network_file_path=intermediate_path / "tap_marine_network_dataframe.parquet",
 )
 
 rail_postprocess_config = partial(
@@ -106,6 +137,7 @@ rail_postprocess_config = partial(
     default_traffic_path=default_rail_traffic_output_path,
     default_network_graph_path=intermediate_path / "rail_graph_with_county_connections",
     default_geo_file_path=intermediate_path / "undirected_rail_edges.parquet",
+    default_network_file_path=intermediate_path / "tap_rail_network_dataframe.parquet",
 )
 
 postprocess_config_map = {
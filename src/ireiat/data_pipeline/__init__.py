@@ -2,7 +2,11 @@ import dagster
 
 from ireiat.config.constants import CACHE_PATH, INTERMEDIATE_PATH
 from .assets import demand, highway_network, tap, rail_network, marine_network
-from .io_manager import TabularDataLocalIOManager
+from .io_manager import TabularDataLocalIOManager, TerminalSkimIOManager
+from .prefetch import raw_sources_prefetch
+
+# source downloads
+fetch_job = dagster.define_asset_job(name="fetch_job", selection=[raw_sources_prefetch])
 
 # demand
 demand_assets = dagster.load_assets_from_package_module(demand, group_name="demand")
@@ -38,6 +42,7 @@ tap_assets_job = dagster.define_asset_job(name="tap_job", selection=tap_assets)
 
 # all assets
 all_assets = [
+    raw_sources_prefetch,
     *demand_assets,
     *highway_network_assets,
     *rail_network_assets,
@@ -50,6 +55,7 @@ intermediate_path = str(CACHE_PATH / INTERMEDIATE_PATH)
 defs = dagster.Definitions(
     assets=all_assets,
     jobs=[
+        fetch_job,
         demand_assets_job,
         highway_network_assets_job,
         rail_network_assets_job,
@@ -63,5 +69,6 @@ defs = dagster.Definitions(
             base_dir=intermediate_path
         ),
         "custom_io_manager": TabularDataLocalIOManager(),
+        "skim_io_manager": TerminalSkimIOManager(),
     },
 )
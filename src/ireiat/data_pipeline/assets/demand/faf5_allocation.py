@@ -5,12 +5,14 @@ import dagster
 import pandas as pd
 
 from ireiat.config.constants import SUM_TONS_TOLERANCE
+from ireiat.data_pipeline.instrumentation import instrumented
 
 
 @dagster.asset(
     io_manager_key="default_io_manager_intermediate_path",
     description="(State FIPS, County FIPS) -> Metric",
 )
+@instrumented
 def actual_state_county_to_metric_map(
     us_census_county_population_src: pd.DataFrame,
 ) -> Dict[Tuple[str, str], int]:
@@ -28,6 +30,7 @@ def actual_state_county_to_metric_map(
     io_manager_key="default_io_manager_intermediate_path",
     description="FAF -> (State FIPS, County FIPS) -> % allocation",
 )
+@instrumented
 def faf_id_to_county_id_allocation_map(
     faf_id_to_county_areas: Dict[str, Dict[Tuple[str, str], float]],
     actual_state_county_to_metric_map: Dict[Tuple[str, str], int],
@@ -1,55 +1,134 @@
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+
+from ireiat.config.constants import COMMODITY_FIELD
+
+COUNTY_FIELDS = ["state", "county"]
+
+
+def _allocation_table(
+    faf_id_to_county_id_allocation_map: Dict[str, Dict[Tuple[str, str], float]],
+) -> Tuple[pd.Index, pd.DataFrame, np.ndarray]:
+    """The FAF zone -> county allocation as a sparse (CSR) matrix: the FAF zones, the (state, county) and
+    share of each allocation, grouped by zone, and the offsets of each zone's allocations"""
+    zones = pd.Index(list(faf_id_to_county_id_allocation_map.keys()))
+    counties = [
+        (state, county, share)
+        for zone in zones
+        for (state, county), share in faf_id_to_county_id_allocation_map[zone].items()
+    ]
+    allocations = pd.DataFrame(counties, columns=[*COUNTY_FIELDS, "share"])
+    n_counties = [len(faf_id_to_county_id_allocation_map[zone]) for zone in zones]
+    return zones, allocations, np.concatenate([[0], np.cumsum(n_counties)]).astype(np.int64)
 
 
 def faf5_compute_county_tons_for_mode(
     faf_demand_pdf: pd.DataFrame,
     faf_id_to_county_id_allocation_map: Dict[str, Dict[Tuple[str, str], float]],
-    FAF_TONS_TARGET_FIELD: str,
+    FAF_TONS_TARGET_FIELD: str | List[str],
     SUM_TONS_TOLERANCE: float,
     tons_cutoff: float = 0,
 ) -> pd.DataFrame:
     """
     Compute county-to-county tons for a specific mode, distributing based on FAF zone to county allocation percentages.
 
+    Each FAF zone pair is expanded into the pairs of its counties at once, and every demand field is
+    allocated with the same expansion, so a multi-year horizon costs little more than a single year.
+
     Args:
         faf_demand_pdf (pd.DataFrame): DataFrame containing demand data for a specific mode (truck, rail, water).
         faf_id_to_county_id_allocation_map (dict): Mapping from FAF zones to county allocation percentages.
-        FAF_TONS_TARGET_FIELD (str): The column in the DataFrame that holds the tons of demand.
+        FAF_TONS_TARGET_FIELD (str | list): The column(s) in the DataFrame that hold the tons of demand. The
+            first is returned as `tons`, any others (e.g. later years) under their own names.
         SUM_TONS_TOLERANCE (float): Tolerance for checking the sum of tons.
-        tons_cutoff (float): Minimum number of ktons in a county->county transition to be included
+        tons_cutoff (float): Minimum number of ktons in a county->county transition to be included (in any
+            of the demand fields, summed over commodities)
 
     Returns:
-        pd.DataFrame: DataFrame with non-zero tons, aggregated at the county-to-county level.
+        pd.DataFrame: DataFrame with non-zero tons, aggregated at the county-to-county level (and by
+        commodity, if the demand carries a commodity column).
     """
-    county_od: Dict[Tuple[str, str, str, str], float] = defaultdict(float)
-    for row in faf_demand_pdf.itertuples():
-        constituent_orig_counties_map = faf_id_to_county_id_allocation_map[row.dms_orig]
-        constituent_dest_counties_map = faf_id_to_county_id_allocation_map[row.dms_dest]
-        for (state_orig, county_orig), pct_in_county_orig in constituent_orig_counties_map.items():
-            for (
-                state_dest,
-                county_dest,
-            ), pct_in_county_dest in constituent_dest_counties_map.items():
-                tons = getattr(row, FAF_TONS_TARGET_FIELD) * pct_in_county_orig * pct_in_county_dest
-                county_od[(state_orig, county_orig, state_dest, county_dest)] += tons
+    demand_fields = (
+        [FAF_TONS_TARGET_FIELD] if isinstance(FAF_TONS_TARGET_FIELD, str) else FAF_TONS_TARGET_FIELD
+    )
+    by_commodity = COMMODITY_FIELD in faf_demand_pdf.columns
+    zones, allocations, zone_offsets = _allocation_table(faf_id_to_county_id_allocation_map)
 
-    # Verify that the total tons sum within tolerance
-    assert (
-        abs(faf_demand_pdf[FAF_TONS_TARGET_FIELD].sum() - sum(county_od.values()))
-        < SUM_TONS_TOLERANCE
-    ), "Tons mismatch for mode."
+    # expand each FAF zone pair into (origin county, destination county) pairs
+    orig_zone = zones.get_indexer(faf_demand_pdf["dms_orig"])
+    dest_zone = zones.get_indexer(faf_demand_pdf["dms_dest"])
+    if (orig_zone < 0).any() or (dest_zone < 0).any():
+        raise KeyError("FAF demand has zones without a county allocation")
+    n_orig, n_dest = np.diff(zone_offsets)[orig_zone], np.diff(zone_offsets)[dest_zone]
+    n_pairs = n_orig * n_dest
+    row = np.repeat(np.arange(len(faf_demand_pdf)), n_pairs)
+    pair_in_row = np.arange(len(row)) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    orig_allocation = zone_offsets[orig_zone][row] + pair_in_row // n_dest[row]
+    dest_allocation = zone_offsets[dest_zone][row] + pair_in_row % n_dest[row]
+    shares = allocations["share"].to_numpy()
+    pair_shares = shares[orig_allocation] * shares[dest_allocation]
 
-    # Create a dataframe from the county_od dictionary
-    county_od_pdf = pd.DataFrame(
-        [(*k, v) for k, v in county_od.items()],
-        columns=["state_orig", "county_orig", "state_dest", "county_dest", "tons"],
+    # sum the tons of each county pair (and commodity), as a county may be allocated from several zones
+    county_idx, counties = pd.MultiIndex.from_frame(allocations[COUNTY_FIELDS]).factorize()
+    keys = (
+        county_idx[orig_allocation].astype(np.int64) * len(counties) + county_idx[dest_allocation]
     )
+    if by_commodity:
+        commodity_idx, commodities = pd.factorize(faf_demand_pdf[COMMODITY_FIELD], sort=True)
+        keys = keys * len(commodities) + commodity_idx[row]
+    unique_keys, key_idx = np.unique(keys, return_inverse=True)
+    tons_columns = ["tons", *demand_fields[1:]]
+    tons = {
+        tons_column: np.bincount(
+            key_idx,
+            weights=faf_demand_pdf[demand_field].to_numpy(dtype=np.float64)[row] * pair_shares,
+            minlength=len(unique_keys),
+        )
+        for demand_field, tons_column in zip(demand_fields, tons_columns)
+    }
 
-    # Filter out rows with zero tons and sort
-    non_zero_county_od_pdf = county_od_pdf.loc[county_od_pdf["tons"] > tons_cutoff].sort_values(
-        "tons"
+    # FIPS (and commodities) are dictionary encoded (as categoricals, stored as dictionary columns in
+    # parquet), origin and destination columns sharing their categories so they compare with each other
+    if by_commodity:
+        unique_keys, commodity_key = np.divmod(unique_keys, len(commodities))
+    orig_county, dest_county = np.divmod(unique_keys, len(counties))
+    state_categories, state_codes = np.unique(counties.get_level_values(0), return_inverse=True)
+    county_categories, county_codes = np.unique(counties.get_level_values(1), return_inverse=True)
+    state_dtype = pd.CategoricalDtype(state_categories)
+    county_dtype = pd.CategoricalDtype(county_categories)
+    county_od_pdf = pd.DataFrame(
+        {
+            "state_orig": pd.Categorical.from_codes(state_codes[orig_county], dtype=state_dtype),
+            "county_orig": pd.Categorical.from_codes(county_codes[orig_county], dtype=county_dtype),
+            "state_dest": pd.Categorical.from_codes(state_codes[dest_county], dtype=state_dtype),
+            "county_dest": pd.Categorical.from_codes(county_codes[dest_county], dtype=county_dtype),
+            **(
+                {COMMODITY_FIELD: pd.Categorical.from_codes(commodity_key, categories=commodities)}
+                if by_commodity
+                else {}
+            ),
+            **tons,
+        }
     )
 
+    # Verify that the total tons sum within tolerance
+    for demand_field, tons_column in zip(demand_fields, tons_columns):
+        assert (
+            abs(faf_demand_pdf[demand_field].sum() - county_od_pdf[tons_column].sum())
+            < SUM_TONS_TOLERANCE
+        ), "Tons mismatch for mode."
+
+    # Filter out rows with zero tons and sort. The cutoff applies to the total tons of each county pair, so
+    # that the commodities of a retained pair are all kept and add up to the demand without commodities
+    row_tons = county_od_pdf[tons_columns].to_numpy()
+    pair_tons = row_tons
+    if by_commodity:
+        _, pair_idx = np.unique(unique_keys, return_inverse=True)
+        pair_tons = np.stack(
+            [np.bincount(pair_idx, weights=column)[pair_idx] for column in row_tons.T], axis=1
+        )
+    is_kept = (pair_tons > tons_cutoff).any(axis=1) & (row_tons > 0).any(axis=1)
+    non_zero_county_od_pdf = county_od_pdf.loc[is_kept].sort_values("tons")
+
     return non_zero_county_od_pdf
@@ -6,8 +6,11 @@ import dagster
 import geopandas
 import numpy as np
 
+from ireiat.data_pipeline.instrumentation import instrumented
+
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def faf_id_to_county_areas(
     context: dagster.AssetExecutionContext,
     faf5_regions_src: geopandas.GeoDataFrame,
@@ -1,4 +1,4 @@
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import dagster
 import pandas as pd
@@ -6,6 +6,7 @@ import pandas as pd
 from ireiat.config.constants import (
     SUM_TONS_TOLERANCE,
     INTERMEDIATE_DIRECTORY_ARGS,
+    COMMODITY_FIELD,
 )
 from ireiat.config.data_pipeline import (
     FAF5FilterConfig,
@@ -17,6 +18,7 @@ from ireiat.data_pipeline.assets.demand.faf5_helpers import (
     faf5_compute_county_tons_for_mode,
 )
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
 
 
 @dagster.asset(
@@ -29,13 +31,16 @@ from ireiat.data_pipeline.metadata import publish_metadata
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def faf_filtered_grouped_tons(
     context: dagster.AssetExecutionContext,
     faf5_demand_src: pd.DataFrame,
     config: FAF5FilterConfig,
 ) -> pd.DataFrame:
     """Filters FAF by containerizable SCTG2 codes and relevant modes, multiplies by containerizable
-    demand in each record, and groups by origin/destination/mode."""
+    demand in each record, and groups by origin/destination/mode (and commodity, if `by_commodity`).
+    Every demand field (the demand field and any horizon demand fields) is carried.
+    """
     # limit to "containerizable" tons on relevant modes
     containerizable_codes = [x.sctg2 for x in config.faf_commodities if x.containerizable]
     context.log.info(f"Using {len(containerizable_codes)} containerizable codes")
@@ -56,15 +61,17 @@ def faf_filtered_grouped_tons(
             f"SCTG2 code {not_included_code} not included, assuming all is intermodal!"
         )
     intermodal_tons_percentages = filtered_faf_pdf["sctg2"].map(intermodal_percentage_map)
-    filtered_faf_pdf[config.faf_demand_field] = (
-        filtered_faf_pdf[config.faf_demand_field] * intermodal_tons_percentages
+    demand_fields = config.demand_fields
+    filtered_faf_pdf[demand_fields] = filtered_faf_pdf[demand_fields].mul(
+        intermodal_tons_percentages, axis=0
     )
 
-    grouped_faf_pdf = filtered_faf_pdf.groupby(
-        ["dms_orig", "dms_dest", "dms_mode"], as_index=False
-    )[[config.faf_demand_field]].sum()
+    group_fields = ["dms_orig", "dms_dest", "dms_mode"]
+    if config.by_commodity:
+        group_fields.append(COMMODITY_FIELD)
+    grouped_faf_pdf = filtered_faf_pdf.groupby(group_fields, as_index=False)[demand_fields].sum()
 
-    min_tons_threshold_filter = grouped_faf_pdf[config.faf_demand_field] > 0
+    min_tons_threshold_filter = (grouped_faf_pdf[demand_fields] > 0).any(axis=1)
     non_zero_grouped_faf_pdf = grouped_faf_pdf.loc[min_tons_threshold_filter]
 
     publish_metadata(context, non_zero_grouped_faf_pdf)
@@ -76,13 +83,16 @@ def _allocate_unknown_modes(
     entire_df: pd.DataFrame,
     specific_mode: int,
     percentage_unknown_to_specific: float,
-    demand_field: str,
+    demand_fields: List[str],
 ) -> pd.DataFrame:
     known_mode = entire_df.loc[entire_df["dms_mode"] == specific_mode]
-    unknown_mode = entire_df.loc[entire_df["dms_mode"] == FAFMode.MULTIPLE_AND_MAIL.value]
-    unknown_mode[demand_field] = unknown_mode[demand_field] * percentage_unknown_to_specific
+    unknown_mode = entire_df.loc[entire_df["dms_mode"] == FAFMode.MULTIPLE_AND_MAIL.value].copy()
+    unknown_mode[demand_fields] = unknown_mode[demand_fields] * percentage_unknown_to_specific
     concat_pdf = pd.concat([known_mode, unknown_mode], axis=0)
-    mode_pdf = concat_pdf.groupby(["dms_orig", "dms_dest"], as_index=False)[demand_field].sum()
+    group_fields = ["dms_orig", "dms_dest"]
+    if COMMODITY_FIELD in entire_df.columns:
+        group_fields.append(COMMODITY_FIELD)
+    mode_pdf = concat_pdf.groupby(group_fields, as_index=False)[demand_fields].sum()
     publish_metadata(context, mode_pdf)
     return mode_pdf
 
@@ -97,6 +107,7 @@ def _allocate_unknown_modes(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def faf5_truck_demand(
     context: dagster.AssetExecutionContext,
     faf_filtered_grouped_tons: pd.DataFrame,
@@ -109,7 +120,7 @@ def faf5_truck_demand(
         faf_filtered_grouped_tons,
         FAFMode.TRUCK.value,
         config.unknown_mode_percent,
-        config.faf_demand_field,
+        config.demand_fields,
     )
 
 
@@ -123,6 +134,7 @@ def faf5_truck_demand(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def faf5_rail_demand(
     context: dagster.AssetExecutionContext,
     faf_filtered_grouped_tons: pd.DataFrame,
@@ -135,7 +147,7 @@ def faf5_rail_demand(
         faf_filtered_grouped_tons,
         FAFMode.RAIL.value,
         config.unknown_mode_percent,
-        config.faf_demand_field,
+        config.demand_fields,
     )
 
 
@@ -149,6 +161,7 @@ def faf5_rail_demand(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def faf5_water_demand(
     context: dagster.AssetExecutionContext,
     faf_filtered_grouped_tons: pd.DataFrame,
@@ -161,7 +174,7 @@ def faf5_water_demand(
         faf_filtered_grouped_tons,
         FAFMode.WATER.value,
         config.unknown_mode_percent,
-        config.faf_demand_field,
+        config.demand_fields,
     )
 
 
@@ -175,6 +188,7 @@ def faf5_water_demand(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def county_to_county_highway_tons(
     context: dagster.AssetExecutionContext,
     faf5_truck_demand: pd.DataFrame,
@@ -182,11 +196,12 @@ def county_to_county_highway_tons(
     config: FAF5CountyConfig,
 ) -> pd.DataFrame:
     """Calculate (State FIPS origin, County FIPS origin), (State FIPS destination, County FIPS destination), tons
-    for given mode based on county allocation percentages."""
+    for given mode based on county allocation percentages. Horizon demand fields are carried as further
+    columns named after the FAF field."""
     non_zero_county_od_pdf = faf5_compute_county_tons_for_mode(
         faf5_truck_demand,
         faf_id_to_county_id_allocation_map,
-        config.faf_demand_field,
+        config.demand_fields,
         SUM_TONS_TOLERANCE,
         config.county_to_county_ktons_threshold,
     )
@@ -204,6 +219,7 @@ def county_to_county_highway_tons(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def county_to_county_rail_tons(
     context: dagster.AssetExecutionContext,
     faf5_rail_demand: pd.DataFrame,
@@ -211,11 +227,12 @@ def county_to_county_rail_tons(
     config: FAF5CountyConfig,
 ) -> pd.DataFrame:
     """Calculate (State FIPS origin, County FIPS origin), (State FIPS destination, County FIPS destination), tons
-    for given mode based on county allocation percentages."""
+    for given mode based on county allocation percentages. Horizon demand fields are carried as further
+    columns named after the FAF field."""
     non_zero_county_od_pdf = faf5_compute_county_tons_for_mode(
         faf5_rail_demand,
         faf_id_to_county_id_allocation_map,
-        config.faf_demand_field,
+        config.demand_fields,
         SUM_TONS_TOLERANCE,
         config.county_to_county_ktons_threshold,
     )
@@ -233,6 +250,7 @@ def county_to_county_rail_tons(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def county_to_county_marine_tons(
     context: dagster.AssetExecutionContext,
     faf5_water_demand: pd.DataFrame,
@@ -240,11 +258,12 @@ def county_to_county_marine_tons(
     config: FAF5CountyConfig,
 ) -> pd.DataFrame:
     """Calculate (State FIPS origin, County FIPS origin), (State FIPS destination, County FIPS destination), tons
-    for given mode based on county allocation percentages."""
+    for given mode based on county allocation percentages. Horizon demand fields are carried as further
+    columns named after the FAF field."""
     non_zero_county_od_pdf = faf5_compute_county_tons_for_mode(
         faf5_water_demand,
         faf_id_to_county_id_allocation_map,
-        config.faf_demand_field,
+        config.demand_fields,
         SUM_TONS_TOLERANCE,
         config.county_to_county_ktons_threshold,
     )
@@ -10,6 +10,7 @@ faf5_regions_spec = dagster.AssetSpec(
         "format": "zip",
         "filename": "faf5_regions.zip",
         "source_path": "raw/",
+        "read_kwargs": dagster.MetadataValue.json({"columns": ["FAF_Zone"]}),
         "dashboard_url": dagster.MetadataValue.url(
             "https://hub.arcgis.com/api/download/v1/items/539fdab88ee74e38b28959494965ace2/shapefile?redirect=true&layers=0"
         ),
@@ -26,6 +27,7 @@ us_county_shp_files_spec = dagster.AssetSpec(
         "format": "zip",
         "filename": "us_county_shp_files.zip",
         "source_path": "raw/",
+        "read_kwargs": dagster.MetadataValue.json({"columns": ["STATEFP", "COUNTYFP"]}),
         "dashboard_url": dagster.MetadataValue.url(
             "https://www2.census.gov/geo/tiger/TIGER2023/COUNTY/tl_2023_us_county.zip"
         ),
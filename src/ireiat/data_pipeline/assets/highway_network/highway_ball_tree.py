@@ -2,11 +2,13 @@ import dagster
 import igraph
 
 from ireiat.util.graph import generate_ball_tree
+from ireiat.data_pipeline.instrumentation import instrumented
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def highway_ball_tree(
     strongly_connected_highway_graph: igraph.Graph,
 ):
-    """BallTree for highway nodes from the highway graph"""
+    """Haversine nearest neighbour tree (3-D KD-tree) for highway nodes from the highway graph"""
     return generate_ball_tree(strongly_connected_highway_graph)
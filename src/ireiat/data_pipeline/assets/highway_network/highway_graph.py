@@ -6,12 +6,15 @@ import igraph as ig
 import pandas as pd
 
 from ireiat.config.constants import INTERMEDIATE_DIRECTORY_ARGS
+from ireiat.config.data_pipeline import NetworkSnapConfig
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
 from ireiat.util.graph import (
     get_coordinates_from_geoframe,
     generate_zero_based_node_maps,
-    get_allowed_node_indices,
+    generate_strongly_connected_graph,
     explode_multilinestrings,
+    snap_link_coordinates,
 )
 
 
@@ -19,8 +22,11 @@ from ireiat.util.graph import (
     io_manager_key="custom_io_manager",
     metadata={"format": "parquet", **INTERMEDIATE_DIRECTORY_ARGS},
 )
+@instrumented
 def undirected_highway_edges(
-    context: dagster.AssetExecutionContext, faf5_highway_network_links_src: geopandas.GeoDataFrame
+    context: dagster.AssetExecutionContext,
+    faf5_highway_network_links_src: geopandas.GeoDataFrame,
+    config: NetworkSnapConfig,
 ) -> pd.DataFrame:
     """For each undirected edge in the highway dataset, create a row in the table with origin_lat, origin_long,
     destination_lat, and destination_long, along with several other edge fields of interest"""
@@ -31,6 +37,11 @@ def undirected_highway_edges(
     exploded_faf = explode_multilinestrings(faf5_highway_network_links_src[fields_to_retain])
     coords = get_coordinates_from_geoframe(exploded_faf)
     coords = pd.concat([exploded_faf, coords], axis=1)  # join in several fields of interest
+    coords, n_snapped = snap_link_coordinates(coords, config.snap_tolerance_meters)
+    context.log.info(
+        f"Snapped {n_snapped} endpoints within {config.snap_tolerance_meters}m, "
+        f"dropping {len(exploded_faf) - len(coords)} collapsed links."
+    )
     coords = coords.drop_duplicates(
         subset=[
             "origin_latitude",
@@ -44,6 +55,7 @@ def undirected_highway_edges(
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def strongly_connected_highway_graph(
     context: dagster.AssetExecutionContext, undirected_highway_edges: pd.DataFrame
 ) -> ig.Graph:
@@ -56,12 +68,6 @@ def strongly_connected_highway_graph(
     complete_highway_node_to_idx: Dict[Tuple[float, float], int] = generate_zero_based_node_maps(
         undirected_highway_edges
     )
-    g = ig.Graph(directed=True)
-    g.add_vertices(
-        len(complete_highway_node_to_idx),
-        attributes={"coords": list(complete_highway_node_to_idx.keys())},
-    )
-
     for row in undirected_highway_edges.itertuples():
         origin_coords = (row.origin_latitude, row.origin_longitude)
         destination_coords = (row.destination_latitude, row.destination_longitude)
@@ -105,12 +111,13 @@ def strongly_connected_highway_graph(
                 edge_attributes.append(ba_attribute_tuple)
                 added_edges[(head, tail)] = True
 
-    # generate a graph from all nodes
+    # generate a graph from the largest strongly connected component of all nodes
     n_vertices = len(complete_highway_node_to_idx)
     context.log.info(f"Original number of nodes {n_vertices}, edges {len(edge_tuples)}.")
-    g.add_edges(
+    connected_subgraph, pruned = generate_strongly_connected_graph(
+        list(complete_highway_node_to_idx.keys()),
         edge_tuples,
-        attributes={
+        {
             "length": [attr[0] for attr in edge_attributes],
             "speed": [attr[1] for attr in edge_attributes],
             "original_id": [attr[2] for attr in edge_attributes],
@@ -118,9 +125,12 @@ def strongly_connected_highway_graph(
             "destination_coords": [attr[4] for attr in edge_attributes],
         },
     )
-    context.log.info(f"Initial constructed graph connected?: {g.is_connected()}")
-    allowed_node_indices = get_allowed_node_indices(g)
-
-    # construct a connected subgraph
-    connected_subgraph = g.subgraph(allowed_node_indices)
+    context.log.info(
+        f"Excluded {pruned.n_excluded_nodes} nodes and {pruned.n_excluded_edges} edges outside the largest"
+        f" strongly connected component."
+    )
+    context.add_output_metadata(pruned.metadata())
+    context.log.info(
+        f"Graph has {connected_subgraph.vcount()} nodes and {connected_subgraph.ecount()} edges."
+    )
     return connected_subgraph
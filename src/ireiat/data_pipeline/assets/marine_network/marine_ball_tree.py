@@ -2,11 +2,13 @@ import dagster
 import igraph
 
 from ireiat.util.graph import generate_ball_tree
+from ireiat.data_pipeline.instrumentation import instrumented
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def marine_ball_tree(
     strongly_connected_marine_graph: igraph.Graph,
 ):
-    """BallTree for marine nodes from the marine graph"""
+    """Haversine nearest neighbour tree (3-D KD-tree) for marine nodes from the marine graph"""
     return generate_ball_tree(strongly_connected_marine_graph)
@@ -6,11 +6,14 @@ import igraph as ig
 import pandas as pd
 
 from ireiat.config.constants import INTERMEDIATE_DIRECTORY_ARGS, ALBERS_CRS, METERS_PER_MILE
+from ireiat.config.data_pipeline import NetworkSnapConfig
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
 from ireiat.util.graph import (
     get_coordinates_from_geoframe,
     generate_zero_based_node_maps,
-    get_allowed_node_indices,
+    generate_strongly_connected_graph,
+    snap_link_coordinates,
 )
 
 
@@ -18,11 +21,16 @@ from ireiat.util.graph import (
     io_manager_key="custom_io_manager",
     metadata={"format": "parquet", **INTERMEDIATE_DIRECTORY_ARGS},
 )
+@instrumented
 def undirected_marine_edges(
-    context: dagster.AssetExecutionContext, marine_network_links_src: geopandas.GeoDataFrame
+    context: dagster.AssetExecutionContext,
+    marine_network_links_src: geopandas.GeoDataFrame,
+    config: NetworkSnapConfig,
 ) -> pd.DataFrame:
     """For each undirected edge in the marine dataset, create a row in the table with origin_lat, origin_long,
-    destination_lat, and destination_long, along with several other edge fields of interest"""
+    destination_lat, and destination_long, along with several other edge fields of interest. Rows keep the
+    index of their source link (the marine `original_id`), also when snapping drops collapsed links.
+    """
 
     link_coords = get_coordinates_from_geoframe(marine_network_links_src)
     marine_network_albers = marine_network_links_src.to_crs(ALBERS_CRS)
@@ -31,12 +39,18 @@ def undirected_marine_edges(
         [link_coords, pd.Series(distance_miles, name="distance_miles"), marine_network_links_src],
         axis=1,
     )
+    link_coords, n_snapped = snap_link_coordinates(link_coords, config.snap_tolerance_meters)
+    context.log.info(
+        f"Snapped {n_snapped} endpoints within {config.snap_tolerance_meters}m, "
+        f"dropping {len(marine_network_links_src) - len(link_coords)} collapsed links."
+    )
     link_coords = geopandas.GeoDataFrame(link_coords)
     publish_metadata(context, link_coords)
     return link_coords
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def strongly_connected_marine_graph(
     context: dagster.AssetExecutionContext, undirected_marine_edges: pd.DataFrame
 ) -> ig.Graph:
@@ -46,13 +60,7 @@ def strongly_connected_marine_graph(
     complete_marine_node_to_idx: Dict[Tuple[float, float], int] = generate_zero_based_node_maps(
         undirected_marine_edges
     )
-    g = ig.Graph(directed=True)
-    g.add_vertices(
-        len(complete_marine_node_to_idx),
-        attributes={"coords": list(complete_marine_node_to_idx.keys())},
-    )
-
-    for idx, row in enumerate(undirected_marine_edges.itertuples()):
+    for row in undirected_marine_edges.itertuples():
         origin_coords = (row.origin_latitude, row.origin_longitude)
         destination_coords = (row.destination_latitude, row.destination_longitude)
         tail, head = (
@@ -64,24 +72,28 @@ def strongly_connected_marine_graph(
         edge_tuples.append((head, tail))
 
         # Duplicate attributes for both directions
-        edge_attributes.append((row.distance_miles, idx, origin_coords, destination_coords))
-        edge_attributes.append((row.distance_miles, idx, destination_coords, origin_coords))
+        edge_attributes.append((row.distance_miles, row.Index, origin_coords, destination_coords))
+        edge_attributes.append((row.distance_miles, row.Index, destination_coords, origin_coords))
 
-    # generate a graph from all nodes
+    # generate a graph from the largest strongly connected component of all nodes
     n_vertices = len(complete_marine_node_to_idx)
     context.log.info(f"Original number of nodes {n_vertices}, edges {len(edge_tuples)}.")
-    g.add_edges(
+    connected_subgraph, pruned = generate_strongly_connected_graph(
+        list(complete_marine_node_to_idx.keys()),
         edge_tuples,
-        attributes={
+        {
             "length": [attr[0] for attr in edge_attributes],
             "original_id": [attr[1] for attr in edge_attributes],
             "origin_coords": [attr[2] for attr in edge_attributes],
             "destination_coords": [attr[3] for attr in edge_attributes],
         },
     )
-    context.log.info(f"Initial constructed graph connected?: {g.is_connected()}")
-    allowed_node_indices = get_allowed_node_indices(g)
-
-    # construct a connected subgraph
-    connected_subgraph = g.subgraph(allowed_node_indices)
+    context.log.info(
+        f"Excluded {pruned.n_excluded_nodes} nodes and {pruned.n_excluded_edges} edges outside the largest"
+        f" strongly connected component."
+    )
+    context.add_output_metadata(pruned.metadata())
+    context.log.info(
+        f"Graph has {connected_subgraph.vcount()} nodes and {connected_subgraph.ecount()} edges."
+    )
     return connected_subgraph
@@ -1 +1,4 @@
 SEPARATION_ATTRIBUTE_NAME: str = "owners"  # field used to represent owners and trackage rights
+OWNER_VOCABULARY_ATTRIBUTE: str = (
+    "owner_vocabulary"  # graph attribute / table attrs key of the owner codes
+)
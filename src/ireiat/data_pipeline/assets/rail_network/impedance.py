@@ -1,51 +1,61 @@
-from itertools import chain, product
-from typing import Set, Dict, Any
+from collections import defaultdict
+from itertools import product
+from typing import List, Dict, Any
 
 import igraph as ig
 
 from ireiat.config.data_pipeline import RailImpedanceConfig
 from ireiat.config.rail_enum import EdgeType
-from ireiat.data_pipeline.assets.rail_network import SEPARATION_ATTRIBUTE_NAME
+from ireiat.data_pipeline.assets.rail_network import (
+    OWNER_VOCABULARY_ATTRIBUTE,
+    SEPARATION_ATTRIBUTE_NAME,
+)
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary, single_owner_masks
+
+IMPEDANCE_OWNER_MASK = 0  # impedance edges belong to no owner
 
 
 def _generate_subgraphs(
     g: ig.Graph, separation_attribute: str = SEPARATION_ATTRIBUTE_NAME
 ) -> Dict[str, ig.Graph]:
     """
-    Returns subgraphs by unique entries in the `separation_attribute`  for the graph.
+    Returns subgraphs by unique owners in the `separation_attribute` (owner mask) for the graph, whose
+    `owner_vocabulary` graph attribute names the owners.
     Returned subgraphs have an 'original_idx' field with the format {X}{Y}, where X is the
     `separation_attribute` string and Y is the original vertex index.
     E.g. 0->1 (Graph A) would have ['A0','A1'] vertex attributes
 
-    Additionally, each subgraph's `separation_attribute` now takes the string of the attribute value
+    Additionally, each subgraph's `separation_attribute` now takes the mask of the single owner
     to which the subgraph belongs. E.g. Graph with 0->1 (separation_attribute={'A','B'} would have
-    two graphs returned, each with `separation_attribute='A'` or `separation_attribute='B'`.
+    two graphs returned, each with `separation_attribute` the mask of 'A' or the mask of 'B'.
 
     :param g: graph to separate by a given attribute
-    :return: Dict of subgraphs, keyed by unique separation attribute values"""
+    :return: Dict of subgraphs, keyed by owner (in vocabulary order)"""
     # create subgraphs by owner
-    unique_owners_across_edges = set(chain.from_iterable(g.es[separation_attribute]))
-    edge_list_by_owner: Dict[str, Set[int]] = {k: set() for k in unique_owners_across_edges}
-    for e in g.es:
-        for k in e[separation_attribute]:
-            edge_list_by_owner[k].add(e.index)
+    vocabulary: OwnerVocabulary = g[OWNER_VOCABULARY_ATTRIBUTE]
+    edge_list_by_owner: Dict[int, List[int]] = defaultdict(list)
+    for edge_idx, owners in enumerate(g.es[separation_attribute]):
+        for owner_mask in single_owner_masks(owners):
+            edge_list_by_owner[owner_mask].append(edge_idx)
     # retain all vertices in the subgraph to preserve numbering
-    subgraphs = {k: g.subgraph_edges(v) for k, v in edge_list_by_owner.items()}
-    for k, subgraph in subgraphs.items():
-        subgraph.es[separation_attribute] = [f"{k}" for _ in subgraph.es]
+    subgraphs = {}
+    for owner_mask in sorted(edge_list_by_owner):
+        subgraph = g.subgraph_edges(edge_list_by_owner[owner_mask])
+        subgraph.es[separation_attribute] = owner_mask
+        subgraphs[vocabulary.label(owner_mask)] = subgraph
     return subgraphs
 
 
 def _generate_impedances(
     g: ig.Graph, separation_attribute=SEPARATION_ATTRIBUTE_NAME
-) -> set[tuple[str, tuple[float, float], str, tuple[float, float]]]:
+) -> set[tuple[int, tuple[float, float], int, tuple[float, float]]]:
     """
     Given a graph with a `separation_attribute` on each edge, determine the impedance
     edges that would be needed to join subgraphs that were created from unique values of the
     separation attribute. For example, if a graph of 0 -> 1 -> 2 had 'owners' 'A' on the first
     edge and 'B' on the second edge (along with origin and destination coords for each edge),
-    this method would return `{('A', destination_coords, 'B', origin_coords)}` given
-    that a graph split by owner would be A graph: 0->1 and B graph: 1->2 and there would be an
+    this method would return `{(A, destination_coords, B, origin_coords)}` (A and B being the
+    owner masks) given that a graph split by owner would be A graph: 0->1 and B graph: 1->2 and there would be an
     impedance edge between 'A1' and 'B1' (with appropriate coordinates returned).
 
     :param g: graph to generate impedance edges from
@@ -66,7 +76,9 @@ def _generate_impedances(
                 # we have single in/out edges with different owners
                 in_edge_destination_coords = in_edges[0]["destination_coords"]
                 out_edge_origin_coords = out_edges[0]["origin_coords"]
-                for in_edge_owner, out_edge_owner in product(in_owners, out_owners):
+                for in_edge_owner, out_edge_owner in product(
+                    single_owner_masks(in_owners), single_owner_masks(out_owners)
+                ):
                     if in_edge_owner != out_edge_owner:
                         impedances.add(
                             (
@@ -83,7 +95,9 @@ def _generate_impedances(
                 for out_edge in out_edges:
                     out_edge_origin_coords = out_edge["origin_coords"]
                     out_edge_owners = out_edge[separation_attribute]
-                    for in_edge_owner, out_edge_owner in product(in_edge_owners, out_edge_owners):
+                    for in_edge_owner, out_edge_owner in product(
+                        single_owner_masks(in_edge_owners), single_owner_masks(out_edge_owners)
+                    ):
                         if in_edge_owner != out_edge_owner:
                             impedances.add(
                                 (
@@ -97,16 +111,18 @@ def _generate_impedances(
     return impedances
 
 
-def generate_impedance_values(impedances: set, config: RailImpedanceConfig | None = None):
+def generate_impedance_values(
+    impedances: set, vocabulary: OwnerVocabulary, config: RailImpedanceConfig | None = None
+):
     """Looks up impedance values given the configuration passed, which can be geographic or generic"""
     if config is None:
         return [250 for _ in impedances]
 
     computed_impedances = []
-    class_1_rr_codes = set(config.class_1_rr_codes)
+    class_1_rr_mask = vocabulary.encode(config.class_1_rr_codes)
     for src_owner, dest_coords, dest_owner, origin_coords in impedances:
         # TODO (NP) - construct ball trees and check if any geographic overrides apply
-        if src_owner in class_1_rr_codes and dest_owner in class_1_rr_codes:
+        if src_owner & class_1_rr_mask and dest_owner & class_1_rr_mask:
             computed_impedances.append(config.class_1_to_class_1_impedance)
         else:
             computed_impedances.append(config.default_impedance)
@@ -122,7 +138,7 @@ def generate_impedance_graph(
     graph with impedances edges between vertices that have different values of the
     separation attribute. See the detailed test cases for how this method is intended to function.
 
-    :param g: iGraph with `separation_attribute` of type `Set`
+    :param g: iGraph with `separation_attribute` owner masks and an `owner_vocabulary` graph attribute
     :param separation_attribute: string identifying the attribute
     :param config: rail configuration when running the data pipeline
     :return: an exploded graph with impedance edges
@@ -133,6 +149,7 @@ def generate_impedance_graph(
     subgraphs = _generate_subgraphs(g, separation_attribute=separation_attribute)
     print(f"Generated {len(subgraphs)} subgraphs")
     disjoint_union = ig.disjoint_union(subgraphs.values())
+    disjoint_union[OWNER_VOCABULARY_ATTRIBUTE] = g[OWNER_VOCABULARY_ATTRIBUTE]
 
     # cache vertices from/to in the disjoint graph to facilitate fast lookups
     vertices_from = {
@@ -151,8 +168,10 @@ def generate_impedance_graph(
     # construct default edge attributes for impedance edges and add them
     impedance_edge_attrs: Dict[str, Any] = dict()
     impedance_edge_attrs["edge_type"] = [EdgeType.IMPEDANCE_LINK.value for _ in impedance_edges]
-    impedance_edge_attrs[separation_attribute] = ["imp" for _ in impedance_edges]
-    impedance_edge_attrs["length"] = generate_impedance_values(impedances, config)
+    impedance_edge_attrs[separation_attribute] = [IMPEDANCE_OWNER_MASK for _ in impedance_edges]
+    impedance_edge_attrs["length"] = generate_impedance_values(
+        impedances, g[OWNER_VOCABULARY_ATTRIBUTE], config
+    )
     disjoint_union.add_edges(impedance_edges, impedance_edge_attrs)
 
     # eliminate zero degree vertices, preserved when creating subgraphs
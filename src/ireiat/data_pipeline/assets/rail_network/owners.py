@@ -0,0 +1,91 @@
+"""Dictionary encoding of rail owners (railroads owning a link or holding trackage rights on it).
+
+Every owner of an `OwnerVocabulary` is a bit, so the owners of a link are a single integer bitmask and set
+intersection, union and equality become integer `&`, `|` and `==`. Masks are Python integers, since the
+NARN has far more than 64 railroads. Tables store them as little-endian bytes, keeping the vocabulary in
+the table's `attrs` (which is persisted in parquet files); graphs keep it as a graph attribute."""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from ireiat.data_pipeline.assets.rail_network import OWNER_VOCABULARY_ATTRIBUTE
+
+
+def owner_bits(mask: int) -> Iterator[int]:
+    """Bit (owner) indices set in `mask`, lowest first"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def single_owner_masks(mask: int) -> Iterator[int]:
+    """The mask of each owner in `mask`"""
+    for bit in owner_bits(mask):
+        yield 1 << bit
+
+
+@dataclass(frozen=True)
+class OwnerVocabulary:
+    """Owner codes, the owner at position i being bit i of an owner mask"""
+
+    owners: Tuple[str, ...]
+    _bits: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_bits", {owner: i for i, owner in enumerate(self.owners)})
+
+    @classmethod
+    def from_owners(cls, owners: Iterable[str]) -> "OwnerVocabulary":
+        """Vocabulary of every owner occurring in `owners`, most frequent first so that common masks are
+        small integers"""
+        counts = Counter(owners)
+        return cls(tuple(sorted(counts, key=lambda owner: (-counts[owner], owner))))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "OwnerVocabulary":
+        return cls(tuple(frame.attrs[OWNER_VOCABULARY_ATTRIBUTE]))
+
+    def attach(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Records the vocabulary in the `attrs` of `frame`"""
+        frame.attrs[OWNER_VOCABULARY_ATTRIBUTE] = list(self.owners)
+        return frame
+
+    @property
+    def n_bytes(self) -> int:
+        return max((len(self.owners) + 7) // 8, 1)
+
+    def encode(self, owners: Iterable[str]) -> int:
+        """Mask of `owners`. Owners outside the vocabulary are ignored."""
+        mask = 0
+        for owner in owners:
+            bit = self._bits.get(owner)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def encode_pairs(self, rows: Iterable[int], owners: Iterable[str], n_rows: int) -> List[int]:
+        """Masks of `n_rows` rows given as (row, owner) pairs"""
+        masks = [0] * n_rows
+        for row, owner in zip(rows, owners):
+            masks[row] |= 1 << self._bits[owner]
+        return masks
+
+    def decode(self, mask: int) -> Set[str]:
+        return {self.owners[bit] for bit in owner_bits(mask)}
+
+    def label(self, mask: Optional[int]) -> Optional[str]:
+        """Comma separated owners of `mask` (None for no mask)"""
+        if mask is None:
+            return None
+        return ",".join(sorted(self.decode(mask)))
+
+    def to_bytes(self, mask: int) -> bytes:
+        return mask.to_bytes(self.n_bytes, "little")
+
+    @staticmethod
+    def from_bytes(mask_bytes: bytes) -> int:
+        return int.from_bytes(mask_bytes, "little")
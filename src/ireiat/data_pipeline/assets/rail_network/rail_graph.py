@@ -1,5 +1,4 @@
 from collections import defaultdict
-from itertools import chain
 from typing import Dict, Tuple, Any
 
 import dagster
@@ -7,18 +6,30 @@ import geopandas
 import igraph as ig
 import numpy as np
 import pandas as pd
-from sklearn.neighbors import BallTree
 
 from ireiat.config.constants import INTERMEDIATE_DIRECTORY_ARGS, RR_MAPPING
-from ireiat.config.data_pipeline import RailImpedanceConfig
-from ireiat.data_pipeline.assets.rail_network import SEPARATION_ATTRIBUTE_NAME
+from ireiat.config.data_pipeline import (
+    NetworkSnapConfig,
+    RailImpedanceConfig,
+    RailTerminalSkimConfig,
+)
+from ireiat.data_pipeline.assets.rail_network import (
+    OWNER_VOCABULARY_ATTRIBUTE,
+    SEPARATION_ATTRIBUTE_NAME,
+)
 from ireiat.data_pipeline.assets.rail_network.impedance import generate_impedance_graph
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary, single_owner_masks
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
+from ireiat.util.csr_graph import CSRGraph
 from ireiat.util.graph import (
     get_coordinates_from_geoframe,
     generate_zero_based_node_maps,
-    get_allowed_node_indices,
+    snap_link_coordinates,
+    generate_strongly_connected_graph,
 )
+from ireiat.util.spatial import HaversineKDTree
+from ireiat.util.skim import TerminalSkim, compute_terminal_skim
 from ireiat.config.rail_enum import EdgeType, VertexType
 
 
@@ -26,6 +37,7 @@ from ireiat.config.rail_enum import EdgeType, VertexType
     io_manager_key="custom_io_manager",
     metadata={"format": "parquet", "use_geopandas": True, **INTERMEDIATE_DIRECTORY_ARGS},
 )
+@instrumented
 def filtered_and_processed_rail_network_links(
     context: dagster.AssetExecutionContext, narn_rail_network_links_src: geopandas.GeoDataFrame
 ) -> geopandas.GeoDataFrame:
@@ -47,27 +59,41 @@ def filtered_and_processed_rail_network_links(
     real_lines = narn_rail_network_links_src[~amtk_filter & ~bad_track_filter].copy()
     ownership_cols = [col for col in real_lines.columns if "RROWNER" in col or "TRKRGHTS" in col]
 
-    for col in ownership_cols:
-        real_lines[col] = real_lines[col].replace(RR_MAPPING)
-
-    owner_set = real_lines[ownership_cols].apply(lambda x: set(filter(pd.notna, x)), axis=1)
+    # a (link, owner) pair for each owner or trackage rights holder of each link
+    owner_values = real_lines[ownership_cols].to_numpy()
+    link_idx, owner_col = np.nonzero(pd.notna(owner_values))
+    link_owners = pd.DataFrame({"link": link_idx, "owner": owner_values[link_idx, owner_col]})
+    link_owners["owner"] = link_owners["owner"].replace(RR_MAPPING)
     # remove AMTK as a relevant owner, since interchange costs will not matter with AMTK
-    owner_set.apply(lambda x: x.discard("AMTK"))
+    link_owners = link_owners.loc[link_owners["owner"] != "AMTK"]
     # Add CSXT and NS to OWNERS if PAS is one of the owners (PAS is jointly owned by CSXT and NS)
-    owner_set.apply(lambda x: x.update(["CSXT", "NS"]) if "PAS" in x else x)
-
-    real_lines[SEPARATION_ATTRIBUTE_NAME] = owner_set
+    pas_links = link_owners.loc[link_owners["owner"] == "PAS", "link"].to_numpy()
+    link_owners = pd.concat(
+        [
+            link_owners,
+            pd.DataFrame({"link": pas_links, "owner": "CSXT"}),
+            pd.DataFrame({"link": pas_links, "owner": "NS"}),
+        ]
+    ).drop_duplicates()
+
+    vocabulary = OwnerVocabulary.from_owners(link_owners["owner"])
+    owner_masks = vocabulary.encode_pairs(
+        link_owners["link"], link_owners["owner"], len(real_lines)
+    )
+    real_lines[SEPARATION_ATTRIBUTE_NAME] = [vocabulary.to_bytes(mask) for mask in owner_masks]
     real_lines["TRACKS"] = real_lines["TRACKS"].replace(0, 1)
 
     # columns to retain
     cols_to_retain = ["FRAARCID", "MILES", "TRACKS", SEPARATION_ATTRIBUTE_NAME, "geometry"]
     # exclude items with no owners at all
     real_lines_with_owners = real_lines.loc[
-        real_lines[SEPARATION_ATTRIBUTE_NAME].apply(len) >= 1, cols_to_retain
+        np.isin(np.arange(len(real_lines)), link_owners["link"]), cols_to_retain
     ].copy()
     context.log.info(
         f"Rail links data loaded and preprocessed with {len(real_lines_with_owners)} rail links"
+        f" and {len(vocabulary.owners)} owners"
     )
+    vocabulary.attach(real_lines_with_owners)
     publish_metadata(context, real_lines_with_owners)
     return real_lines_with_owners
 
@@ -76,23 +102,34 @@ def filtered_and_processed_rail_network_links(
     io_manager_key="custom_io_manager",
     metadata={"format": "parquet", **INTERMEDIATE_DIRECTORY_ARGS},
 )
+@instrumented
 def undirected_rail_edges(
     context: dagster.AssetExecutionContext,
     filtered_and_processed_rail_network_links: geopandas.GeoDataFrame,
+    config: NetworkSnapConfig,
 ) -> pd.DataFrame:
     """For each undirected edge in the rail dataset, create a row in the table with origin_lat, origin_long,
-    destination_lat, and destination_long, along with several other edge fields of interest"""
+    destination_lat, and destination_long, along with several other edge fields of interest. Rows keep the
+    index of their source link (the rail `original_id`), also when snapping drops collapsed links.
+    """
 
     link_coords = get_coordinates_from_geoframe(filtered_and_processed_rail_network_links)
     fields_to_retain = ["FRAARCID", SEPARATION_ATTRIBUTE_NAME, "MILES", "TRACKS", "geometry"]
     link_coords = pd.concat(
         [filtered_and_processed_rail_network_links[fields_to_retain], link_coords], axis=1
     )  # join in the direction
+    link_coords, n_snapped = snap_link_coordinates(link_coords, config.snap_tolerance_meters)
+    context.log.info(
+        f"Snapped {n_snapped} endpoints within {config.snap_tolerance_meters}m, "
+        f"dropping {len(filtered_and_processed_rail_network_links) - len(link_coords)} collapsed links."
+    )
+    OwnerVocabulary.from_frame(filtered_and_processed_rail_network_links).attach(link_coords)
     publish_metadata(context, link_coords)
     return link_coords
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def strongly_connected_rail_graph(
     context: dagster.AssetExecutionContext, undirected_rail_edges: pd.DataFrame
 ) -> ig.Graph:
@@ -100,19 +137,15 @@ def strongly_connected_rail_graph(
     # generate directed edges from the undirected edges based on the "dir" field
     edge_tuples = []
     edge_attributes = []
-    undirected_rail_edges[SEPARATION_ATTRIBUTE_NAME] = undirected_rail_edges[
-        SEPARATION_ATTRIBUTE_NAME
-    ].apply(set)
+    vocabulary = OwnerVocabulary.from_frame(undirected_rail_edges)
+    undirected_rail_edges[SEPARATION_ATTRIBUTE_NAME] = [
+        vocabulary.from_bytes(mask_bytes)
+        for mask_bytes in undirected_rail_edges[SEPARATION_ATTRIBUTE_NAME]
+    ]
 
     complete_rail_node_to_idx: Dict[Tuple[float, float], int] = generate_zero_based_node_maps(
         undirected_rail_edges
     )
-    g = ig.Graph(directed=True)
-    g.add_vertices(
-        len(complete_rail_node_to_idx),
-        attributes={"coords": list(complete_rail_node_to_idx.keys())},
-    )
-
     for row in undirected_rail_edges.itertuples():
         origin_coords = (row.origin_latitude, row.origin_longitude)
         destination_coords = (row.destination_latitude, row.destination_longitude)
@@ -145,12 +178,13 @@ def strongly_connected_rail_graph(
         edge_tuples.append((head, tail))
         edge_attributes.append(ba_attribute_tuple)
 
-    # generate a graph from all nodes
+    # generate a graph from the largest strongly connected component of all nodes
     n_vertices = len(complete_rail_node_to_idx)
     context.log.info(f"Original number of nodes {n_vertices}, edges {len(edge_tuples)}.")
-    g.add_edges(
+    connected_subgraph, pruned = generate_strongly_connected_graph(
+        list(complete_rail_node_to_idx.keys()),
         edge_tuples,
-        attributes={
+        {
             "length": [attr[0] for attr in edge_attributes],
             "fraarcid": [attr[1] for attr in edge_attributes],
             "owners": [attr[2] for attr in edge_attributes],
@@ -161,16 +195,20 @@ def strongly_connected_rail_graph(
             "original_id": [attr[6] for attr in edge_attributes],
         },
     )
-    context.log.info(f"Initial constructed graph connected?: {g.is_connected()}")
-    allowed_node_indices = get_allowed_node_indices(g)
-
-    # construct a connected subgraph
-    connected_subgraph = g.subgraph(allowed_node_indices)
-    context.log.info(f"Graph has {len(g.vs)} nodes and {len(g.es)} edges.")
+    context.log.info(
+        f"Excluded {pruned.n_excluded_nodes} nodes and {pruned.n_excluded_edges} edges outside the largest"
+        f" strongly connected component."
+    )
+    context.add_output_metadata(pruned.metadata())
+    connected_subgraph[OWNER_VOCABULARY_ATTRIBUTE] = vocabulary
+    context.log.info(
+        f"Graph has {connected_subgraph.vcount()} nodes and {connected_subgraph.ecount()} edges."
+    )
     return connected_subgraph
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def impedance_rail_graph(
     context: dagster.AssetExecutionContext,
     strongly_connected_rail_graph: ig.Graph,
@@ -179,11 +217,12 @@ def impedance_rail_graph(
     """iGraph object representing the impedance network, derived from the rail network"""
     g = generate_impedance_graph(strongly_connected_rail_graph, SEPARATION_ATTRIBUTE_NAME, config)
     context.log.info(f"Graph has {len(g.vs)} nodes and {len(g.es)} edges.")
-    assert g.is_connected()
+    assert CSRGraph.from_igraph(g).is_strongly_connected()
     return g
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def impedance_rail_graph_with_terminals(
     context: dagster.AssetExecutionContext,
     intermodal_terminals_src: pd.DataFrame,
@@ -203,16 +242,17 @@ def impedance_rail_graph_with_terminals(
         .apply(lambda x: set(x))
     )
 
-    def replace_items(item_set):
-        return {RR_MAPPING.get(item, item) for item in item_set}
-
-    intermodal_terminals_src["RAIL_CO"] = intermodal_idx_to_rail_carriers.apply(replace_items)
-
-    intersection_of_im_and_rail = intermodal_terminals_src["RAIL_CO"].apply(
-        lambda x: x & set(impedance_rail_graph.es["owners"])
-    )
-    im_terminals_found_in_rail = intersection_of_im_and_rail.loc[
-        intersection_of_im_and_rail != set()
+    # encode the carriers at each terminal, keeping only those owning edges of the impedance graph
+    vocabulary: OwnerVocabulary = impedance_rail_graph[OWNER_VOCABULARY_ATTRIBUTE]
+    rail_network_owners = 0
+    for owners in impedance_rail_graph.es[SEPARATION_ATTRIBUTE_NAME]:
+        rail_network_owners |= owners
+    intermodal_terminals_src["RAIL_CO"] = [
+        vocabulary.encode(RR_MAPPING.get(item, item) for item in item_set) & rail_network_owners
+        for item_set in intermodal_idx_to_rail_carriers
+    ]
+    im_terminals_found_in_rail = intermodal_terminals_src.loc[
+        intermodal_terminals_src["RAIL_CO"] != 0, "RAIL_CO"
     ]
 
     context.log.info(
@@ -254,7 +294,7 @@ def impedance_rail_graph_with_terminals(
         origin_coords for _, origin_coords in owner_coord_to_vertex_idx_map.keys()
     ]
     quant_lat_longs_radians = np.deg2rad(quant_node_lat_longs)
-    quant_node_ball_tree = BallTree(quant_lat_longs_radians, metric="haversine")
+    quant_node_ball_tree = HaversineKDTree(quant_lat_longs_radians)
 
     im_lat_longs = im_pdf[["LAT", "LON"]]
     im_fac_lat_longs_radians = np.deg2rad(im_lat_longs)
@@ -266,7 +306,7 @@ def impedance_rail_graph_with_terminals(
     edges = []
     edge_attributes: Dict[str, list[Any]] = defaultdict(list)
     for im_idx, record in enumerate(im_pdf.itertuples()):
-        rrs_at_im: set = record.RAIL_CO
+        rrs_at_im: int = record.RAIL_CO
         dummy_terminal_node_vertex_idx = dummy_terminal_idx_to_graph_vertex_idx_map[im_idx]
         im_terminal_node_vertex_idx = terminal_idx_to_graph_vertex_idx_map[im_idx]
 
@@ -278,7 +318,7 @@ def impedance_rail_graph_with_terminals(
             edge_attributes["length"].append(0.1)  # nominal length
 
         # now try to figure out where to map to the quant network
-        for rr_at_im in rrs_at_im:
+        for rr_at_im in single_owner_masks(rrs_at_im):
             for candidate_quant_node in lookup_to_bt_node_idx[im_idx]:
                 # try to get a vertex with the particular owner and the matching lat long from the quant network
                 matching_vertex = owner_coord_to_vertex_idx_map.get(
@@ -297,7 +337,7 @@ def impedance_rail_graph_with_terminals(
                     break
             else:
                 context.log.info(
-                    f"Nothing found for {rr_at_im} for terminal number {im_idx} with name"
+                    f"Nothing found for {vocabulary.label(rr_at_im)} for terminal number {im_idx} with name"
                     f" {record.TERMINAL}"
                 )
 
@@ -305,31 +345,35 @@ def impedance_rail_graph_with_terminals(
     context.log.info(
         f"Graph has {len(impedance_rail_graph.vs)} nodes and {len(impedance_rail_graph.es)} edges."
     )
-    assert impedance_rail_graph.is_connected()
+    assert CSRGraph.from_igraph(impedance_rail_graph).is_strongly_connected()
     return impedance_rail_graph
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def impedance_rail_graph_with_terminals_reduced(
     context: dagster.AssetExecutionContext,
     impedance_rail_graph_with_terminals: ig.Graph,
 ) -> ig.Graph:
     """Compute IM to IM shortest paths and reduce the rail impedance network to only consider these edges"""
-    im_indices = [
-        v.index
-        for v in impedance_rail_graph_with_terminals.vs.select(
-            vertex_type=VertexType.IM_TERMINAL.value
-        )
-    ]
+    im_indices = np.array(
+        [
+            v.index
+            for v in impedance_rail_graph_with_terminals.vs.select(
+                vertex_type=VertexType.IM_TERMINAL.value
+            )
+        ],
+        dtype=np.int64,
+    )
 
-    # get all the edges for IM->IM on the impedance network
+    # get all the edges for IM->IM on the impedance network, walking the shortest path trees of a batch
+    # of terminals back from every other terminal at once
+    graph = CSRGraph.from_igraph(impedance_rail_graph_with_terminals, "length")
     edge_set: set[int] = set()
-    for idx, im_from in enumerate(im_indices):
-        destinations = [i for i in im_indices if i != im_from]
-        edge_results = impedance_rail_graph_with_terminals.get_shortest_paths(
-            im_from, destinations, weights="length", output="epath"
-        )
-        edge_set.update(chain.from_iterable(edge_results))
+    for _, batch_terminals, _, predecessors in graph.batched_dijkstra(im_indices):
+        tree = np.repeat(np.arange(len(batch_terminals)), len(im_indices))
+        targets = np.tile(im_indices, len(batch_terminals))
+        edge_set.update(graph.path_edges(predecessors, tree, targets).tolist())
 
     # get the edges between IM->IM_dummy and IM_dummy->Impedance network
     im_capacity_edges = [
@@ -343,5 +387,43 @@ def impedance_rail_graph_with_terminals_reduced(
     edge_set.update(im_dummy_edges)
     small_g = impedance_rail_graph_with_terminals.subgraph_edges(edge_set)
     context.log.info(f"Graph has {len(small_g.vs)} nodes and {len(small_g.es)} edges.")
-    assert small_g.is_connected()
+    assert CSRGraph.from_igraph(small_g).is_strongly_connected()
     return small_g
+
+
+@dagster.asset(
+    io_manager_key="skim_io_manager",
+    metadata={"format": "skim", **INTERMEDIATE_DIRECTORY_ARGS},
+)
+@instrumented
+def rail_terminal_skim(
+    context: dagster.AssetExecutionContext,
+    impedance_rail_graph_with_terminals: ig.Graph,
+    config: RailTerminalSkimConfig,
+) -> TerminalSkim:
+    """IM terminal to IM terminal rail generalized cost (impedance equivalent miles, i.e. the `length` of the
+    impedance network) over every pair of terminals, optionally with the edges of each path. Persisted as
+    memory-mappable arrays so that downstream analyses look up costs without rerunning shortest paths.
+    """
+    im_vertices = impedance_rail_graph_with_terminals.vs.select(
+        vertex_type=VertexType.IM_TERMINAL.value
+    )
+    terminals = pd.DataFrame(
+        {
+            "vertex": [v.index for v in im_vertices],
+            "terminal_idx": im_vertices["terminal_idx"],
+            "terminal_name": im_vertices["terminal_name"],
+        }
+    )
+    graph = CSRGraph.from_igraph(impedance_rail_graph_with_terminals, "length")
+    skim = compute_terminal_skim(graph, terminals, keep_path_edges=config.keep_path_edges)
+
+    off_diagonal = ~np.eye(skim.n_terminals, dtype=bool)
+    unreachable_pairs = int(np.isinf(skim.cost[off_diagonal]).sum())
+    context.log.info(
+        f"Skimmed {skim.n_terminals} terminals. {unreachable_pairs} terminal pairs are unreachable."
+    )
+    context.add_output_metadata(
+        {"terminals": skim.n_terminals, "unreachable_terminal_pairs": unreachable_pairs}
+    )
+    return skim
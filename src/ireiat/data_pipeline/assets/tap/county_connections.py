@@ -5,7 +5,6 @@ import dagster
 import geopandas
 import igraph as ig
 import numpy as np
-from sklearn.neighbors import BallTree
 
 from ireiat.config.constants import (
     EXCLUDED_FIPS_CODES_MAP,
@@ -15,12 +14,15 @@ from ireiat.config.constants import (
 )
 from ireiat.config.data_pipeline import TAPRailConfig
 from ireiat.config.rail_enum import EdgeType, VertexType
+from ireiat.data_pipeline.instrumentation import instrumented
+from ireiat.util.csr_graph import CSRGraph
+from ireiat.util.spatial import HaversineKDTree
 
 
 def _generate_network_indices_from_ball_tree(
     context: dagster.AssetExecutionContext,
     county_centroids: Dict[Tuple[str, str], Tuple[float, float]],
-    bt: BallTree,
+    bt: HaversineKDTree,
 ) -> Dict[Tuple[str, str], int]:
     """Helper function for assets"""
     centroid_radians = np.deg2rad(np.array(np.array(list(county_centroids.values()))))
@@ -41,6 +43,7 @@ def _generate_network_indices_from_ball_tree(
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def county_fips_to_centroid(
     us_county_shp_files_src: geopandas.GeoDataFrame,
 ) -> Dict[Tuple[str, str], Tuple[float, float]]:
@@ -61,10 +64,11 @@ def county_fips_to_centroid(
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def county_fips_to_highway_network_node_idx(
     context: dagster.AssetExecutionContext,
     county_fips_to_centroid: Dict[Tuple[str, str], Tuple[float, float]],
-    highway_ball_tree: BallTree,
+    highway_ball_tree: HaversineKDTree,
 ) -> Dict[Tuple[str, str], int]:
     """Map all county centroids to the nearest highway nodes returning a dict of (STATE, COUNTY) -> highway node"""
     return _generate_network_indices_from_ball_tree(
@@ -73,10 +77,11 @@ def county_fips_to_highway_network_node_idx(
 
 
 @dagster.asset(io_manager_key="default_io_manager_intermediate_path")
+@instrumented
 def county_fips_to_marine_network_node_idx(
     context: dagster.AssetExecutionContext,
     county_fips_to_centroid: Dict[Tuple[str, str], Tuple[float, float]],
-    marine_ball_tree: BallTree,
+    marine_ball_tree: HaversineKDTree,
 ) -> Dict[Tuple[str, str], int]:
     """Map all county centroids to the nearest marine nodes returning a dict of (STATE, COUNTY) -> marine node"""
     return _generate_network_indices_from_ball_tree(
@@ -94,6 +99,7 @@ def county_fips_to_marine_network_node_idx(
         ),
     }
 )
+@instrumented
 def rail_county_association(
     context: dagster.AssetExecutionContext,
     impedance_rail_graph_with_terminals_reduced: ig.Graph,
@@ -108,7 +114,7 @@ def rail_county_association(
     g = impedance_rail_graph_with_terminals_reduced
     im_lat_longs = [v["coords"] for v in g.vs.select(vertex_type=VertexType.IM_TERMINAL.value)]
     im_lat_longs_radians = np.deg2rad(np.array(im_lat_longs))
-    im_node_ball_tree = BallTree(im_lat_longs_radians, metric="haversine")
+    im_node_ball_tree = HaversineKDTree(im_lat_longs_radians)
 
     search_radius_radians = config.intermodal_search_radius_miles / RADIUS_EARTH_MILES
     county_lat_longs = list(county_fips_to_centroid.values())
@@ -149,7 +155,7 @@ def rail_county_association(
     # create a ball tree
     im_node_lat_longs = list(im_coords_to_vertex_idx.keys())
     im_lat_longs_radians = np.deg2rad(np.array(im_node_lat_longs))
-    im_node_ball_tree = BallTree(im_lat_longs_radians, metric="haversine")
+    im_node_ball_tree = HaversineKDTree(im_lat_longs_radians)
 
     search_radius_radians = config.intermodal_search_radius_miles / RADIUS_EARTH_MILES
     county_lat_longs = list(county_centroid_coords_to_vertex_idx.keys())
@@ -182,7 +188,7 @@ def rail_county_association(
 
     g.add_edges(edges_to_add, attributes=edge_attributes)
 
-    assert g.is_connected()
+    assert CSRGraph.from_igraph(g).is_strongly_connected()
 
     county_fips_to_rail_network_node_idx = {
         k: county_centroid_coords_to_vertex_idx[v]
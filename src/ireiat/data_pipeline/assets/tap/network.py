@@ -1,3 +1,5 @@
+from typing import Dict, Tuple
+
 import dagster
 import igraph
 import igraph as ig
@@ -9,7 +11,11 @@ from ireiat.config.constants import (
 )
 from ireiat.config.data_pipeline import TAPNetworkConfig, TAPRailConfig
 from ireiat.config.rail_enum import EdgeType
+from ireiat.data_pipeline.assets.rail_network import OWNER_VOCABULARY_ATTRIBUTE
+from ireiat.data_pipeline.assets.rail_network.impedance import IMPEDANCE_OWNER_MASK
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
+from ireiat.util.contraction import contract_degree_two_chains
 
 
 @dagster.asset(
@@ -20,6 +26,7 @@ from ireiat.data_pipeline.metadata import publish_metadata
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def tap_highway_network_dataframe(
     context: dagster.AssetExecutionContext,
     strongly_connected_highway_graph: igraph.Graph,
@@ -28,7 +35,15 @@ def tap_highway_network_dataframe(
     """Entire highway network to represent the TAP, complete with capacity and cost information"""
     # generate a dataframe from the graph
     connected_edge_tuples = [
-        (e.source, e.target, e["length"], e["speed"], *e["origin_coords"], *e["destination_coords"])
+        (
+            e.source,
+            e.target,
+            e["length"],
+            e["speed"],
+            e["original_id"],
+            *e["origin_coords"],
+            *e["destination_coords"],
+        )
         for e in strongly_connected_highway_graph.es
     ]
 
@@ -40,6 +55,7 @@ def tap_highway_network_dataframe(
             "head",
             "length",
             "speed",
+            "original_id",
             "origin_latitude",
             "origin_longitude",
             "destination_latitude",
@@ -74,6 +90,7 @@ def tap_highway_network_dataframe(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def tap_rail_network_dataframe(
     context: dagster.AssetExecutionContext,
     rail_graph_with_county_connections: ig.Graph,
@@ -81,16 +98,40 @@ def tap_rail_network_dataframe(
 ) -> pd.DataFrame:
     """Entire rail network to represent the TAP, complete with capacity and cost information"""
     # fill out other fields needed for the TAP
+    vocabulary = rail_graph_with_county_connections[OWNER_VOCABULARY_ATTRIBUTE]
+
+    def owner_label(owners):
+        return "imp" if owners == IMPEDANCE_OWNER_MASK else vocabulary.label(owners)
 
     connected_edge_tuples = [
-        (e.source, e.target, e["length"], e["edge_type"], e["owners"], e["speed"], e["tracks"])
+        (
+            e.source,
+            e.target,
+            e["length"],
+            e["edge_type"],
+            owner_label(e["owners"]),
+            e["speed"],
+            e["tracks"],
+            e["original_id"],
+            e["fraarcid"],
+        )
         for e in rail_graph_with_county_connections.es
     ]
 
     # create and return a dataframe
     tap_network = pd.DataFrame(
         connected_edge_tuples,
-        columns=["tail", "head", "length", "edge_type", "owners", "speed", "tracks"],
+        columns=[
+            "tail",
+            "head",
+            "length",
+            "edge_type",
+            "owners",
+            "speed",
+            "tracks",
+            "original_id",
+            "fraarcid",
+        ],
     )
 
     tap_network["speed"] = tap_network["speed"].fillna(config.default_speed_mph)
@@ -135,6 +176,7 @@ def tap_rail_network_dataframe(
         **INTERMEDIATE_DIRECTORY_ARGS,
     },
 )
+@instrumented
 def tap_marine_network_dataframe(
     context: dagster.AssetExecutionContext,
     strongly_connected_marine_graph: igraph.Graph,
@@ -142,7 +184,14 @@ def tap_marine_network_dataframe(
 ) -> pd.DataFrame:
     """Entire marine network to represent the TAP, complete with capacity and cost information"""
     connected_edge_tuples = [
-        (e.source, e.target, e["length"], *e["origin_coords"], *e["destination_coords"])
+        (
+            e.source,
+            e.target,
+            e["length"],
+            e["original_id"],
+            *e["origin_coords"],
+            *e["destination_coords"],
+        )
         for e in strongly_connected_marine_graph.es
     ]
 
@@ -153,6 +202,7 @@ def tap_marine_network_dataframe(
             "tail",
             "head",
             "length",
+            "original_id",
             "origin_latitude",
             "origin_longitude",
             "destination_latitude",
@@ -179,3 +229,64 @@ def tap_marine_network_dataframe(
     context.log.info(f"TAP marine network dataframe created with {len(tap_network)} edges.")
     publish_metadata(context, tap_network)
     return tap_network
+
+
+def _contract_tap_network(
+    context: dagster.AssetExecutionContext,
+    tap_network: pd.DataFrame,
+    county_fips_to_network_node_idx: Dict[Tuple[str, str], int],
+) -> pd.DataFrame:
+    """Contracts the degree-2 chains of a TAP network, keeping the nodes that counties attach to"""
+    contracted = contract_degree_two_chains(
+        tap_network, protected_nodes=set(county_fips_to_network_node_idx.values())
+    )
+    context.log.info(
+        f"Contracted {len(tap_network)} edges into {len(contracted)} links "
+        f"({len(tap_network) / max(len(contracted), 1):.1f}x fewer)."
+    )
+    publish_metadata(context, contracted)
+    return contracted
+
+
+@dagster.asset(
+    io_manager_key="custom_io_manager",
+    metadata={
+        "format": "parquet",
+        "write_kwargs": dagster.MetadataValue.json({"index": False}),
+        **INTERMEDIATE_DIRECTORY_ARGS,
+    },
+)
+@instrumented
+def tap_highway_network_dataframe_contracted(
+    context: dagster.AssetExecutionContext,
+    tap_highway_network_dataframe: pd.DataFrame,
+    county_fips_to_highway_network_node_idx: Dict[Tuple[str, str], int],
+) -> pd.DataFrame:
+    """Highway TAP network with chains of degree-2 (shape point) nodes contracted into single links, each
+    listing the `original_ids` it replaces. Solves on the same O-D file as the uncontracted network.
+    """
+    return _contract_tap_network(
+        context, tap_highway_network_dataframe, county_fips_to_highway_network_node_idx
+    )
+
+
+@dagster.asset(
+    io_manager_key="custom_io_manager",
+    metadata={
+        "format": "parquet",
+        "write_kwargs": dagster.MetadataValue.json({"index": False}),
+        **INTERMEDIATE_DIRECTORY_ARGS,
+    },
+)
+@instrumented
+def tap_marine_network_dataframe_contracted(
+    context: dagster.AssetExecutionContext,
+    tap_marine_network_dataframe: pd.DataFrame,
+    county_fips_to_marine_network_node_idx: Dict[Tuple[str, str], int],
+) -> pd.DataFrame:
+    """Marine TAP network with chains of degree-2 (shape point) nodes contracted into single links, each
+    listing the `original_ids` it replaces. Solves on the same O-D file as the uncontracted network.
+    """
+    return _contract_tap_network(
+        context, tap_marine_network_dataframe, county_fips_to_marine_network_node_idx
+    )
@@ -1,57 +1,90 @@
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 import dagster
+import numpy as np
 import pandas as pd
 
-from ireiat.config.constants import EXCLUDED_FIPS_CODES_MAP, INTERMEDIATE_DIRECTORY_ARGS
+from ireiat.config.constants import (
+    COMMODITY_FIELD,
+    EXCLUDED_FIPS_CODES_MAP,
+    INTERMEDIATE_DIRECTORY_ARGS,
+)
 from ireiat.config.data_pipeline import TAPFilterTonsConfig
 from ireiat.data_pipeline.metadata import publish_metadata
+from ireiat.data_pipeline.instrumentation import instrumented
+
+COUNTY_OD_FIELDS = ["state_orig", "county_orig", "state_dest", "county_dest"]
+
+
+def _tons_columns(county_tons: pd.DataFrame) -> List[str]:
+    """`tons` and any horizon tons columns (e.g. `tons_2030`) of a county OD dataframe"""
+    return [c for c in county_tons.columns if c not in COUNTY_OD_FIELDS + [COMMODITY_FIELD]]
 
 
 def _generate_tons_dataframe(
     context: dagster.AssetExecutionContext,
     in_network_tons: pd.DataFrame,
     county_fips_to_network_node_idx: Dict[Tuple[str, str], int],
-) -> pd.DataFrame:
-    """Helper function to associate (STATE, COUNTY) tons to a target network node ID mapping"""
-    od_tuples = []
-    included_tons, excluded_tons = 0, 0
-    for row in in_network_tons.itertuples():
-        orig = (row.state_orig, row.county_orig)
-        dest = (row.state_dest, row.county_dest)
-        if (
-            orig not in county_fips_to_network_node_idx
-            or dest not in county_fips_to_network_node_idx
-        ):
-            excluded_tons += row.tons
-            continue
-        od_tuples.append(
-            (
-                county_fips_to_network_node_idx[orig],
-                county_fips_to_network_node_idx[dest],
-                row.tons,
-            )
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Helper function to associate (STATE, COUNTY) tons to a target network node ID mapping. The commodity
+    column, if present, is kept (dictionary encoded).
+
+    Several counties often attach to the same network node, so the tons are compacted into a sparse OD
+    matrix: int32 `from` and `to` node ids with the tons of each (from, to, [commodity]) summed and sorted,
+    so that the pairs of each origin are contiguous rows and the solver reads them without regrouping (see
+    `ireiat.solver.demand.ODDemand`). Also returns the county pairs behind each OD row (its `od_index`)
+    for reporting results by county. Horizon tons columns (e.g. `tons_2030`) are summed alongside `tons`.
+    """
+    by_commodity = COMMODITY_FIELD in in_network_tons.columns
+    county_index = pd.MultiIndex.from_tuples(list(county_fips_to_network_node_idx.keys()))
+    node_ids = np.fromiter(county_fips_to_network_node_idx.values(), dtype=np.int32)
+
+    def node_positions(state_field: str, county_field: str) -> np.ndarray:
+        return county_index.get_indexer(
+            pd.MultiIndex.from_arrays([in_network_tons[state_field], in_network_tons[county_field]])
         )
-        included_tons += row.tons
+
+    orig = node_positions("state_orig", "county_orig")
+    dest = node_positions("state_dest", "county_dest")
+    is_included = (orig >= 0) & (dest >= 0)
+    tons = in_network_tons["tons"].to_numpy(dtype=np.float64)
+    included_tons, excluded_tons = tons[is_included].sum(), tons[~is_included].sum()
 
     total_tons = included_tons + excluded_tons
     context.log.info(
         f"Tons excluded {excluded_tons}, tons included {included_tons}: {excluded_tons / total_tons:.1%}"
     )
 
-    trips = pd.DataFrame(od_tuples, columns=["from", "to", "tons"]).sort_values(["from", "to"])
-    publish_metadata(context, trips)
-    return trips
+    county_pairs = in_network_tons.loc[is_included].reset_index(drop=True)
+    county_pairs.insert(0, "from", node_ids[orig[is_included]])
+    county_pairs.insert(1, "to", node_ids[dest[is_included]])
+    if by_commodity:
+        county_pairs[COMMODITY_FIELD] = county_pairs[COMMODITY_FIELD].astype("category")
+
+    od_fields = ["from", "to", *([COMMODITY_FIELD] if by_commodity else [])]
+    by_od = county_pairs.groupby(od_fields, observed=True, sort=True)
+    trips = by_od[_tons_columns(in_network_tons)].sum().reset_index()
+    county_pairs.insert(0, "od_index", by_od.ngroup().to_numpy(dtype=np.int32))
+    county_pairs = county_pairs.sort_values("od_index", kind="stable").reset_index(drop=True)
+    context.log.info(
+        f"Compacted {len(county_pairs):,} county pairs into {len(trips):,} OD rows, "
+        f"{county_pairs.groupby(['state_orig', 'county_orig'], observed=True).ngroups:,} origin "
+        f"counties into {trips['from'].nunique():,} origin nodes"
+    )
+    return trips, county_pairs
 
 
 def _filter_tons_dataframe(
     context: dagster.AssetExecutionContext,
     tons_dataframe: pd.DataFrame,
     quantile_threshold: Optional[float] = None,
+    output_name: Optional[str] = None,
 ) -> pd.DataFrame:
     """Filters a state_orig | county_orig | state_dest | county_dest to exclude counties outside
     the continential US and to exclude counties with self-circulating flows. If `quantile_threshold`
-    is specified, the dataframe is further filtered to include only tons above that quantile."""
+    is specified, the dataframe is further filtered to include only tons above that quantile. When tons are
+    split by commodity, the quantile applies to the total tons of each county pair, so that commodities of
+    a retained pair are all kept."""
     # eliminate states and territories we're not interested in
     relevant_county_ods = tons_dataframe.loc[
         ~(
@@ -78,89 +111,111 @@ def _filter_tons_dataframe(
     if quantile_threshold is None:
         return non_self_county_ods.reset_index(drop=True)
 
-    tons_threshold = non_self_county_ods["tons"].quantile(quantile_threshold)
-    subset_county_od = non_self_county_ods.loc[non_self_county_ods["tons"] > tons_threshold]
-
-    subset_county_od = subset_county_od.sort_values(
-        ["state_orig", "county_orig", "state_dest", "county_dest"]
-    )
+    if COMMODITY_FIELD in non_self_county_ods.columns:
+        county_pair_tons = non_self_county_ods.groupby(COUNTY_OD_FIELDS, observed=True)["tons"]
+        tons_threshold = county_pair_tons.sum().quantile(quantile_threshold)
+        is_above_threshold = county_pair_tons.transform("sum") > tons_threshold
+        sort_fields = COUNTY_OD_FIELDS + [COMMODITY_FIELD]
+    else:
+        tons_threshold = non_self_county_ods["tons"].quantile(quantile_threshold)
+        is_above_threshold = non_self_county_ods["tons"] > tons_threshold
+        sort_fields = COUNTY_OD_FIELDS
+    subset_county_od = non_self_county_ods.loc[is_above_threshold]
+
+    subset_county_od = subset_county_od.sort_values(sort_fields)
     context.log.info(subset_county_od["tons"].describe())
     context.log.info(subset_county_od["tons"].sum() / non_self_county_ods["tons"].sum())
     reindexed_subset_county_od = subset_county_od.reset_index(drop=True)
-    publish_metadata(context, reindexed_subset_county_od)
+    publish_metadata(context, reindexed_subset_county_od, output_name=output_name)
     return reindexed_subset_county_od
 
 
-@dagster.asset(
-    io_manager_key="custom_io_manager",
-    metadata={
+def _tap_tons_outs(mode: str) -> Dict[str, dagster.AssetOut]:
+    """Outputs of the tons of a `mode` network: the OD tons and the county pairs behind them"""
+    metadata = {
         "format": "parquet",
-        "write_kwargs": dagster.MetadataValue.json(
-            {"index": False},
-        ),
+        "write_kwargs": dagster.MetadataValue.json({"index": False}),
         **INTERMEDIATE_DIRECTORY_ARGS,
-    },
-)
+    }
+    return {
+        f"tap_{mode}_tons": dagster.AssetOut(io_manager_key="custom_io_manager", metadata=metadata),
+        f"tap_{mode}_tons_county_pairs": dagster.AssetOut(
+            io_manager_key="custom_io_manager", metadata=metadata
+        ),
+    }
+
+
+def _tap_tons(
+    context: dagster.AssetExecutionContext,
+    mode: str,
+    county_to_county_tons: pd.DataFrame,
+    county_fips_to_network_node_idx: Dict[Tuple[str, str], int],
+    config: TAPFilterTonsConfig,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    tons_name = f"tap_{mode}_tons"
+    in_network_tons = _filter_tons_dataframe(
+        context,
+        county_to_county_tons,
+        quantile_threshold=config.quantile_threshold,
+        output_name=tons_name,
+    )
+    tons, county_pairs = _generate_tons_dataframe(
+        context, in_network_tons, county_fips_to_network_node_idx
+    )
+    publish_metadata(context, tons, output_name=tons_name)
+    publish_metadata(context, county_pairs, output_name=f"{tons_name}_county_pairs")
+    return tons, county_pairs
+
+
+@dagster.multi_asset(outs=_tap_tons_outs("highway"))
+@instrumented
 def tap_highway_tons(
     context: dagster.AssetExecutionContext,
     county_to_county_highway_tons: pd.DataFrame,
     county_fips_to_highway_network_node_idx: Dict[Tuple[str, str], int],
     config: TAPFilterTonsConfig,
-) -> pd.DataFrame:
-    """Tons attached to the highway network nodes (from, to, tons)"""
-    in_network_highway_tons = _filter_tons_dataframe(
-        context, county_to_county_highway_tons, quantile_threshold=config.quantile_threshold
-    )
-    return _generate_tons_dataframe(
-        context, in_network_highway_tons, county_fips_to_highway_network_node_idx
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tons attached to the highway network nodes (from, to, tons), and the county pairs of each row"""
+    return _tap_tons(
+        context,
+        "highway",
+        county_to_county_highway_tons,
+        county_fips_to_highway_network_node_idx,
+        config,
     )
 
 
-@dagster.asset(
-    io_manager_key="custom_io_manager",
-    metadata={
-        "format": "parquet",
-        "write_kwargs": dagster.MetadataValue.json(
-            {"index": False},
-        ),
-        **INTERMEDIATE_DIRECTORY_ARGS,
-    },
-)
+@dagster.multi_asset(outs=_tap_tons_outs("marine"))
+@instrumented
 def tap_marine_tons(
     context: dagster.AssetExecutionContext,
     county_to_county_marine_tons: pd.DataFrame,
     county_fips_to_marine_network_node_idx: Dict[Tuple[str, str], int],
     config: TAPFilterTonsConfig,
-) -> pd.DataFrame:
-    """Tons attached to the marine network nodes (from, to, tons)"""
-    in_network_marine_tons = _filter_tons_dataframe(
-        context, county_to_county_marine_tons, quantile_threshold=config.quantile_threshold
-    )
-    return _generate_tons_dataframe(
-        context, in_network_marine_tons, county_fips_to_marine_network_node_idx
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tons attached to the marine network nodes (from, to, tons), and the county pairs of each row"""
+    return _tap_tons(
+        context,
+        "marine",
+        county_to_county_marine_tons,
+        county_fips_to_marine_network_node_idx,
+        config,
     )
 
 
-@dagster.asset(
-    io_manager_key="custom_io_manager",
-    metadata={
-        "format": "parquet",
-        "write_kwargs": dagster.MetadataValue.json(
-            {"index": False},
-        ),
-        **INTERMEDIATE_DIRECTORY_ARGS,
-    },
-)
+@dagster.multi_asset(outs=_tap_tons_outs("rail"))
+@instrumented
 def tap_rail_tons(
     context: dagster.AssetExecutionContext,
     county_to_county_rail_tons: pd.DataFrame,
     county_fips_to_rail_network_node_idx: Dict[Tuple[str, str], int],
     config: TAPFilterTonsConfig,
-) -> pd.DataFrame:
-    """Tons attached to the marine network nodes (from, to, tons)"""
-    in_network_rail_tons = _filter_tons_dataframe(
-        context, county_to_county_rail_tons, quantile_threshold=config.quantile_threshold
-    )
-    return _generate_tons_dataframe(
-        context, in_network_rail_tons, county_fips_to_rail_network_node_idx
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Tons attached to the rail network nodes (from, to, tons), and the county pairs of each row"""
+    return _tap_tons(
+        context,
+        "rail",
+        county_to_county_rail_tons,
+        county_fips_to_rail_network_node_idx,
+        config,
     )
@@ -0,0 +1,220 @@
+"""Opt-in profiling and resource instrumentation for data pipeline assets.
+
+Every asset function is wrapped with `instrumented`, which does nothing unless instrumentation is enabled
+with the `IREIAT_INSTRUMENT` environment variable. When enabled, each asset records its wall time, CPU
+time, peak RSS, input/output row counts and serialized (pickled) output size as Dagster output metadata
+and appends the same record to a run-level report at `{CACHE_PATH}/profiles/{run_id}.jsonl`.
+
+Assets listed in `IREIAT_PROFILE_ASSETS` (comma-separated asset names, or `*` for all) are additionally
+profiled with cProfile, or with pyinstrument if `IREIAT_PROFILER=pyinstrument` and it is installed. Profiles
+are written next to the run report."""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import pickle
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import dagster
+import igraph as ig
+import pandas as pd
+
+from ireiat.config.constants import CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_ENV_VAR = "IREIAT_INSTRUMENT"
+PROFILE_ASSETS_ENV_VAR = "IREIAT_PROFILE_ASSETS"
+PROFILER_ENV_VAR = "IREIAT_PROFILER"
+PROFILES_PATH = "profiles"
+
+
+def instrumentation_enabled() -> bool:
+    return os.getenv(INSTRUMENT_ENV_VAR, "").strip().lower() in {"1", "true", "yes"}
+
+
+def _profile_requested(asset_name: str) -> bool:
+    requested = {a.strip() for a in os.getenv(PROFILE_ASSETS_ENV_VAR, "").split(",") if a.strip()}
+    return "*" in requested or asset_name in requested
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the resident set size of this process. Dagster's default executor runs each
+    asset in its own process, so this is (close to) the peak of the asset itself."""
+    try:
+        import resource
+
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss)  # peak working set on Windows
+    except ImportError:
+        return None
+
+
+def count_rows(obj: Any) -> Optional[int]:
+    """Rows of a dataframe, edges of a graph or entries of a collection; None for anything else"""
+    if isinstance(obj, (pd.DataFrame, pd.Series, dict, list, tuple, set)):
+        return len(obj)
+    if isinstance(obj, ig.Graph):
+        return obj.ecount()
+    return None
+
+
+class _ByteCounter:
+    """File-like object counting the bytes written to it, so that an object's pickled size can be measured
+    without holding the pickle in memory"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        return len(data)
+
+
+def serialized_size(obj: Any) -> Optional[int]:
+    """Size in bytes of `obj` pickled, or None if it cannot be pickled"""
+    counter = _ByteCounter()
+    try:
+        pickle.dump(obj, counter, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    return counter.size
+
+
+def report_path(run_id: str) -> Path:
+    """Location of the run-level instrumentation report"""
+    return CACHE_PATH / PROFILES_PATH / f"{run_id}.jsonl"
+
+
+def _start_profiler(asset_name: str):
+    if os.getenv(PROFILER_ENV_VAR, "cprofile").strip().lower() == "pyinstrument":
+        try:
+            import pyinstrument
+
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+        except ImportError:
+            logger.warning(f"pyinstrument is not installed. Profiling {asset_name} with cProfile.")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, run_id: str, asset_name: str) -> Path:
+    profile_dir = CACHE_PATH / PROFILES_PATH / run_id
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profile_path = profile_dir / f"{asset_name}.prof"
+        profiler.dump_stats(profile_path)
+    else:
+        profiler.stop()
+        profile_path = profile_dir / f"{asset_name}.html"
+        profile_path.write_text(profiler.output_html())
+    return profile_path
+
+
+def _output_names(context: dagster.AssetExecutionContext, n_outputs: int) -> list:
+    """Names of the outputs of the asset, in the order in which they are returned"""
+    output_names = [output_def.name for output_def in context.op_def.output_defs]
+    return output_names if len(output_names) == n_outputs else [None]
+
+
+def _publish(context: dagster.AssetExecutionContext, result: Any, record: Dict[str, Any]) -> None:
+    """Adds the instrumentation record (with per-output row counts and sizes) as output metadata"""
+    multiple_outputs = isinstance(result, tuple) and len(context.op_def.output_defs) > 1
+    outputs = result if multiple_outputs else (result,)
+    record["outputs"] = {}
+    for output_name, output in zip(_output_names(context, len(outputs)), outputs):
+        output_record = {"rows": count_rows(output), "serialized_bytes": serialized_size(output)}
+        record["outputs"][output_name or "result"] = output_record
+        metadata = {
+            "wall_time_seconds": record["wall_time_seconds"],
+            "cpu_time_seconds": record["cpu_time_seconds"],
+            "input_rows": dagster.MetadataValue.json(record["input_rows"]),
+            "output_rows": output_record["rows"],
+            "serialized_output_mb": (
+                round(output_record["serialized_bytes"] / 1024**2, 3)
+                if output_record["serialized_bytes"] is not None
+                else None
+            ),
+        }
+        if record["peak_rss_mb"] is not None:
+            metadata["peak_rss_mb"] = record["peak_rss_mb"]
+        if record.get("profile_path"):
+            metadata["profile_path"] = dagster.MetadataValue.path(record["profile_path"])
+        metadata = {k: v for k, v in metadata.items() if v is not None}
+        if output_name:
+            context.add_output_metadata(metadata, output_name=output_name)
+        else:
+            context.add_output_metadata(metadata)
+
+
+def _write_report(run_id: str, record: Dict[str, Any]) -> None:
+    path = report_path(run_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fp:
+        fp.write(json.dumps(record) + "\n")
+
+
+def instrumented(fn: Callable) -> Callable:
+    """Wraps an asset function to record its resource usage when `IREIAT_INSTRUMENT` is set. Apply it
+    below the `dagster.asset` (or `dagster.multi_asset`) decorator."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not instrumentation_enabled():
+            return fn(*args, **kwargs)
+
+        context = dagster.AssetExecutionContext.get()
+        asset_name = fn.__name__ if fn.__name__ != "_asset" else context.asset_key.to_user_string()
+        run_id = context.run.run_id
+        input_rows = {
+            name: count_rows(value)
+            for name, value in kwargs.items()
+            if not isinstance(value, dagster.Config)
+        }
+        profiler = _start_profiler(asset_name) if _profile_requested(asset_name) else None
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        profile_path = None
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            # a failing asset is when its profile is most useful, so it is written regardless
+            if profiler is not None:
+                profile_path = _stop_profiler(profiler, run_id, asset_name)
+
+        peak_rss = _peak_rss_bytes()
+        record: Dict[str, Any] = {
+            "run_id": run_id,
+            "asset": asset_name,
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_time_seconds": round(wall_time, 3),
+            "cpu_time_seconds": round(cpu_time, 3),
+            "peak_rss_mb": round(peak_rss / 1024**2, 1) if peak_rss is not None else None,
+            "input_rows": input_rows,
+        }
+        if profile_path is not None:
+            record["profile_path"] = str(profile_path)
+        _publish(context, result, record)
+        _write_report(run_id, record)
+        return result
+
+    return wrapper
@@ -1,17 +1,31 @@
+import hashlib
+import json
+import logging
 import tempfile
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, Mapping, Callable
+from typing import Optional, Mapping, Callable, Iterable, List
 from zipfile import ZipFile
 
 import dagster
 import geopandas
 import pandas as pd
 import pyogrio
+from tqdm import tqdm
 
 from ireiat.config.constants import CACHE_PATH
 from ireiat.data_pipeline.metadata import publish_metadata
-from ireiat.util.http import download_uncached_file
+from ireiat.data_pipeline.instrumentation import instrumented
+from ireiat.util.http import download_uncached_file, read_sentinel, file_sha256
+from ireiat.util.skim import TerminalSkim
+
+logger = logging.getLogger(__name__)
+
+#: all asset specs that have been turned into `_src` assets by `asset_spec_factory`
+_REGISTERED_ASSET_SPECS: List[dagster.AssetSpec] = []
+
+#: asset that downloads every registered spec concurrently before any `_src` asset runs
+PREFETCH_ASSET_KEY = dagster.AssetKey("raw_sources_prefetch")
 
 
 def _get_read_function(format: str, metadata: dict = None) -> Callable:
@@ -23,7 +37,7 @@ def _get_read_function(format: str, metadata: dict = None) -> Callable:
             if metadata and metadata.get("use_geopandas", False)
             else pd.read_parquet
         ),
-        "zip": partial(pyogrio.read_dataframe, use_arrow=True),
+        "zip": _read_zip_with_geoparquet_cache,
         "txt": pd.read_table,
         "xlsx": pd.read_excel,
     }
@@ -47,6 +61,47 @@ def _temp_unzip_and_read(fpath, **kwargs):
     return pdf
 
 
+def _geoparquet_sidecar_path(fpath: str, read_kwargs: Optional[dict] = None) -> Path:
+    """Path of the GeoParquet copy of the zipped shapefile at `fpath` read with `read_kwargs`, keyed on the
+    zip's checksum (and the read options, if any). The checksum recorded in the download sentinel is used
+    if available."""
+    sentinel = read_sentinel(fpath) or dict()
+    digest = sentinel.get("sha256") or file_sha256(fpath)
+    zip_path = Path(fpath)
+    key = digest[:16]
+    if read_kwargs:
+        options = json.dumps(read_kwargs, sort_keys=True, default=str)
+        key = f"{key}.{hashlib.sha256(options.encode()).hexdigest()[:8]}"
+    return zip_path.parent / f"{zip_path.stem}.{key}.parquet"
+
+
+def _read_zip_with_geoparquet_cache(
+    fpath, columns: Optional[List[str]] = None, bbox: Optional[tuple] = None, **kwargs
+) -> geopandas.GeoDataFrame:
+    """Reads a zipped shapefile. The first read converts the whole shapefile into a GeoParquet sidecar
+    next to the zip, which is read on every later run instead. `columns` and `bbox` (in the CRS of the
+    file) are pushed down to the parquet read; any other `kwargs` are passed to the shapefile read and
+    get a sidecar of their own."""
+    sidecar_path = _geoparquet_sidecar_path(fpath, kwargs)
+    if not sidecar_path.exists():
+        logger.info(f"Converting {fpath} to GeoParquet at {sidecar_path}")
+        gdf = pyogrio.read_dataframe(fpath, use_arrow=True, **kwargs)
+        # sidecars of an earlier version of the zip
+        zip_key = _geoparquet_sidecar_path(fpath).stem
+        for stale_sidecar in sidecar_path.parent.glob(f"{Path(fpath).stem}.*.parquet"):
+            if not stale_sidecar.name.startswith(f"{zip_key}."):
+                stale_sidecar.unlink()
+        temporary_path = sidecar_path.with_suffix(".tmp")
+        gdf.to_parquet(temporary_path, write_covering_bbox=True)
+        temporary_path.replace(sidecar_path)
+
+    if columns is not None and "geometry" not in columns:
+        columns = [*columns, "geometry"]
+    return geopandas.read_parquet(
+        sidecar_path, columns=columns, bbox=tuple(bbox) if bbox is not None else None
+    )
+
+
 def _get_fs_path(asset_key: dagster.AssetKey, metadata: Optional[Mapping]) -> str:
     """Gets the filesystem path based on the asset key and/or metadata.
     If the full source_path `some_file.csv` is passed, then use that. Otherwise use
@@ -84,6 +139,38 @@ def read_or_attempt_download(
     return read_func(fpath, **parsed_read_kwargs)
 
 
+def registered_asset_specs() -> List[dagster.AssetSpec]:
+    """Returns the asset specs registered through `asset_spec_factory`. Note that specs are only
+    registered once the modules defining them (i.e. `ireiat.data_pipeline`) have been imported."""
+    return list(_REGISTERED_ASSET_SPECS)
+
+
+def prefetch_asset_specs(
+    specs: Iterable[dagster.AssetSpec], max_workers: int = 4, force: bool = False
+) -> List[str]:
+    """Concurrently downloads every spec with a `dashboard_url` to its filesystem path, showing
+    a single progress bar across all files. Returns the paths of the downloaded files."""
+    downloads = {
+        _get_fs_path(spec.key, spec.metadata): spec.metadata["dashboard_url"].url
+        for spec in specs
+        if spec.metadata.get("dashboard_url")
+    }
+    logger.info(f"Prefetching {len(downloads)} source files with {max_workers} workers")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                download_uncached_file, url, fpath, force=force, show_progress=False
+            ): fpath
+            for fpath, url in downloads.items()
+        }
+        with tqdm(total=len(futures), unit="file", desc="Prefetching sources") as progress_bar:
+            for future in as_completed(futures):
+                future.result()  # re-raise any download error
+                progress_bar.set_postfix_str(Path(futures[future]).name)
+                progress_bar.update(1)
+    return list(downloads.keys())
+
+
 class TabularDataLocalIOManager(dagster.ConfigurableIOManager):
     """Translates tabular data (csv, txt, xlsx, and shp files) on the local filesystem."""
 
@@ -114,17 +201,33 @@ class TabularDataLocalIOManager(dagster.ConfigurableIOManager):
         )
 
 
+class TerminalSkimIOManager(dagster.ConfigurableIOManager):
+    """Persists terminal skims as a directory of memory-mappable NumPy arrays on the local filesystem."""
+
+    def handle_output(self, context, obj: TerminalSkim) -> None:
+        obj.save(Path(_get_fs_path(context.asset_key, context.metadata)))
+
+    def load_input(self, context) -> TerminalSkim:
+        return TerminalSkim.load(
+            Path(_get_fs_path(context.upstream_output.asset_key, context.upstream_output.metadata))
+        )
+
+
 def asset_spec_factory(spec: dagster.AssetSpec):
     """Creates a materialized asset from an asset spec, including potentially downloading it.
     The method relies on a naming convention for asset specs that end in "_spec" and generates
-    assets that end in "_src"."""
+    assets that end in "_src". Each created asset depends on the prefetch asset, so that a pipeline run
+    downloads all sources concurrently before any `_src` asset is materialized."""
+    _REGISTERED_ASSET_SPECS.append(spec)
 
     @dagster.asset(
         key=spec.key.to_user_string().replace("_spec", "_src"),
         io_manager_key="custom_io_manager",
         metadata=spec.metadata,
         description=spec.description,
+        deps=[PREFETCH_ASSET_KEY],
     )
+    @instrumented
     def _asset(context: dagster.AssetExecutionContext):
         result = read_or_attempt_download(spec.key, spec.metadata)
         publish_metadata(context, result)
@@ -0,0 +1,18 @@
+import dagster
+
+from ireiat.data_pipeline.instrumentation import instrumented
+from ireiat.data_pipeline.io_manager import (
+    PREFETCH_ASSET_KEY,
+    prefetch_asset_specs,
+    registered_asset_specs,
+)
+
+
+@dagster.asset(key=PREFETCH_ASSET_KEY, group_name="sources")
+@instrumented
+def raw_sources_prefetch(context: dagster.AssetExecutionContext) -> dagster.MaterializeResult:
+    """Downloads all raw sources (every `*_spec` asset) concurrently, so that download time is spent in
+    parallel up front rather than on the critical path of the asset graph"""
+    fpaths = prefetch_asset_specs(registered_asset_specs())
+    context.log.info(f"Prefetched {len(fpaths)} source files")
+    return dagster.MaterializeResult(metadata={"files": len(fpaths)})
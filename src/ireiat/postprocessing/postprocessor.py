@@ -2,12 +2,17 @@ import logging
 import os
 import pickle
 from pathlib import Path
+from typing import Optional
 
 import geopandas as gpd
 import matplotlib.pyplot as plt
 import pandas as pd
+import pyarrow.parquet as pq
 
 from ireiat.config.constants import CACHE_PATH
+from ireiat.postprocessing.tiles import write_congestion_tiles
+from ireiat.util.contraction import ORIGINAL_IDS_COLUMN
+from ireiat.util.csr_graph import CSRGraph
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +23,7 @@ class PostProcessor:
     _tap_solution_path: Path
     _strongly_connected_graph_path: Path
     _geo_file_path: Path
+    _network_file_path: Optional[Path]
     _solution_output_artifacts: Path = None
     _congestion_png_path: Path = None
 
@@ -33,40 +39,76 @@ class PostProcessor:
     def congestion_png_filename(self) -> str:
         return self._tap_solution_path.stem + ".png"
 
+    @property
+    def congestion_tiles_dirname(self) -> str:
+        return self._tap_solution_path.stem + "_tiles"
+
     def __init__(
         self,
         tap_solution_path: Path,
         strongly_connected_graph_path: Path,
         geo_file_path: Path,
+        network_file_path: Optional[Path] = None,
     ):
         self._tap_solution_path = Path(tap_solution_path)
         self._strongly_connected_graph_path = strongly_connected_graph_path
         self._geo_file_path = geo_file_path
+        self._network_file_path = Path(network_file_path) if network_file_path else None
+
+    def _read_edge_table(self) -> pd.DataFrame:
+        """Returns a compact (tail, head, original_id) table of the network edges, one per (tail, head). Read
+        from the TAP network dataframe when it carries `original_id`; otherwise taken from the pickled graph
+        with bulk attribute reads. The links of a contracted network (see `ireiat.util.contraction`) expand to
+        one row per original link."""
+        edge_columns = ["tail", "head", "original_id"]
+        if self._network_file_path is not None and self._network_file_path.exists():
+            network_columns = pq.read_schema(self._network_file_path).names
+            if ORIGINAL_IDS_COLUMN in network_columns:
+                links = pd.read_parquet(
+                    self._network_file_path, columns=["tail", "head", ORIGINAL_IDS_COLUMN]
+                ).drop_duplicates(["tail", "head"], keep="last")
+                return links.explode(ORIGINAL_IDS_COLUMN).rename(
+                    columns={ORIGINAL_IDS_COLUMN: "original_id"}
+                )
+            if "original_id" in network_columns:
+                return pd.read_parquet(
+                    self._network_file_path, columns=edge_columns
+                ).drop_duplicates(["tail", "head"], keep="last")
+            logger.info(f"{self._network_file_path} has no original_id. Falling back to the graph.")
 
-    def _generate_congestion_png(self):
-        logger.info("Reading solution and graph data")
+        with open(self._strongly_connected_graph_path, "rb") as fp:
+            strongly_connected_graph = pickle.load(fp)
+        graph = CSRGraph.from_igraph(strongly_connected_graph)
+        return pd.DataFrame(
+            {
+                "tail": graph.tail,
+                "head": graph.head,
+                "original_id": strongly_connected_graph.es["original_id"],
+            },
+            columns=edge_columns,
+        ).drop_duplicates(["tail", "head"], keep="last")
+
+    def _read_traffic(self) -> pd.DataFrame:
+        """Reads the TAP solution and joins the original (shp file) link id of each edge into it"""
+        logger.info("Reading solution and network edge data")
         traffic = pd.read_parquet(self._tap_solution_path)
         for cast_to_int_column in ["from", "to"]:
             traffic[cast_to_int_column] = traffic[cast_to_int_column].astype(int)
 
-        # load the graph which tracks original faf_link_ids
-        with open(self._strongly_connected_graph_path, "rb") as fp:
-            strongly_connected_graph = pickle.load(fp)
-
         # we need to be careful about the order here. the solution (of edges) may be in a different order,
-        # so we need to get the original_id of the edge on the network...and then join that data
-        # into the solution
-        edge_to_shp_file_link_id = {
-            (es.source, es.target): es["original_id"] for es in strongly_connected_graph.es
-        }
-
-        # map the edge (source_vertex, destination_vertex) to the original shp edge id, which is stored in the graph
-        shp_link_ids = [
-            edge_to_shp_file_link_id[(row._1, row.to)]
-            for row in traffic[["from", "to"]].itertuples()
-        ]
-
-        traffic["shp_link_id"] = shp_link_ids
+        # so we join the original_id of each (tail, head) edge on the network into the solution
+        edge_table = self._read_edge_table()
+        edge_table["original_id"] = edge_table["original_id"].astype(
+            "Int64"
+        )  # not all edges have one
+        edge_table = edge_table.rename(
+            columns={"tail": "from", "head": "to", "original_id": "shp_link_id"}
+        )
+        return traffic.merge(edge_table, on=["from", "to"], how="left")
+
+    def _flows_with_geometry(self) -> gpd.GeoDataFrame:
+        """Utilization of each link of the underlying (geo) network, 0 where there is no traffic"""
+        traffic = self._read_traffic()
 
         # this is a bit of a fudge in that the utilization on the same road (2 way) could be far above the capacity...
         # ideally we would set the capacity on each directed segment and sum the flows and capacities and then divide...
@@ -83,6 +125,10 @@ class PostProcessor:
 
         # all grouped traffic (and associated edges) are found within the FAF data
         # assert len(flows_with_geometry) == len(grouped_traffic)
+        return flows_with_geometry
+
+    def _generate_congestion_png(self):
+        flows_with_geometry = self._flows_with_geometry()
 
         non_zero_utilization = flows_with_geometry.loc[flows_with_geometry["utilization"] > 0]
         logger.info(non_zero_utilization.describe())
@@ -96,6 +142,22 @@ class PostProcessor:
         plt.savefig(self.artifact_output_path / self.congestion_png_filename)
         logger.info(f"Plots saved to {self.artifact_output_path}")
 
-    def postprocess(self):
-        # create a graph of the traffic image
-        self._generate_congestion_png()
+    def _generate_congestion_tiles(self, max_zoom: int, min_zoom: int):
+        flows_with_geometry = self._flows_with_geometry()
+        logger.info(f"Rendering congestion tiles for zoom levels {min_zoom}-{max_zoom}")
+        tiles_path = self.artifact_output_path / self.congestion_tiles_dirname
+        n_tiles = write_congestion_tiles(
+            flows_with_geometry, tiles_path, max_zoom=max_zoom, min_zoom=min_zoom
+        )
+        logger.info(f"{n_tiles} tiles saved to {tiles_path}")
+
+    def postprocess(self, render: str = "png", max_zoom: int = 9, min_zoom: int = 3):
+        """Generates the congestion artifact, either a single static PNG (`render="png"`) or a zoomable
+        XYZ tile pyramid (`render="tiles"`) rasterized at `max_zoom` and aggregated down to `min_zoom`
+        """
+        if render == "png":
+            self._generate_congestion_png()
+        elif render == "tiles":
+            self._generate_congestion_tiles(max_zoom=max_zoom, min_zoom=min_zoom)
+        else:
+            raise ValueError(f"Unknown render mode {render}. Expected 'png' or 'tiles'.")
@@ -0,0 +1,135 @@
+import json
+import logging
+from pathlib import Path
+
+import geopandas as gpd
+import matplotlib.image
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import shapely
+
+from ireiat.config.constants import LATLONG_CRS
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256  # pixels per side of an XYZ tile
+MAX_MERCATOR_LATITUDE = 85.0511287798
+ZERO_UTILIZATION_RGBA = (0.5, 0.5, 0.5, 0.3)  # matches the grey base network of the congestion PNG
+
+
+def lonlat_to_pixels(
+    longitude: np.ndarray, latitude: np.ndarray, zoom: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Converts lat/longs (EPSG:4326) into global (web mercator) pixel coordinates at `zoom`"""
+    world_size = TILE_SIZE * 2**zoom
+    latitude = np.clip(latitude, -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE)
+    sin_latitude = np.sin(np.deg2rad(latitude))
+    x = (longitude + 180.0) / 360.0 * world_size
+    y = (0.5 - np.log((1 + sin_latitude) / (1 - sin_latitude)) / (4 * np.pi)) * world_size
+    return x, y
+
+
+def rasterize_lines(gdf: gpd.GeoDataFrame, value_column: str, zoom: int) -> pd.DataFrame:
+    """Rasterizes the line geometries of `gdf` onto the global pixel grid at `zoom`, returning a sparse
+    (x, y, value) frame holding the maximum `value_column` of all lines crossing each pixel.
+
+    Each line segment is sampled about once per pixel along its length; sampling and binning are
+    vectorized over all segments, so memory scales with the number of pixels touched, not the extent.
+    """
+    if gdf.crs is not None and gdf.crs != LATLONG_CRS:
+        gdf = gdf.to_crs(LATLONG_CRS)
+    coords, geometry_idx = shapely.get_coordinates(gdf.geometry.values, return_index=True)
+    x, y = lonlat_to_pixels(coords[:, 0], coords[:, 1], zoom)
+
+    # consecutive coordinates of the same geometry form a segment
+    is_segment = geometry_idx[1:] == geometry_idx[:-1]
+    x0, y0, x1, y1 = x[:-1][is_segment], y[:-1][is_segment], x[1:][is_segment], y[1:][is_segment]
+    segment_values = gdf[value_column].to_numpy()[geometry_idx[:-1][is_segment]]
+
+    samples_per_segment = np.ceil(np.hypot(x1 - x0, y1 - y0)).astype(np.int64) + 1
+    segment_idx = np.repeat(np.arange(len(x0)), samples_per_segment)
+    segment_start = np.cumsum(samples_per_segment) - samples_per_segment
+    step = np.arange(len(segment_idx)) - segment_start[segment_idx]
+    fraction = step / np.maximum(samples_per_segment[segment_idx] - 1, 1)
+
+    pixels = pd.DataFrame(
+        {
+            "x": np.floor(x0[segment_idx] + fraction * (x1 - x0)[segment_idx]).astype(np.int64),
+            "y": np.floor(y0[segment_idx] + fraction * (y1 - y0)[segment_idx]).astype(np.int64),
+            "value": segment_values[segment_idx],
+        }
+    )
+    return pixels.groupby(["x", "y"], as_index=False)["value"].max()
+
+
+def downsample_pixels(pixels: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates (max) a sparse pixel frame at zoom z to the pixel grid at zoom z-1"""
+    coarse = pixels.assign(x=pixels["x"] // 2, y=pixels["y"] // 2)
+    return coarse.groupby(["x", "y"], as_index=False)["value"].max()
+
+
+def _colorize(values: np.ndarray, cmap) -> np.ndarray:
+    """RGBA colors for utilization values, grey for links without utilization"""
+    colors = cmap(np.clip(values, 0, 1))
+    colors[values <= 0] = ZERO_UTILIZATION_RGBA
+    return colors
+
+
+def write_tile_pyramid(
+    pixels: pd.DataFrame,
+    output_dir: Path,
+    max_zoom: int,
+    min_zoom: int = 0,
+    cmap=plt.cm.YlOrRd,
+) -> int:
+    """Writes `{output_dir}/{z}/{x}/{y}.png` XYZ tiles from a sparse pixel frame rasterized at `max_zoom`,
+    down to `min_zoom`. Only tiles that contain data are written. Returns the number of tiles written.
+    """
+    n_tiles = 0
+    if pixels.empty:
+        return n_tiles
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        if zoom != max_zoom:
+            pixels = downsample_pixels(pixels)
+        tile_x, tile_y = pixels["x"].to_numpy() // TILE_SIZE, pixels["y"].to_numpy() // TILE_SIZE
+        colors = _colorize(pixels["value"].to_numpy(), cmap)
+        order = np.lexsort((tile_y, tile_x))
+        tile_keys = np.stack([tile_x[order], tile_y[order]], axis=1)
+        boundaries = np.flatnonzero(np.any(np.diff(tile_keys, axis=0) != 0, axis=1)) + 1
+        for tile_rows in np.split(order, boundaries):
+            tx, ty = int(tile_x[tile_rows[0]]), int(tile_y[tile_rows[0]])
+            image = np.zeros((TILE_SIZE, TILE_SIZE, 4))
+            image[
+                pixels["y"].to_numpy()[tile_rows] % TILE_SIZE,
+                pixels["x"].to_numpy()[tile_rows] % TILE_SIZE,
+            ] = colors[tile_rows]
+            tile_path = output_dir / str(zoom) / str(tx) / f"{ty}.png"
+            tile_path.parent.mkdir(parents=True, exist_ok=True)
+            matplotlib.image.imsave(tile_path, image)
+            n_tiles += 1
+        logger.info(f"Zoom {zoom}: {n_tiles} tiles written so far")
+    return n_tiles
+
+
+def write_congestion_tiles(
+    flows_with_geometry: gpd.GeoDataFrame, output_dir: Path, max_zoom: int = 9, min_zoom: int = 3
+) -> int:
+    """Renders a utilization map of `flows_with_geometry` (geometry, utilization) as a zoomable XYZ tile
+    pyramid under `output_dir`, alongside a `tiles.json` describing the zoom levels and bounds"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pixels = rasterize_lines(flows_with_geometry, "utilization", max_zoom)
+    n_tiles = write_tile_pyramid(pixels, output_dir, max_zoom=max_zoom, min_zoom=min_zoom)
+    bounds = flows_with_geometry.to_crs(LATLONG_CRS).total_bounds
+    with open(output_dir / "tiles.json", "w") as fp:
+        json.dump(
+            {
+                "tiles": ["{z}/{x}/{y}.png"],
+                "minzoom": min_zoom,
+                "maxzoom": max_zoom,
+                "bounds": [float(b) for b in bounds],
+            },
+            fp,
+        )
+    return n_tiles
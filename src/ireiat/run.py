@@ -4,32 +4,50 @@ import shutil
 import subprocess
 from importlib import resources
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime
 import click
 
 from ireiat import r_source
-from ireiat.config.constants import CACHE_PATH
+from ireiat.config.constants import CACHE_PATH, COMMODITY_FIELD
 from ireiat.config.runtime import (
+    faf_allocation_map_path,
     run_config_map,
     RunConfig,
     PostprocessConfig,
     postprocess_config_map,
 )
-from ireiat.postprocessing.postprocessor import PostProcessor
 from ireiat.util.logging_ import configure_logging
 
-configure_logging(output_file=True)
+# commands import what they need (pandas, geopandas, dagster, ...) lazily so that the CLI starts fast
 logger = logging.getLogger(__name__)
 
+# (max gap, max iterations) of each solve engine when not passed
+SOLVE_ENGINE_DEFAULTS = {"r": (1e-8, 1), "python": (1e-4, 100)}
+
 MODE_CHOICES = click.Choice(["highway", "marine", "rail"])
 
 
-@click.group()
+class _LoggedCommand(click.Command):
+    """A command that sets up the log file and the cache directory once its arguments are parsed, so that
+    `--help` and usage errors leave no files behind"""
+
+    def invoke(self, ctx: click.Context):
+        debug = ctx.find_root().params["debug"]
+        configure_logging(output_file=True, level=logging.DEBUG if debug else logging.INFO)
+        logger.info(f"Debug mode is {'on' if debug else 'off'}")
+        os.makedirs(CACHE_PATH, exist_ok=True)
+        return super().invoke(ctx)
+
+
+class _LoggedGroup(click.Group):
+    command_class = _LoggedCommand
+
+
+@click.group(cls=_LoggedGroup)
 @click.option("--debug/--no-debug", default=False)
 def cli(debug):
-    logger.info(f"Debug mode is {'on' if debug else 'off'}")
-    os.makedirs(CACHE_PATH, exist_ok=True)
+    pass
 
 
 @cli.command()
@@ -41,6 +59,25 @@ def clear_cache():
         shutil.rmtree(CACHE_PATH)
 
 
+@cli.command()
+@click.option(
+    "--max-workers",
+    "-w",
+    type=int,
+    default=4,
+    help="Number of source files to download concurrently",
+)
+@click.option("--force/--no-force", default=False, help="Re-download files even if they are cached")
+def fetch(max_workers: int, force: bool):
+    """Downloads all raw data pipeline sources to the local cache concurrently"""
+    from ireiat.data_pipeline import io_manager  # importing the pipeline registers all sources
+
+    fpaths = io_manager.prefetch_asset_specs(
+        io_manager.registered_asset_specs(), max_workers=max_workers, force=force
+    )
+    logger.info(f"{len(fpaths)} source files available in {CACHE_PATH}")
+
+
 @cli.command()
 @click.option(
     "--network-file",
@@ -66,24 +103,118 @@ def clear_cache():
     help="If specified, uses defaults file outputs for the given mode unless other parameters are passed",
 )
 @click.option(
-    "--max-gap", "-g", type=float, default=1e-8, help="The relative gap used in Algorithm B"
+    "--max-gap",
+    "-g",
+    type=float,
+    help="The relative gap at which to stop (default 1e-8 for Algorithm B in R, 1e-4 for Frank-Wolfe)",
+)
+@click.option(
+    "--max-iterations",
+    "-i",
+    type=int,
+    help="Max iterations (default 1 for Algorithm B in R, 100 for Frank-Wolfe)",
+)
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(["r", "python"]),
+    default="r",
+    help="Solve in R with cppRouting, or with the Python Frank-Wolfe solver, which assigns each "
+    "commodity of a by-commodity OD file as its own class",
+)
+@click.option(
+    "--keep-origin-flows/--no-keep-origin-flows",
+    default=False,
+    help="Also write the flows of each origin (python engine), needed to re-solve disruptions",
+)
+@click.option(
+    "--contracted/--no-contracted",
+    default=False,
+    help="Default to the network with degree-2 chains contracted (highway and marine)",
+)
+@click.option(
+    "--tons-column",
+    "-t",
+    multiple=True,
+    help="Solve each of these OD tons columns in turn (e.g. tons -t tons_2030), each warm-started "
+    "from the previous one's solution (python engine); writes one output file per column",
+)
+@click.option(
+    "--hierarchical/--no-hierarchical",
+    default=False,
+    help="Solve the demand aggregated to FAF zones first and start the full solve from its congested "
+    "costs (python engine)",
+)
+@click.option(
+    "--county-pairs-file",
+    "-c",
+    type=click.Path(exists=True),
+    help="The county pairs behind each OD row (tap_*_tons_county_pairs), for --hierarchical",
 )
-@click.option("--max-iterations", "-i", type=int, default=1, help="Max iterations for Algorithm B")
 def solve(
     network_file: Optional[Path],
     od_file: Optional[Path],
     output_file: Optional[Path],
     mode: Optional[str],
-    max_gap: float,
-    max_iterations: int,
+    max_gap: Optional[float],
+    max_iterations: Optional[int],
+    engine: str,
+    keep_origin_flows: bool,
+    contracted: bool,
+    tons_column: Tuple[str, ...],
+    hierarchical: bool,
+    county_pairs_file: Optional[Path],
 ):
-    """Runs the TAP solution in R using cppRouting"""
+    """Runs the TAP solution in R using cppRouting (or in Python)"""
+
+    if tons_column and engine != "python":
+        raise click.UsageError("--tons-column requires --engine python")
+    if tons_column and (keep_origin_flows or hierarchical):
+        raise click.UsageError(
+            "--tons-column cannot be combined with --keep-origin-flows or --hierarchical"
+        )
+    if hierarchical and engine != "python":
+        raise click.UsageError("--hierarchical requires --engine python")
 
     config = run_config_map.get(mode, RunConfig)(
         passed_network_file_path=network_file,
         passed_od_file_path=od_file,
         passed_output_file_path=output_file,
+        passed_county_pairs_file_path=county_pairs_file,
+        contracted=contracted,
     )
+    if hierarchical and config.county_pairs_file_path is None:
+        raise click.UsageError("--hierarchical requires --county-pairs-file or --mode")
+    default_max_gap, default_max_iterations = SOLVE_ENGINE_DEFAULTS[engine]
+    max_gap = default_max_gap if max_gap is None else max_gap
+    max_iterations = default_max_iterations if max_iterations is None else max_iterations
+    if engine == "python" and tons_column:
+        from ireiat.solver.io import solve_horizon_files
+
+        solve_horizon_files(
+            config.network_file_path,
+            config.od_file_path,
+            config.output_file_path,
+            list(tons_column),
+            max_gap=max_gap,
+            max_iterations=max_iterations,
+        )
+        return
+    if engine == "python":
+        from ireiat.solver.io import solve_files
+
+        solve_files(
+            config.network_file_path,
+            config.od_file_path,
+            config.output_file_path,
+            max_gap=max_gap,
+            max_iterations=max_iterations,
+            keep_origin_flows=keep_origin_flows,
+            county_pairs_file_path=config.county_pairs_file_path if hierarchical else None,
+            faf_allocation_map_path=faf_allocation_map_path,
+        )
+        return
+
     timestamp_formatted = datetime.now().strftime("%Y%m%d%H%M%S")
     # use the bundled 'tap.r' file as a "resource" and create a temporary file to be run by RScript
     temporary_file_path = CACHE_PATH / f"local_tap_{timestamp_formatted}.r"
@@ -91,12 +222,28 @@ def solve(
         with resources.open_text(r_source, "tap.r") as r_text:
             tf.write(r_text.read())
 
+    # tap.r assigns a single class: the commodities of a by-commodity OD file are summed per (from, to)
+    od_file_path = config.od_file_path
+    temporary_od_file_path = None
+    import pyarrow.parquet as pq
+
+    if COMMODITY_FIELD in pq.read_schema(od_file_path).names:
+        import pandas as pd
+
+        od_df = pd.read_parquet(od_file_path, columns=["from", "to", "tons"])
+        temporary_od_file_path = CACHE_PATH / f"local_tap_od_{timestamp_formatted}.parquet"
+        od_df.groupby(["from", "to"], as_index=False)["tons"].sum().to_parquet(
+            temporary_od_file_path, index=False
+        )
+        logger.info(f"Summed the commodities of {od_file_path} into {temporary_od_file_path}")
+        od_file_path = temporary_od_file_path
+
     # pass the command for the RScript file
     cmd = [
         "Rscript",
         tf.name,
         config.network_file_path,
-        config.od_file_path,
+        od_file_path,
         str(max_gap),
         config.output_file_path,
         str(max_iterations),
@@ -109,6 +256,246 @@ def solve(
     process.wait()
 
     temporary_file_path.unlink(missing_ok=True)
+    if temporary_od_file_path is not None:
+        temporary_od_file_path.unlink(missing_ok=True)
+
+
+@cli.command()
+@click.option("--network-file", "-n", type=click.Path(exists=True))
+@click.option(
+    "--od-file",
+    "-d",
+    type=click.Path(exists=True),
+    help="A parquet file that represents the demand of the baseline TAP",
+)
+@click.option(
+    "--solution",
+    "-s",
+    type=click.Path(exists=True),
+    help="Baseline solution, solved with --engine python --keep-origin-flows",
+)
+@click.option(
+    "--changes",
+    "-c",
+    type=click.Path(exists=True),
+    required=True,
+    help="A csv or parquet file of edge changes: (original_id | tail, head), action "
+    "(remove, scale_capacity, set_fft) and value",
+)
+@click.option(
+    "--output-file",
+    "-o",
+    type=click.Path(),
+    help="A parquet file to which the disrupted solution will be written. Defaults to "
+    "'<solution>_disrupted.parquet'",
+)
+@click.option(
+    "--mode",
+    "-m",
+    type=MODE_CHOICES,
+    help="If specified, uses defaults file outputs for the given mode unless other parameters are passed",
+)
+@click.option("--max-gap", "-g", type=float, default=1e-4, help="The relative gap of the re-solve")
+@click.option("--max-iterations", "-i", type=int, default=50, help="Max iterations of the re-solve")
+def disrupt(
+    network_file: Optional[Path],
+    od_file: Optional[Path],
+    solution: Optional[Path],
+    changes: Path,
+    output_file: Optional[Path],
+    mode: Optional[str],
+    max_gap: float,
+    max_iterations: int,
+):
+    """Re-solves a baseline TAP solution after edge changes, re-assigning only the affected origins"""
+    import pandas as pd
+
+    from ireiat.solver.disruption import (
+        Baseline,
+        apply_edge_changes,
+        edge_changes_from_dataframe,
+        resolve_disruption,
+    )
+    from ireiat.solver.io import write_origin_flows
+
+    config = run_config_map.get(mode, RunConfig)(
+        passed_network_file_path=network_file,
+        passed_od_file_path=od_file,
+        passed_output_file_path=solution,
+    )
+    baseline = Baseline.from_files(
+        config.network_file_path, config.od_file_path, config.output_file_path
+    )
+    changes_df = (
+        pd.read_parquet(changes) if Path(changes).suffix == ".parquet" else pd.read_csv(changes)
+    )
+    edge_changes = edge_changes_from_dataframe(
+        changes_df, pd.read_parquet(config.network_file_path)
+    )
+    result = resolve_disruption(
+        baseline, edge_changes, max_gap=max_gap, max_iterations=max_iterations
+    )
+
+    solution_path = Path(config.output_file_path)
+    output_path = output_file or solution_path.with_name(f"{solution_path.stem}_disrupted.parquet")
+    disrupted_network = apply_edge_changes(baseline.network, edge_changes)
+    result.to_dataframe(disrupted_network).to_parquet(output_path)
+    write_origin_flows(result, output_path)
+    logger.info(f"Disrupted solution written to {output_path}")
+
+
+@cli.command()
+@click.option("--network-file", "-n", type=click.Path(exists=True))
+@click.option(
+    "--od-file",
+    "-d",
+    type=click.Path(exists=True),
+    help="A parquet file that represents the demand of the baseline TAP",
+)
+@click.option(
+    "--solution",
+    "-s",
+    type=click.Path(exists=True),
+    help="Baseline solution, solved with --engine python --keep-origin-flows",
+)
+@click.option(
+    "--output-file",
+    "-o",
+    type=click.Path(),
+    help="A parquet file to which the ranked links will be written. Defaults to "
+    "'<solution>_criticality.parquet'",
+)
+@click.option(
+    "--mode",
+    "-m",
+    type=MODE_CHOICES,
+    help="If specified, uses defaults file outputs for the given mode unless other parameters are passed",
+)
+@click.option(
+    "--top-k", "-k", type=int, default=20, help="Number of screened links to evaluate exactly"
+)
+@click.option(
+    "--max-workers",
+    "-w",
+    type=int,
+    default=None,
+    help="Number of worker processes evaluating links. Defaults to the number of CPUs",
+)
+@click.option("--max-gap", "-g", type=float, default=1e-4, help="The relative gap of each re-solve")
+@click.option(
+    "--max-iterations", "-i", type=int, default=50, help="Max iterations of each re-solve"
+)
+def criticality(
+    network_file: Optional[Path],
+    od_file: Optional[Path],
+    solution: Optional[Path],
+    output_file: Optional[Path],
+    mode: Optional[str],
+    top_k: int,
+    max_workers: Optional[int],
+    max_gap: float,
+    max_iterations: int,
+):
+    """Ranks network links by the cost of their loss, screening all links and re-solving the top ones"""
+    import pandas as pd
+
+    from ireiat.solver.criticality import rank_links
+    from ireiat.solver.disruption import Baseline
+
+    config = run_config_map.get(mode, RunConfig)(
+        passed_network_file_path=network_file,
+        passed_od_file_path=od_file,
+        passed_output_file_path=solution,
+    )
+    baseline = Baseline.from_files(
+        config.network_file_path, config.od_file_path, config.output_file_path
+    )
+    ranked = rank_links(
+        baseline,
+        pd.read_parquet(config.network_file_path),
+        top_k=top_k,
+        max_workers=max_workers,
+        max_gap=max_gap,
+        max_iterations=max_iterations,
+    )
+    solution_path = Path(config.output_file_path)
+    output_path = output_file or solution_path.with_name(
+        f"{solution_path.stem}_criticality.parquet"
+    )
+    ranked.to_parquet(output_path, index=False)
+    logger.info(f"{len(ranked)} ranked links written to {output_path}")
+
+
+@cli.command()
+@click.option("--network-file", "-n", type=click.Path(exists=True))
+@click.option(
+    "--od-file",
+    "-d",
+    type=click.Path(exists=True),
+    help="A parquet file that represents the demand of the TAP",
+)
+@click.option(
+    "--solution",
+    "-s",
+    type=click.Path(exists=True),
+    help="Solution, solved with --engine python --keep-origin-flows",
+)
+@click.option(
+    "--original-id",
+    "-l",
+    "original_ids",
+    multiple=True,
+    required=True,
+    help="A selected link (original_id of the network edges). Can be repeated",
+)
+@click.option(
+    "--output-file",
+    "-o",
+    type=click.Path(),
+    help="A parquet file to which the (from, to, tons) demand using the selected links will be "
+    "written. Defaults to '<solution>_select_link.parquet'",
+)
+@click.option(
+    "--mode",
+    "-m",
+    type=MODE_CHOICES,
+    help="If specified, uses defaults file outputs for the given mode unless other parameters are passed",
+)
+def select_link(
+    network_file: Optional[Path],
+    od_file: Optional[Path],
+    solution: Optional[Path],
+    original_ids: tuple,
+    output_file: Optional[Path],
+    mode: Optional[str],
+):
+    """Finds the origin-destination demand whose paths use any of the selected links"""
+    import pandas as pd
+
+    from ireiat.solver import select_link as select_link_analysis
+    from ireiat.solver.disruption import Baseline
+
+    config = run_config_map.get(mode, RunConfig)(
+        passed_network_file_path=network_file,
+        passed_od_file_path=od_file,
+        passed_output_file_path=solution,
+    )
+    baseline = Baseline.from_files(
+        config.network_file_path, config.od_file_path, config.output_file_path
+    )
+    edges = select_link_analysis.link_edges(
+        pd.read_parquet(config.network_file_path, columns=["original_id"]), original_ids
+    )
+    od_tons = select_link_analysis.select_link(baseline, edges)
+    solution_path = Path(config.output_file_path)
+    output_path = output_file or solution_path.with_name(
+        f"{solution_path.stem}_select_link.parquet"
+    )
+    od_tons.to_parquet(output_path, index=False)
+    logger.info(
+        f"{len(od_tons)} OD pairs with {od_tons['tons'].sum():,.1f} tons using the selected links "
+        f"written to {output_path}"
+    )
 
 
 @cli.command()
@@ -130,23 +517,62 @@ def solve(
     type=click.Path(exists=True),
     help="The geo file used to represent the underlying network to enable visualization",
 )
+@click.option(
+    "--network-file",
+    "-f",
+    type=click.Path(exists=True),
+    help="The TAP network parquet file whose (tail, head, original_id) edges are joined to the solution",
+)
 @click.option(
     "--mode",
     "-m",
     type=MODE_CHOICES,
     help="If specified, uses defaults file outputs for the given mode unless other parameters are passed",
 )
-def postprocess(solution: Path, solution_graph: Path, network_geo: Path, mode: str):
+@click.option(
+    "--render",
+    "-r",
+    type=click.Choice(["png", "tiles"]),
+    default="png",
+    help="Render a single static PNG or a zoomable XYZ tile pyramid of congestion",
+)
+@click.option("--max-zoom", type=int, default=9, help="Most detailed zoom level of rendered tiles")
+@click.option("--min-zoom", type=int, default=3, help="Least detailed zoom level of rendered tiles")
+@click.option(
+    "--contracted/--no-contracted",
+    default=False,
+    help="Default to the network with degree-2 chains contracted (highway and marine)",
+)
+def postprocess(
+    solution: Path,
+    solution_graph: Path,
+    network_geo: Path,
+    network_file: Path,
+    mode: str,
+    render: str,
+    max_zoom: int,
+    min_zoom: int,
+    contracted: bool,
+):
     """Post processes results and save in the default configured cache path"""
+    from ireiat.postprocessing.postprocessor import PostProcessor
+
     logger.info("Running postprocessing.")
     config = postprocess_config_map.get(mode, PostprocessConfig)(
         passed_traffic_path=solution,
         passed_network_graph_path=solution_graph,
         passed_geo_file_path=network_geo,
+        passed_network_file_path=network_file,
+        contracted=contracted,
     )
 
-    pp = PostProcessor(config.traffic_file_path, config.network_graph_path, config.shp_file_path)
-    pp.postprocess()
+    pp = PostProcessor(
+        config.traffic_file_path,
+        config.network_graph_path,
+        config.shp_file_path,
+        config.network_file_path,
+    )
+    pp.postprocess(render=render, max_zoom=max_zoom, min_zoom=min_zoom)
 
 
 if __name__ == "__main__":
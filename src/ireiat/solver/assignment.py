@@ -0,0 +1,323 @@
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.network import TAPNetwork
+
+logger = logging.getLogger(__name__)
+
+LINE_SEARCH_ITERATIONS = 30
+
+
+@dataclass
+class AllOrNothingResult:
+    """Edge flows of an all-or-nothing assignment on fixed costs"""
+
+    class_flows: np.ndarray  # n_edges x n_classes
+    shortest_path_travel_time: float  # sum over OD pairs of demand * shortest path cost
+    unreachable: np.ndarray  # boolean mask of OD pairs with no path
+    origins: np.ndarray  # unique origins, sorted
+    origin_flows: Optional[sp.csr_matrix] = None  # n_origins x n_edges flows of all classes
+
+    @property
+    def flow(self) -> np.ndarray:
+        return self.class_flows.sum(axis=1)
+
+
+@dataclass
+class AssignmentResult:
+    """Equilibrium edge flows, total and by class, with the congested cost of each edge"""
+
+    flow: np.ndarray
+    class_flows: np.ndarray  # n_edges x n_classes
+    cost: np.ndarray
+    classes: np.ndarray
+    relative_gap: float
+    iterations: int
+    origins: Optional[np.ndarray] = None
+    origin_flows: Optional[sp.csr_matrix] = None  # n_origins x n_edges, if kept
+    unassigned_demand: float = 0.0  # demand of OD pairs without a path
+
+    @property
+    def total_travel_time(self) -> float:
+        return _travel_time(self.flow, self.cost)
+
+    def to_dataframe(self, network: TAPNetwork) -> pd.DataFrame:
+        """Solution in the layout of the cppRouting `assign_traffic` output"""
+        return pd.DataFrame(
+            {
+                "from": network.tail,
+                "to": network.head,
+                "ftt": network.fft,
+                "cost": self.cost,
+                "flow": self.flow,
+                "capacity": network.capacity,
+                "alpha": network.alpha,
+                "beta": network.beta,
+            }
+        )
+
+
+def _merge_packets(
+    keys: np.ndarray, loads: np.ndarray, n_nodes: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merges packets (demand of all classes travelling towards an origin) at the same node of the same
+    shortest path tree, so that the work of each step is bounded by the size of the trees"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    merged = np.empty((len(unique_keys), loads.shape[1]))
+    for k in range(loads.shape[1]):
+        merged[:, k] = np.bincount(inverse, weights=loads[:, k], minlength=len(unique_keys))
+    return unique_keys // n_nodes, unique_keys % n_nodes, merged
+
+
+def _load_trees(
+    network: TAPNetwork,
+    predecessors: np.ndarray,
+    tree_origins: np.ndarray,
+    tree: np.ndarray,
+    destination: np.ndarray,
+    demand: np.ndarray,
+) -> Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]]:
+    """Loads the demand of OD pairs (whose origin is `tree_origins[tree]`) onto the predecessor trees by
+    walking all paths back from their destinations simultaneously. Returns the (tree, pair index, loads) of
+    every traversed pair of nodes."""
+    n_nodes = network.n_nodes
+    trees, pairs, pair_loads = [], [], []
+    tree, node, loads = tree.astype(np.int64), destination.astype(np.int64), demand
+    active = node != tree_origins[tree]
+    tree, node, loads = tree[active], node[active], loads[active]
+    while len(node):
+        tree, node, loads = _merge_packets(tree * n_nodes + node, loads, n_nodes)
+        predecessor = predecessors[tree, node].astype(np.int64)
+        trees.append(tree)
+        pairs.append(network.pair_index(predecessor, node))
+        pair_loads.append(loads)
+        active = predecessor != tree_origins[tree]
+        tree, node, loads = tree[active], predecessor[active], loads[active]
+    return trees, pairs, pair_loads
+
+
+def all_or_nothing(
+    network: TAPNetwork, od: ODDemand, costs: np.ndarray, keep_origin_flows: bool = False
+) -> AllOrNothingResult:
+    """Assigns the demand of every class to the shortest paths given edge `costs`.
+
+    Shortest path trees are computed once per origin (in batches, with scipy's Dijkstra) and shared by
+    all classes, so the cost of a multi-class assignment is that of a single class plus the loading.
+    With `keep_origin_flows`, the (sparse) flows of each origin are returned too.
+    """
+    pair_costs, cheapest_edge = network.pair_costs(costs)
+
+    origins, offsets = od.origins, od.origin_offsets
+    unreachable = np.zeros(len(od.origin), dtype=bool)
+    pair_flows = np.zeros((network.n_pairs, od.n_classes))
+    shortest_path_travel_time = 0.0
+    origin_rows, origin_pairs, origin_loads = [], [], []
+
+    for batch_start, batch_origins, distances, predecessors in network.graph.batched_dijkstra(
+        origins, pair_costs
+    ):
+        # OD rows are sorted by origin, so the pairs of a batch of origins are a contiguous slice
+        batch_offsets = offsets[batch_start : batch_start + len(batch_origins) + 1]
+        in_batch = np.arange(batch_offsets[0], batch_offsets[-1])
+        tree = np.repeat(np.arange(len(batch_origins)), np.diff(batch_offsets))
+        od_distance = distances[tree, od.destination[in_batch]]
+        reachable = np.isfinite(od_distance)
+        unreachable[in_batch[~reachable]] = True
+        in_batch, tree = in_batch[reachable], tree[reachable]
+        shortest_path_travel_time += float(od_distance[reachable] @ od.total[in_batch])
+
+        trees, pairs, pair_loads = _load_trees(
+            network,
+            predecessors,
+            batch_origins,
+            tree,
+            od.destination[in_batch],
+            od.demand[in_batch],
+        )
+        if pairs:
+            batch_pairs, batch_loads = np.concatenate(pairs), np.concatenate(pair_loads)
+            for k in range(od.n_classes):
+                pair_flows[:, k] += np.bincount(
+                    batch_pairs, weights=batch_loads[:, k], minlength=network.n_pairs
+                )
+            if keep_origin_flows:
+                origin_rows.append(np.concatenate(trees) + batch_start)
+                origin_pairs.append(batch_pairs)
+                origin_loads.append(batch_loads.sum(axis=1))
+
+    class_flows = np.zeros((network.n_edges, od.n_classes))
+    class_flows[cheapest_edge] = pair_flows
+    origin_flows = None
+    if keep_origin_flows:
+        origin_flows = sp.csr_matrix(
+            (
+                np.concatenate(origin_loads) if origin_loads else np.zeros(0),
+                (
+                    np.concatenate(origin_rows) if origin_rows else np.zeros(0, dtype=np.int64),
+                    (
+                        cheapest_edge[np.concatenate(origin_pairs)]
+                        if origin_pairs
+                        else np.zeros(0, dtype=np.int64)
+                    ),
+                ),
+            ),
+            shape=(len(origins), network.n_edges),
+        )  # duplicate (origin, edge) entries are summed
+    return AllOrNothingResult(
+        class_flows, shortest_path_travel_time, unreachable, origins, origin_flows
+    )
+
+
+def _travel_time(flow: np.ndarray, costs: np.ndarray) -> float:
+    """Sum of flow * cost, ignoring edges without flow (whose cost may be infinite, i.e. removed)"""
+    has_flow = flow != 0
+    return float(flow[has_flow] @ costs[has_flow])
+
+
+def _line_search(network: TAPNetwork, flow: np.ndarray, direction: np.ndarray) -> float:
+    """Step size in [0, 1] minimizing the Beckmann objective along `direction`, by bisection on its
+    derivative (which is increasing, as BPR costs are increasing in flow)"""
+    low, high = 0.0, 1.0
+    if _travel_time(direction, network.costs(flow + direction)) <= 0:
+        return 1.0
+    for _ in range(LINE_SEARCH_ITERATIONS):
+        step = (low + high) / 2
+        if _travel_time(direction, network.costs(flow + step * direction)) > 0:
+            high = step
+        else:
+            low = step
+    return (low + high) / 2
+
+
+def frank_wolfe(
+    network: TAPNetwork,
+    od: ODDemand,
+    max_gap: float = 1e-4,
+    max_iterations: int = 100,
+    background_flow: Optional[np.ndarray] = None,
+    keep_origin_flows: bool = False,
+    initial: Optional[AllOrNothingResult] = None,
+) -> AssignmentResult:
+    """Solves the (multi-class) user equilibrium traffic assignment with the Frank-Wolfe algorithm.
+
+    All classes share the same link performance functions of the total flow and the same step size, so each
+    iteration is a single all-or-nothing assignment whose loading is carried per class. Class flows of the
+    result sum to the total flow. OD pairs without a path are dropped with a warning.
+
+    `background_flow` is fixed flow (e.g. of other origins) that congests edges but is not re-assigned;
+    the result holds the flows of `od` only. With `keep_origin_flows`, the flows of each origin are
+    tracked (as a sparse origins x edges matrix), which allows incremental re-solves (see `disruption`).
+
+    `initial` is a feasible assignment of `od` to start from (see `warm_start`) instead of the
+    all-or-nothing assignment on the uncongested costs.
+    """
+    if background_flow is None:
+        background_flow = np.zeros(network.n_edges)
+    aon = initial
+    if aon is None:
+        aon = all_or_nothing(network, od, network.costs(background_flow), keep_origin_flows)
+    unassigned_demand = float(od.total[aon.unreachable].sum())
+    if aon.unreachable.any():
+        logger.warning(
+            f"{aon.unreachable.sum()} OD pairs ({od.total[aon.unreachable].sum():.1f} tons) "
+            f"have no path in the network and are not assigned"
+        )
+        od = od.subset(~aon.unreachable)
+        if keep_origin_flows:
+            reached = np.isin(aon.origins, od.origins)
+            aon.origins, aon.origin_flows = aon.origins[reached], aon.origin_flows[reached]
+    class_flows, flow, origin_flows = aon.class_flows, aon.flow, aon.origin_flows
+
+    relative_gap, iteration = np.inf, 0
+    for iteration in range(1, max_iterations + 1):
+        costs = network.costs(background_flow + flow)
+        aon = all_or_nothing(network, od, costs, keep_origin_flows)
+        total_travel_time = _travel_time(flow, costs)
+        relative_gap = (
+            (total_travel_time - aon.shortest_path_travel_time) / total_travel_time
+            if total_travel_time > 0
+            else 0.0
+        )
+        logger.info(f"Iteration {iteration}: relative gap {relative_gap:.3e}")
+        if relative_gap <= max_gap:
+            break
+        step = _line_search(network, background_flow + flow, aon.flow - flow)
+        class_flows += step * (aon.class_flows - class_flows)
+        flow = class_flows.sum(axis=1)
+        if keep_origin_flows:
+            origin_flows = (1 - step) * origin_flows + step * aon.origin_flows
+
+    return AssignmentResult(
+        flow=flow,
+        class_flows=class_flows,
+        cost=network.costs(background_flow + flow),
+        classes=od.classes,
+        relative_gap=relative_gap,
+        iterations=iteration,
+        unassigned_demand=unassigned_demand,
+        origins=od.origins if keep_origin_flows else None,
+        origin_flows=origin_flows.tocsr() if keep_origin_flows else None,
+    )
+
+
+def warm_start(
+    network: TAPNetwork, od: ODDemand, previous_od: ODDemand, previous: AssignmentResult
+) -> AllOrNothingResult:
+    """A feasible starting point for assigning the single class `od` from the equilibrium `previous` of
+    `previous_od`, which has the same OD pairs (e.g. the demand of the previous year of a horizon) and was
+    solved keeping its origin flows.
+
+    The flows of each origin are feasible for any multiple of that origin's demand, so they are scaled by
+    the smallest growth of the origin's OD pairs and the remaining demand is assigned all-or-nothing on the
+    previous equilibrium costs. When demand changes by similar factors this starts close to the new
+    equilibrium, and Frank-Wolfe needs far fewer iterations than from the uncongested costs.
+    """
+    if previous.origin_flows is None:
+        raise ValueError("The previous assignment was solved without keeping origin flows")
+    if od.n_classes != 1 or previous_od.n_classes != 1:
+        raise ValueError("Warm starts are on total demand (a single class)")
+    if not (
+        np.array_equal(od.origin, previous_od.origin)
+        and np.array_equal(od.destination, previous_od.destination)
+    ):
+        raise ValueError("The previous demand must have the same OD pairs")
+
+    previous_total, total = previous_od.total, od.total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(previous_total > 0, total / previous_total, np.inf)
+    origin_growth = np.minimum.reduceat(growth, od.origin_offsets[:-1]) if len(growth) else growth
+    origin_growth = np.where(np.isfinite(origin_growth), origin_growth, 0.0)
+
+    # the residual demand of every pair (even zero) is assigned, which marks unreachable pairs
+    pair_growth = np.repeat(origin_growth, np.diff(od.origin_offsets))
+    residual = ODDemand(
+        od.origin,
+        od.destination,
+        np.maximum(total - pair_growth * previous_total, 0)[:, None],
+        od.classes,
+    )
+    aon = all_or_nothing(network, residual, previous.cost, keep_origin_flows=True)
+
+    previous_rows = np.searchsorted(od.origins, previous.origins)
+    scaled_origin_flows = sp.diags(origin_growth[previous_rows]) @ previous.origin_flows
+    origin_flows = (
+        aon.origin_flows
+        + sp.csr_matrix(
+            (np.ones(len(previous_rows)), (previous_rows, np.arange(len(previous_rows)))),
+            shape=(len(od.origins), len(previous_rows)),
+        )
+        @ scaled_origin_flows
+    )
+    return AllOrNothingResult(
+        class_flows=aon.class_flows + np.asarray(scaled_origin_flows.sum(axis=0)).T,
+        shortest_path_travel_time=aon.shortest_path_travel_time,
+        unreachable=aon.unreachable,
+        origins=aon.origins,
+        origin_flows=origin_flows.tocsr(),
+    )
@@ -0,0 +1,236 @@
+"""Ranking of network links by how much their loss would cost.
+
+Evaluating every link exactly would be one disruption re-solve per link. Instead, links are first screened
+with the baseline shortest path trees: the score of an edge is its baseline flow times the extra cost of
+the cheapest detour around it (at baseline costs), which is infinite for edges without a detour. Only the
+`top_k` links by score are then removed one at a time and re-equilibrated exactly (see `disruption`), in
+parallel worker processes."""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import _travel_time
+from ireiat.solver.disruption import Baseline, EdgeChange, REMOVE, resolve_disruption
+
+logger = logging.getLogger(__name__)
+
+LINK_ID_COLUMNS = ["original_id", "fraarcid"]
+
+
+def _parallel_alternative_costs(baseline: Baseline, costs: np.ndarray) -> np.ndarray:
+    """Cost of the cheapest other edge with the same tail and head as each edge (inf if there is none)"""
+    network = baseline.network
+    pair = network.pair_index(network.tail, network.head)
+    order = np.lexsort((costs, pair))
+    sorted_pair = pair[order]
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = sorted_pair[1:] != sorted_pair[:-1]
+    first_cost = np.full(network.n_pairs, np.inf)
+    first_cost[sorted_pair[is_first]] = costs[order][is_first]
+    first_edge = np.full(network.n_pairs, -1)
+    first_edge[sorted_pair[is_first]] = order[is_first]
+    second_cost = np.full(network.n_pairs, np.inf)
+    is_second = np.zeros(len(order), dtype=bool)
+    is_second[1:] = ~is_first[1:] & is_first[:-1]
+    second_cost[sorted_pair[is_second]] = costs[order][is_second]
+    return np.where(
+        first_edge[pair] == np.arange(network.n_edges), second_cost[pair], first_cost[pair]
+    )
+
+
+def _has_ancestor(
+    predecessors: np.ndarray,
+    tree: np.ndarray,
+    node: np.ndarray,
+    ancestor: np.ndarray,
+    root: np.ndarray,
+) -> np.ndarray:
+    """Whether `ancestor` is on the shortest path tree path from `root` to `node`, walking all paths
+    simultaneously"""
+    found = np.zeros(len(node), dtype=bool)
+    active = np.flatnonzero((node != root) & (node >= 0))
+    current = node[active].astype(np.int64)
+    while len(active):
+        current = predecessors[tree[active], current].astype(np.int64)
+        hit = current == ancestor[active]
+        found[active[hit]] = True
+        keep = ~hit & (current != root[active]) & (current >= 0)
+        active, current = active[keep], current[keep]
+    return found
+
+
+def detour_costs(baseline: Baseline, edges: np.ndarray) -> np.ndarray:
+    """Cost (at baseline costs) of the cheapest path from the tail to the head of each of `edges` that
+    does not use the edge itself, inf if there is none.
+
+    One shortest path tree is computed per distinct tail. A detour ends with an edge (w, head); its cost is
+    the distance from the tail to w, excluding the w below the head in the tree (whose tree path runs
+    through the edge itself). Detours through those w are missed, so costs are an upper bound; good enough
+    to screen, not to rank."""
+    network = baseline.network
+    costs = network.costs(baseline.flow)
+    pair_costs, cheapest_edge = network.pair_costs(costs)
+    detour = _parallel_alternative_costs(baseline, costs)[edges]
+
+    # pairs by head, to enumerate the last edge (w, head) of a detour
+    pairs_by_head = np.argsort(network.pair_head, kind="stable")
+    head_indptr = np.concatenate(
+        [[0], np.cumsum(np.bincount(network.pair_head, minlength=network.n_nodes))]
+    )
+
+    tails, tree_of_edge = np.unique(network.tail[edges], return_inverse=True)
+    for batch_start, batch_tails, distances, predecessors in network.graph.batched_dijkstra(
+        tails, pair_costs
+    ):
+        in_batch = np.flatnonzero(
+            (tree_of_edge >= batch_start) & (tree_of_edge < batch_start + len(batch_tails))
+        )
+        tree = tree_of_edge[in_batch] - batch_start
+        tail, head = network.tail[edges[in_batch]], network.head[edges[in_batch]]
+
+        # an edge off the tree has a path at least as cheap that avoids it
+        is_tree_edge = (predecessors[tree, head] == tail) & (
+            cheapest_edge[network.pair_index(tail, head)] == edges[in_batch]
+        )
+        detour[in_batch[~is_tree_edge]] = np.minimum(
+            detour[in_batch[~is_tree_edge]], distances[tree, head][~is_tree_edge]
+        )
+
+        # for tree edges, the detour is the cheapest (w, head) with w not below the head
+        candidates = in_batch[is_tree_edge]
+        candidate_tree, candidate_tail, candidate_head = (
+            tree[is_tree_edge],
+            tail[is_tree_edge],
+            head[is_tree_edge],
+        )
+        n_last_edges = head_indptr[candidate_head + 1] - head_indptr[candidate_head]
+        which = np.repeat(np.arange(len(candidates)), n_last_edges)
+        offset = np.arange(len(which)) - np.repeat(
+            np.cumsum(n_last_edges) - n_last_edges, n_last_edges
+        )
+        last_pair = pairs_by_head[head_indptr[candidate_head][which] + offset]
+        w = network.pair_tail[last_pair].astype(np.int64)
+        valid = (
+            (w != candidate_tail[which])
+            & (w != candidate_head[which])
+            & np.isfinite(distances[candidate_tree[which], w])
+        )
+        which, last_pair, w = which[valid], last_pair[valid], w[valid]
+        below_head = _has_ancestor(
+            predecessors,
+            candidate_tree[which],
+            w,
+            candidate_head[which],
+            candidate_tail[which].astype(np.int64),
+        )
+        which, last_pair, w = which[~below_head], last_pair[~below_head], w[~below_head]
+        via_w = distances[candidate_tree[which], w] + pair_costs[last_pair]
+        best = np.full(len(candidates), np.inf)
+        np.minimum.at(best, which, via_w)
+        detour[candidates] = np.minimum(detour[candidates], best)
+    return detour
+
+
+def screen_links(baseline: Baseline, network_df: pd.DataFrame) -> pd.DataFrame:
+    """Screening score of every link (edges sharing an `original_id`, or a FRA arc id) with baseline flow: the
+    sum over its edges of flow times the extra cost of the cheapest detour"""
+    id_columns = [c for c in LINK_ID_COLUMNS if c in network_df.columns]
+    if not id_columns:
+        raise ValueError(
+            f"The network has none of the link id columns {LINK_ID_COLUMNS} (contracted networks "
+            f"cannot be screened)"
+        )
+    has_flow = (baseline.flow > 0) & network_df[id_columns].notna().any(axis=1).to_numpy()
+    edges = np.flatnonzero(has_flow)
+    costs = baseline.network.costs(baseline.flow)[edges]
+    detour = detour_costs(baseline, edges)
+    with np.errstate(invalid="ignore"):
+        extra_cost = np.maximum(detour - costs, 0)
+    edge_scores = pd.DataFrame(
+        {
+            **{c: network_df[c].to_numpy()[edges] for c in id_columns},
+            "edge": edges,
+            "flow": baseline.flow[edges],
+            "detour_cost_delta": extra_cost,
+            "screening_score": baseline.flow[edges] * extra_cost,
+        }
+    )
+    links = edge_scores.groupby(id_columns, as_index=False, dropna=False).agg(
+        edges=("edge", list),
+        flow=("flow", "sum"),
+        detour_cost_delta=("detour_cost_delta", "max"),
+        screening_score=("screening_score", "sum"),
+    )
+    return links.sort_values(["screening_score", "flow"], ascending=False, ignore_index=True)
+
+
+_worker_state: Dict = {}
+
+
+def _initialize_worker(baseline: Baseline, max_gap: float, max_iterations: int) -> None:
+    _worker_state.update(baseline=baseline, max_gap=max_gap, max_iterations=max_iterations)
+
+
+def _evaluate_removal(edges: List[int]) -> Tuple[float, float]:
+    """Total travel time and unassigned demand with `edges` removed"""
+    result = resolve_disruption(
+        _worker_state["baseline"],
+        [EdgeChange(np.asarray(edges), REMOVE)],
+        max_gap=_worker_state["max_gap"],
+        max_iterations=_worker_state["max_iterations"],
+    )
+    return result.total_travel_time, result.unassigned_demand
+
+
+def rank_links(
+    baseline: Baseline,
+    network_df: pd.DataFrame,
+    top_k: int = 20,
+    max_workers: Optional[int] = None,
+    max_gap: float = 1e-4,
+    max_iterations: int = 50,
+) -> pd.DataFrame:
+    """Screens all links with flow and evaluates the removal of the `top_k` exactly, ranking them by the
+    demand their loss leaves unassigned and then by the increase in total travel time. Links beyond the
+    `top_k` keep their screening rank, after the evaluated ones."""
+    links = screen_links(baseline, network_df)
+    top_links = links.head(top_k)
+    logger.info(f"Screened {len(links)} links. Evaluating the removal of {len(top_links)}.")
+
+    edge_lists = [list(edges) for edges in top_links["edges"]]
+    if max_workers == 1:
+        _initialize_worker(baseline, max_gap, max_iterations)
+        evaluations = [_evaluate_removal(edges) for edges in edge_lists]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_initialize_worker,
+            initargs=(baseline, max_gap, max_iterations),
+        ) as executor:
+            evaluations = list(executor.map(_evaluate_removal, edge_lists))
+
+    baseline_travel_time = _travel_time(baseline.flow, baseline.network.costs(baseline.flow))
+    links["evaluated"] = False
+    links["travel_time_increase"] = np.nan
+    links["unassigned_tons"] = np.nan
+    if evaluations:
+        travel_times, unassigned = map(np.array, zip(*evaluations))
+        links.loc[top_links.index, "evaluated"] = True
+        links.loc[top_links.index, "travel_time_increase"] = travel_times - baseline_travel_time
+        links.loc[top_links.index, "unassigned_tons"] = unassigned
+
+    ranked = pd.concat(
+        [
+            links.loc[links["evaluated"]].sort_values(
+                ["unassigned_tons", "travel_time_increase"], ascending=False
+            ),
+            links.loc[~links["evaluated"]],
+        ],
+        ignore_index=True,
+    )
+    ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+    return ranked.drop(columns="edges")
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ireiat.config.constants import COMMODITY_FIELD
+
+SINGLE_CLASS_NAME = "all"
+
+
+@dataclass
+class ODDemand:
+    """Origin-destination demand of one or more classes (e.g. commodities) sharing the same network.
+    Row i of `demand` is the demand of each class from `origin[i]` to `destination[i]`. Rows are sorted by
+    origin, so the pairs of `origins[j]` are rows `origin_offsets[j]:origin_offsets[j + 1]` (a CSR layout).
+    """
+
+    origin: np.ndarray
+    destination: np.ndarray
+    demand: np.ndarray  # n_od x n_classes
+    classes: np.ndarray
+
+    def __post_init__(self):
+        if np.any(self.origin[1:] < self.origin[:-1]):
+            order = np.argsort(self.origin, kind="stable")
+            self.origin, self.destination = self.origin[order], self.destination[order]
+            self.demand = self.demand[order]
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        od_df: pd.DataFrame,
+        class_column: Optional[str] = COMMODITY_FIELD,
+        tons_column: str = "tons",
+    ) -> "ODDemand":
+        """Creates the demand from a long (from, to, [class_column], tons) TAP OD dataframe. Without the
+        class column all demand belongs to a single class. A single class dataframe already sorted by
+        (from, to) without duplicate pairs, as the `tap_*_tons` assets write it, is used as is.
+        `tons_column` selects another tons column, such as a horizon year (e.g. `tons_2030`)."""
+        if class_column is None or class_column not in od_df.columns:
+            origin = od_df["from"].to_numpy(dtype=np.int32)
+            destination = od_df["to"].to_numpy(dtype=np.int32)
+            if _is_strictly_sorted(origin, destination):
+                return cls(
+                    origin=origin,
+                    destination=destination,
+                    demand=od_df[[tons_column]].to_numpy(dtype=np.float64),
+                    classes=np.array([SINGLE_CLASS_NAME]),
+                )
+            grouped = od_df.groupby(["from", "to"], as_index=False)[tons_column].sum()
+            return cls(
+                origin=grouped["from"].to_numpy(dtype=np.int32),
+                destination=grouped["to"].to_numpy(dtype=np.int32),
+                demand=grouped[[tons_column]].to_numpy(dtype=np.float64),
+                classes=np.array([SINGLE_CLASS_NAME]),
+            )
+        wide = od_df.pivot_table(
+            index=["from", "to"],
+            columns=class_column,
+            values=tons_column,
+            aggfunc="sum",
+            fill_value=0,
+            observed=True,
+        )
+        return cls(
+            origin=wide.index.get_level_values("from").to_numpy(dtype=np.int32),
+            destination=wide.index.get_level_values("to").to_numpy(dtype=np.int32),
+            demand=wide.to_numpy(dtype=np.float64),
+            classes=wide.columns.to_numpy(),
+        )
+
+    @property
+    def n_classes(self) -> int:
+        return self.demand.shape[1]
+
+    @property
+    def total(self) -> np.ndarray:
+        """Demand of all classes of each OD pair"""
+        return self.demand.sum(axis=1)
+
+    @cached_property
+    def origin_offsets(self) -> np.ndarray:
+        """Row offsets of the pairs of each of `origins` (and the number of rows last)"""
+        is_start = np.ones(len(self.origin), dtype=bool)
+        is_start[1:] = self.origin[1:] != self.origin[:-1]
+        return np.append(np.flatnonzero(is_start), len(self.origin))
+
+    @cached_property
+    def origins(self) -> np.ndarray:
+        """Unique origins, sorted"""
+        return self.origin[self.origin_offsets[:-1]]
+
+    def subset(self, mask: np.ndarray) -> "ODDemand":
+        return ODDemand(self.origin[mask], self.destination[mask], self.demand[mask], self.classes)
+
+
+def _is_strictly_sorted(origin: np.ndarray, destination: np.ndarray) -> bool:
+    """Whether (origin, destination) pairs are sorted and unique"""
+    origin, destination = origin.astype(np.int64), destination.astype(np.int64)
+    d_origin = np.diff(origin)
+    return bool(np.all((d_origin > 0) | ((d_origin == 0) & (np.diff(destination) > 0))))
@@ -0,0 +1,186 @@
+"""Incremental re-solves of a baseline TAP solution after link disruptions.
+
+A disruption is a list of `EdgeChange`s (edges removed, capacity scaled or free flow time changed). Rather
+than solving the disrupted network from scratch, only the origins whose baseline flows use a changed edge
+are re-assigned; the flows of all other origins are kept as fixed background flow. This assumes that the
+unaffected origins do not react to the (local) change in congestion, which keeps a re-solve to a fraction
+of the cost of a full solve.
+
+The baseline must be solved with `ireiat solve --engine python --keep-origin-flows`. Re-solves are on total
+(not per-class) flows."""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from ireiat.solver.assignment import AssignmentResult, frank_wolfe
+from ireiat.solver.demand import ODDemand, SINGLE_CLASS_NAME
+from ireiat.solver.io import read_origin_flows
+from ireiat.solver.network import TAPNetwork
+
+logger = logging.getLogger(__name__)
+
+REMOVE = "remove"
+SCALE_CAPACITY = "scale_capacity"
+SET_FFT = "set_fft"
+EDGE_CHANGE_ACTIONS = (REMOVE, SCALE_CAPACITY, SET_FFT)
+
+
+@dataclass
+class EdgeChange:
+    """A change applied to one or more network edges (indices into the network edge arrays). `value` is the
+    capacity factor for `scale_capacity` and the new free flow time for `set_fft`."""
+
+    edges: np.ndarray
+    action: str
+    value: float = np.nan
+
+    def __post_init__(self):
+        self.edges = np.atleast_1d(np.asarray(self.edges, dtype=np.int64))
+        if self.action not in EDGE_CHANGE_ACTIONS:
+            raise ValueError(f"Unknown edge change {self.action}. Use one of {EDGE_CHANGE_ACTIONS}")
+        if self.action != REMOVE and not (np.isfinite(self.value) and self.value > 0):
+            raise ValueError(f"{self.action} requires a positive value, not {self.value}")
+
+    def apply(self, network: TAPNetwork) -> None:
+        if self.action == REMOVE:
+            network.fft[self.edges] = np.inf  # infinite cost edges are never on a shortest path
+        elif self.action == SCALE_CAPACITY:
+            network.capacity[self.edges] *= self.value
+        else:
+            network.fft[self.edges] = self.value
+
+    def degrades(self, network: TAPNetwork) -> bool:
+        """Whether the change can only make the edges costlier"""
+        if self.action == REMOVE:
+            return True
+        if self.action == SCALE_CAPACITY:
+            return self.value <= 1
+        return bool(np.all(self.value >= network.fft[self.edges]))
+
+
+def apply_edge_changes(network: TAPNetwork, changes: Sequence[EdgeChange]) -> TAPNetwork:
+    """Copy of `network` with `changes` applied"""
+    disrupted = TAPNetwork(
+        network.n_nodes,
+        network.tail,
+        network.head,
+        network.fft.copy(),
+        network.capacity.copy(),
+        network.alpha,
+        network.beta,
+    )
+    for change in changes:
+        change.apply(disrupted)
+    return disrupted
+
+
+def edge_changes_from_dataframe(
+    changes_df: pd.DataFrame, network_df: pd.DataFrame
+) -> List[EdgeChange]:
+    """Edge changes from a table of (original_id | tail, head), action, value rows. An `original_id`
+    change applies to every network edge of that link (e.g. both directions)."""
+    key_columns = ["original_id"] if "original_id" in changes_df.columns else ["tail", "head"]
+    edge_keys = network_df[key_columns].reset_index(drop=True)
+    changes = []
+    for row in changes_df.to_dict("records"):
+        is_edge = np.logical_and.reduce([edge_keys[c] == row[c] for c in key_columns])
+        edges = np.flatnonzero(is_edge)
+        if len(edges) == 0:
+            raise ValueError(f"No network edge matches {dict((c, row[c]) for c in key_columns)}")
+        changes.append(EdgeChange(edges, row["action"], row.get("value", np.nan)))
+    return changes
+
+
+@dataclass
+class Baseline:
+    """A solved TAP with its per-origin flows"""
+
+    network: TAPNetwork
+    od: ODDemand
+    flow: np.ndarray
+    origins: np.ndarray
+    origin_flows: sp.csr_matrix
+
+    @classmethod
+    def from_result(cls, network: TAPNetwork, od: ODDemand, result: AssignmentResult) -> "Baseline":
+        if result.origin_flows is None:
+            raise ValueError("The baseline was solved without keeping origin flows")
+        return cls(network, od, result.flow, result.origins, result.origin_flows)
+
+    @classmethod
+    def from_files(
+        cls, network_file_path: Path, od_file_path: Path, solution_file_path: Path
+    ) -> "Baseline":
+        """Reads a baseline solved by the python engine with `--keep-origin-flows`"""
+        network = TAPNetwork.from_dataframe(pd.read_parquet(network_file_path))
+        od = ODDemand.from_dataframe(pd.read_parquet(od_file_path), class_column=None)
+        solution = pd.read_parquet(solution_file_path, columns=["from", "to", "flow"])
+        if not (
+            np.array_equal(solution["from"].to_numpy(), network.tail)
+            and np.array_equal(solution["to"].to_numpy(), network.head)
+        ):
+            raise ValueError(f"{solution_file_path} was not solved on {network_file_path}")
+        try:
+            origins, origin_flows = read_origin_flows(solution_file_path)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
+                f"No origin flows for {solution_file_path}. "
+                f"Solve with `ireiat solve --engine python --keep-origin-flows`."
+            ) from e
+        return cls(network, od, solution["flow"].to_numpy(), origins, origin_flows)
+
+    def affected_origins(self, changes: Sequence[EdgeChange]) -> np.ndarray:
+        """Mask of the origins to re-assign: those using a changed edge, or all of them if a change could
+        make an edge cheaper (and so attract any origin)"""
+        if not all(change.degrades(self.network) for change in changes):
+            logger.info("Some changes improve edges. Re-assigning all origins.")
+            return np.ones(len(self.origins), dtype=bool)
+        changed_edges = np.unique(np.concatenate([change.edges for change in changes]))
+        flow_on_changed_edges = self.origin_flows[:, changed_edges].sum(axis=1)
+        return np.asarray(flow_on_changed_edges).ravel() > 0
+
+
+def resolve_disruption(
+    baseline: Baseline,
+    changes: Sequence[EdgeChange],
+    max_gap: float = 1e-4,
+    max_iterations: int = 100,
+) -> AssignmentResult:
+    """Re-equilibrates the flows of the origins affected by `changes`, keeping the baseline flows of the
+    other origins fixed. Returns the flows of all origins on the disrupted network."""
+    disrupted = apply_edge_changes(baseline.network, changes)
+    affected = baseline.affected_origins(changes)
+    logger.info(f"Re-assigning {affected.sum()} of {len(baseline.origins)} origins")
+
+    background_flow = np.asarray(baseline.origin_flows[~affected].sum(axis=0)).ravel()
+    affected_od = baseline.od.subset(np.isin(baseline.od.origin, baseline.origins[affected]))
+    resolved = frank_wolfe(
+        disrupted,
+        affected_od,
+        max_gap=max_gap,
+        max_iterations=max_iterations,
+        background_flow=background_flow,
+        keep_origin_flows=True,
+    )
+
+    origins = np.concatenate([baseline.origins[~affected], resolved.origins])
+    order = np.argsort(origins)
+    origin_flows = sp.vstack([baseline.origin_flows[~affected], resolved.origin_flows]).tocsr()
+    flow = background_flow + resolved.flow
+    return AssignmentResult(
+        flow=flow,
+        class_flows=flow[:, np.newaxis],
+        cost=disrupted.costs(flow),
+        classes=np.array([SINGLE_CLASS_NAME]),
+        relative_gap=resolved.relative_gap,
+        iterations=resolved.iterations,
+        unassigned_demand=resolved.unassigned_demand,
+        origins=origins[order],
+        origin_flows=origin_flows[order],
+    )
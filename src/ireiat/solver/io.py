@@ -0,0 +1,169 @@
+import logging
+import pickle
+from pathlib import Path
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from ireiat.solver.assignment import AssignmentResult, frank_wolfe, warm_start
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.hierarchical import hierarchical_start, node_zones
+from ireiat.solver.network import TAPNetwork
+
+logger = logging.getLogger(__name__)
+
+
+def class_flows_path(output_file_path: Path) -> Path:
+    """Location of the per-class flows written alongside a solution file"""
+    output_file_path = Path(output_file_path)
+    return output_file_path.with_name(f"{output_file_path.stem}_class_flows.npz")
+
+
+def write_class_flows(
+    result: AssignmentResult, network: TAPNetwork, output_file_path: Path
+) -> Path:
+    """Writes the (n_edges x n_classes) class flows, the class names and the edges they belong to"""
+    path = class_flows_path(output_file_path)
+    # `from` is a keyword, so the arrays are passed as a dict
+    arrays: Dict[str, Any] = {
+        "flows": result.class_flows.astype(np.float32),
+        "classes": result.classes.astype(str),
+        "from": network.tail,
+        "to": network.head,
+    }
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def origin_flows_path(output_file_path: Path) -> Path:
+    """Location of the per-origin flows written alongside a solution file"""
+    output_file_path = Path(output_file_path)
+    return output_file_path.with_name(f"{output_file_path.stem}_origin_flows.npz")
+
+
+def write_origin_flows(result: AssignmentResult, output_file_path: Path) -> Path:
+    """Writes the sparse (n_origins x n_edges) origin flows and the origin nodes they belong to"""
+    path = origin_flows_path(output_file_path)
+    origin_flows = result.origin_flows.tocsr()
+    np.savez_compressed(
+        path,
+        origins=result.origins,
+        data=origin_flows.data.astype(np.float32),
+        indices=origin_flows.indices,
+        indptr=origin_flows.indptr,
+        shape=np.array(origin_flows.shape),
+    )
+    return path
+
+
+def read_origin_flows(output_file_path: Path) -> Tuple[np.ndarray, sp.csr_matrix]:
+    """Reads the origins and origin flows written by `write_origin_flows`"""
+    with np.load(origin_flows_path(output_file_path)) as npz:
+        origin_flows = sp.csr_matrix(
+            (npz["data"].astype(np.float64), npz["indices"], npz["indptr"]),
+            shape=tuple(npz["shape"]),
+        )
+        return npz["origins"], origin_flows
+
+
+def solve_files(
+    network_file_path: Path,
+    od_file_path: Path,
+    output_file_path: Path,
+    max_gap: float,
+    max_iterations: int,
+    keep_origin_flows: bool = False,
+    county_pairs_file_path: Optional[Path] = None,
+    faf_allocation_map_path: Optional[Path] = None,
+) -> AssignmentResult:
+    """Solves the TAP of a network and OD parquet file pair and writes the solution parquet file. When the
+    OD file carries a commodity column the assignment is multi-class and the flows of each class are also
+    written (see `class_flows_path`). With `keep_origin_flows`, the flows of each origin are written too
+    (see `origin_flows_path`), which disruption re-solves start from.
+
+    Given the county pairs behind the OD file (`tap_*_tons_county_pairs`) and the pickled FAF zone -> county
+    allocation map (`faf_id_to_county_id_allocation_map`), the demand is first solved aggregated to FAF
+    zones and the full solve starts from the coarse equilibrium costs (see `hierarchical`)."""
+    network = TAPNetwork.from_dataframe(pd.read_parquet(network_file_path))
+    od = ODDemand.from_dataframe(pd.read_parquet(od_file_path))
+    logger.info(
+        f"Solving {len(od.origin)} OD pairs of {od.n_classes} class(es) on a network of "
+        f"{network.n_nodes} nodes and {network.n_edges} edges"
+    )
+    initial = None
+    if county_pairs_file_path is not None:
+        with open(faf_allocation_map_path, "rb") as fp:
+            faf_id_to_county_id_allocation_map = pickle.load(fp)
+        node_zone = node_zones(
+            pd.read_parquet(county_pairs_file_path),
+            faf_id_to_county_id_allocation_map,
+            network.n_nodes,
+        )
+        initial, _ = hierarchical_start(network, od, node_zone, keep_origin_flows=keep_origin_flows)
+    result = frank_wolfe(
+        network,
+        od,
+        max_gap=max_gap,
+        max_iterations=max_iterations,
+        keep_origin_flows=keep_origin_flows,
+        initial=initial,
+    )
+    result.to_dataframe(network).to_parquet(output_file_path)
+    logger.info(f"Written to {output_file_path}")
+    if od.n_classes > 1:
+        logger.info(
+            f"Class flows written to {write_class_flows(result, network, output_file_path)}"
+        )
+    if keep_origin_flows:
+        logger.info(f"Origin flows written to {write_origin_flows(result, output_file_path)}")
+    return result
+
+
+def horizon_output_path(output_file_path: Path, tons_column: str) -> Path:
+    """Location of the solution of one tons column (e.g. a year) of a horizon solve"""
+    output_file_path = Path(output_file_path)
+    return output_file_path.with_name(
+        f"{output_file_path.stem}_{tons_column}{output_file_path.suffix}"
+    )
+
+
+def solve_horizon_files(
+    network_file_path: Path,
+    od_file_path: Path,
+    output_file_path: Path,
+    tons_columns: List[str],
+    max_gap: float,
+    max_iterations: int,
+) -> Dict[str, AssignmentResult]:
+    """Solves the TAP of each of `tons_columns` of an OD parquet file (e.g. the years of a FAF horizon,
+    carried by the pipeline's horizon demand fields) in turn, on total demand. Each column after the first
+    is warm-started from the equilibrium of the previous one (see `warm_start`). The solution of each
+    column is written to `horizon_output_path`."""
+    network = TAPNetwork.from_dataframe(pd.read_parquet(network_file_path))
+    od_df = pd.read_parquet(od_file_path)
+    results: Dict[str, AssignmentResult] = {}
+    previous_od, previous = None, None
+    for tons_column in tons_columns:
+        od = ODDemand.from_dataframe(od_df, class_column=None, tons_column=tons_column)
+        initial = None if previous is None else warm_start(network, od, previous_od, previous)
+        result = frank_wolfe(
+            network,
+            od,
+            max_gap=max_gap,
+            max_iterations=max_iterations,
+            keep_origin_flows=True,
+            initial=initial,
+        )
+        logger.info(
+            f"{tons_column}: relative gap {result.relative_gap:.3e} after {result.iterations} "
+            f"iterations{'' if previous is None else ' (warm started)'}"
+        )
+        path = horizon_output_path(output_file_path, tons_column)
+        result.to_dataframe(network).to_parquet(path)
+        logger.info(f"Written to {path}")
+        results[tons_column] = result
+        previous_od, previous = od, result
+    return results
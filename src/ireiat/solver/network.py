@@ -0,0 +1,74 @@
+from dataclasses import dataclass, field
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from ireiat.util.csr_graph import CSRGraph
+
+NETWORK_COLUMNS = ["tail", "head", "fft", "capacity", "alpha", "beta"]
+
+
+@dataclass
+class TAPNetwork:
+    """Directed network of a traffic assignment problem with BPR link performance functions,
+    cost = fft * (1 + alpha * (flow / capacity) ^ beta), stored as flat edge arrays.
+
+    Parallel edges (same tail and head) are allowed. Shortest paths only ever use the cheapest of them,
+    so shortest path searches run on the graph of unique (tail, head) node pairs."""
+
+    n_nodes: int
+    tail: np.ndarray
+    head: np.ndarray
+    fft: np.ndarray
+    capacity: np.ndarray
+    alpha: np.ndarray
+    beta: np.ndarray
+
+    # the graph of unique (tail, head) pairs that shortest path searches run on
+    graph: CSRGraph = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.tail = np.asarray(self.tail, dtype=np.int32)
+        self.head = np.asarray(self.head, dtype=np.int32)
+        for name in ["fft", "capacity", "alpha", "beta"]:
+            setattr(self, name, np.asarray(getattr(self, name), dtype=np.float64))
+        self.graph = CSRGraph(self.n_nodes, self.tail, self.head, self.fft)
+
+    @classmethod
+    def from_dataframe(cls, network_df: pd.DataFrame) -> "TAPNetwork":
+        """Creates a network from a TAP network dataframe (`tap_*_network_dataframe`) whose tail and head
+        are zero-based node indices"""
+        n_nodes = int(max(network_df["tail"].max(), network_df["head"].max())) + 1
+        return cls(n_nodes, *(network_df[c].to_numpy() for c in NETWORK_COLUMNS))
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.tail)
+
+    @property
+    def n_pairs(self) -> int:
+        return self.graph.n_pairs
+
+    @property
+    def pair_tail(self) -> np.ndarray:
+        return self.graph.pair_tail
+
+    @property
+    def pair_head(self) -> np.ndarray:
+        return self.graph.pair_head
+
+    def costs(self, flow: np.ndarray) -> np.ndarray:
+        """Travel time of each edge given total edge `flow`"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(self.capacity > 0, flow / self.capacity, 0.0)
+        return self.fft * (1 + self.alpha * np.power(ratio, self.beta))
+
+    def pair_costs(self, costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cost of each unique (tail, head) pair (the cheapest of its parallel edges) and the edge that
+        attains it"""
+        return self.graph.pair_weights(costs)
+
+    def pair_index(self, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+        """Index of the (tail, head) pairs, which must exist in the network"""
+        return self.graph.pair_index(tail, head)
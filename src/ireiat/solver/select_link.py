@@ -0,0 +1,117 @@
+"""Select-link analysis: the origin-destination demand whose paths use a given set of edges.
+
+Answered from the per-origin flows of a solution (`ireiat solve --engine python --keep-origin-flows`)
+without re-solving. The flow of an origin arriving at a node is assumed to be mixed, i.e. it continues on
+each outgoing edge, or ends at the node, in proportion to the origin's flows there (the usual proportionality
+assumption of origin-based flows). Flow through the selected edges is then traced downstream to the
+destinations where it ends."""
+
+import logging
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from ireiat.solver.disruption import Baseline
+
+logger = logging.getLogger(__name__)
+
+# traced flow below this fraction of the selected flow is dropped
+MASS_TOLERANCE = 1e-9
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Values at `query` of a sparse mapping given as sorted `keys`, zero where absent"""
+    if len(keys) == 0:
+        return np.zeros(len(query))
+    position = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    return np.where(keys[position] == query, values[position], 0.0)
+
+
+def link_edges(network_df: pd.DataFrame, original_ids) -> np.ndarray:
+    """Indices of the network edges of the links `original_ids`"""
+    original_ids = pd.Series(list(original_ids)).astype(network_df["original_id"].dtype)
+    edges = np.flatnonzero(network_df["original_id"].isin(original_ids).to_numpy())
+    if len(edges) == 0:
+        raise ValueError(f"No network edge belongs to links {list(original_ids)}")
+    return edges
+
+
+def select_link(baseline: Baseline, edges: np.ndarray) -> pd.DataFrame:
+    """Origin-destination (from, to, tons) demand traversing any of `edges` (network edge indices)"""
+    network = baseline.network
+    n_nodes, n_edges = network.n_nodes, network.n_edges
+    is_selected = np.zeros(n_edges, dtype=bool)
+    is_selected[edges] = True
+
+    origin_flows = baseline.origin_flows.tocsr()
+    uses_selected = np.asarray(origin_flows[:, is_selected].sum(axis=1)).ravel() > 0
+    rows = np.flatnonzero(uses_selected)
+    flows = origin_flows[rows].tocoo()
+    flows.sum_duplicates()  # sorted by (row, edge)
+    flow_keys = flows.row.astype(np.int64) * n_edges + flows.col
+    flow_values = flows.data.astype(np.float64)
+
+    # inflow of each (origin, node) and the demand ending there
+    inflow = sp.csr_matrix(
+        (flow_values, (flows.row, network.head[flows.col])), shape=(len(rows), n_nodes)
+    ).tocoo()
+    inflow.sum_duplicates()
+    inflow_keys = inflow.row.astype(np.int64) * n_nodes + inflow.col
+    origins = baseline.origins[rows]
+    od = baseline.od.subset(np.isin(baseline.od.origin, origins))
+    demand_keys = np.searchsorted(origins, od.origin).astype(np.int64) * n_nodes + od.destination
+    demand_order = np.argsort(demand_keys)
+    demand_keys, demand_values = demand_keys[demand_order], od.total[demand_order]
+
+    # edges by tail, to continue traced flow along the outgoing edges of a node
+    edges_by_tail = np.argsort(network.tail, kind="stable")
+    tail_indptr = np.concatenate([[0], np.cumsum(np.bincount(network.tail, minlength=n_nodes))])
+
+    # trace the flow of the selected edges
+    seeded = is_selected[flows.col]
+    row, node, mass = (
+        flows.row[seeded].astype(np.int64),
+        network.head[flows.col[seeded]],
+        flow_values[seeded],
+    )
+    tolerance = MASS_TOLERANCE * mass.sum()
+    ended_keys, ended_tons = [], []
+    for _ in range(n_nodes):
+        if len(row) == 0:
+            break
+        keys, inverse = np.unique(row * n_nodes + node, return_inverse=True)
+        mass = np.bincount(inverse, weights=mass, minlength=len(keys))
+        row, node = keys // n_nodes, keys % n_nodes
+        node_inflow = _lookup(inflow_keys, inflow.data, keys)
+        share = np.divide(mass, node_inflow, out=np.zeros(len(keys)), where=node_inflow > 0)
+
+        ending = np.minimum(share * _lookup(demand_keys, demand_values, keys), mass)
+        ended_keys.append(keys[ending > 0])
+        ended_tons.append(ending[ending > 0])
+
+        # continue on the origin's outgoing edges (selected edges carry their own flow already)
+        out_degree = tail_indptr[node + 1] - tail_indptr[node]
+        packet = np.repeat(np.arange(len(keys)), out_degree)
+        offset = np.arange(len(packet)) - np.repeat(np.cumsum(out_degree) - out_degree, out_degree)
+        out_edge = edges_by_tail[tail_indptr[node][packet] + offset]
+        out_flow = _lookup(flow_keys, flow_values, row[packet] * n_edges + out_edge)
+        continues = (out_flow > 0) & ~is_selected[out_edge]
+        packet, out_edge = packet[continues], out_edge[continues]
+        row, node = row[packet], network.head[out_edge].astype(np.int64)
+        mass = share[packet] * out_flow[continues]
+        keep = mass > tolerance
+        row, node, mass = row[keep], node[keep], mass[keep]
+    else:
+        logger.warning("Traced flow did not drain. The origin flows may contain cycles.")
+
+    ended_key_array = np.concatenate(ended_keys) if ended_keys else np.zeros(0, dtype=np.int64)
+    ended_ton_array = np.concatenate(ended_tons) if ended_tons else np.zeros(0)
+    od_tons = pd.DataFrame(
+        {
+            "from": origins[ended_key_array // n_nodes],
+            "to": ended_key_array % n_nodes,
+            "tons": ended_ton_array,
+        }
+    )
+    return od_tons.groupby(["from", "to"], as_index=False)["tons"].sum()
@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ireiat.data_pipeline.assets.demand.faf5_helpers import faf5_compute_county_tons_for_mode
+
+
+class TestFAF5Helpers(unittest.TestCase):
+
+    def setUp(self):
+        self.allocation_map = {
+            "11": {("01", "001"): 0.25, ("01", "003"): 0.75},
+            "12": {("02", "001"): 1.0},
+        }
+
+    def test_county_tons_are_allocated_by_share(self):
+        faf_demand = pd.DataFrame({"dms_orig": ["11"], "dms_dest": ["12"], "tons_2022": [8.0]})
+        county_tons = faf5_compute_county_tons_for_mode(
+            faf_demand, self.allocation_map, "tons_2022", 1e-5
+        )
+        self.assertEqual(
+            county_tons.set_index("county_orig")["tons"].to_dict(), {"001": 2.0, "003": 6.0}
+        )
+
+    def test_commodities_are_kept_separate(self):
+        faf_demand = pd.DataFrame(
+            {
+                "dms_orig": ["11", "11"],
+                "dms_dest": ["12", "12"],
+                "sctg2": ["01", "43"],
+                "tons_2022": [8.0, 4.0],
+            }
+        )
+        county_tons = faf5_compute_county_tons_for_mode(
+            faf_demand, self.allocation_map, "tons_2022", 1e-5
+        )
+        self.assertEqual(len(county_tons), 4)
+        self.assertEqual(
+            county_tons.groupby("sctg2")["tons"].sum().to_dict(), {"01": 8.0, "43": 4.0}
+        )
+
+    def test_cutoff_applies_to_the_county_pair_total_of_the_commodities(self):
+        commodities = [f"{c:02d}" for c in range(1, 11)]
+        demand = {"dms_orig": ["12"] * 10, "dms_dest": ["11"] * 10, "tons_2022": [3.6] * 10}
+        by_commodity = faf5_compute_county_tons_for_mode(
+            pd.DataFrame({**demand, "sctg2": commodities}),
+            self.allocation_map,
+            "tons_2022",
+            1e-5,
+            tons_cutoff=1.0,
+        )
+        single_class = faf5_compute_county_tons_for_mode(
+            pd.DataFrame(demand), self.allocation_map, "tons_2022", 1e-5, tons_cutoff=1.0
+        )
+        # 0.9 kt of each commodity go to county 001, 9 kt in total
+        self.assertEqual(len(by_commodity), 20)
+        self.assertEqual(
+            by_commodity.groupby("county_dest", observed=True)["tons"].sum().round(6).to_dict(),
+            single_class.set_index("county_dest")["tons"].round(6).to_dict(),
+        )
+        self.assertAlmostEqual(by_commodity["tons"].sum(), 36.0)
+
+    def test_horizon_fields_share_the_allocation(self):
+        faf_demand = pd.DataFrame(
+            {
+                "dms_orig": ["11", "12"],
+                "dms_dest": ["12", "11"],
+                "tons_2022": [8.0, 0.0],
+                "tons_2030": [12.0, 4.0],
+            }
+        )
+        county_tons = faf5_compute_county_tons_for_mode(
+            faf_demand, self.allocation_map, ["tons_2022", "tons_2030"], 1e-5
+        )
+        # the 12 -> 11 pairs have no 2022 tons but are kept for their 2030 tons
+        self.assertEqual(len(county_tons), 4)
+        by_orig = county_tons.groupby("state_orig", observed=True)[["tons", "tons_2030"]].sum()
+        self.assertEqual(by_orig.loc["01"].to_dict(), {"tons": 8.0, "tons_2030": 12.0})
+        self.assertEqual(by_orig.loc["02"].to_dict(), {"tons": 0.0, "tons_2030": 4.0})
+
+    def test_fips_are_dictionary_encoded(self):
+        faf_demand = pd.DataFrame({"dms_orig": ["11"], "dms_dest": ["11"], "tons_2022": [8.0]})
+        county_tons = faf5_compute_county_tons_for_mode(
+            faf_demand, self.allocation_map, "tons_2022", 1e-5
+        )
+        is_self = (county_tons["state_orig"] == county_tons["state_dest"]) & (
+            county_tons["county_orig"] == county_tons["county_dest"]
+        )
+        self.assertEqual(is_self.sum(), 2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "county_tons.parquet"
+            county_tons.to_parquet(path, index=False)
+            schema = pq.read_schema(path)
+        for field in ["state_orig", "county_orig", "state_dest", "county_dest"]:
+            self.assertTrue(pa.types.is_dictionary(schema.field(field).type))
@@ -6,7 +6,19 @@ from ireiat.data_pipeline.assets.rail_network.impedance import (
     generate_impedance_graph,
     _generate_subgraphs,
 )
-from ireiat.data_pipeline.assets.rail_network import SEPARATION_ATTRIBUTE_NAME
+from ireiat.data_pipeline.assets.rail_network import (
+    OWNER_VOCABULARY_ATTRIBUTE,
+    SEPARATION_ATTRIBUTE_NAME,
+)
+from ireiat.data_pipeline.assets.rail_network.impedance import IMPEDANCE_OWNER_MASK
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary, single_owner_masks
+
+VOCABULARY = OwnerVocabulary(("A", "B", "C"))
+
+
+def _set_owners(g: ig.Graph, owner_sets: list) -> None:
+    g[OWNER_VOCABULARY_ATTRIBUTE] = VOCABULARY
+    g.es[SEPARATION_ATTRIBUTE_NAME] = [VOCABULARY.encode(owners) for owners in owner_sets]
 
 
 class TestImpedances(unittest.TestCase):
@@ -17,12 +29,13 @@ class TestImpedances(unittest.TestCase):
         g.add_edges([(0, 1), (1, 2)])
         g.es["origin_coords"] = [(0, 0), (1, 1)]
         g.es["destination_coords"] = [(1, 1), (2, 2)]
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A", "B"}, {"B"}]
+        _set_owners(g, [{"A", "B"}, {"B"}])
         s = _generate_subgraphs(g)
         self.assertEqual(len(s.keys()), 2)  # just A and B
         a_graph, b_graph = s["A"], s["B"]
         self.assertEqual(len(a_graph.es), 1)  # A graph has 1 edge
         self.assertEqual(len(b_graph.es), 2)  # B graph has 2 edges
+        self.assertEqual(set(b_graph.es[SEPARATION_ATTRIBUTE_NAME]), {VOCABULARY.encode(["B"])})
 
     def _node_edge_impedance_confirmation(
         self, g: ig.Graph, expected_nodes: int, expected_edges: int, expected_impedance_edges: int
@@ -32,14 +45,14 @@ class TestImpedances(unittest.TestCase):
         self.assertEqual(len(i.vs), expected_nodes)  # should have expected nodes
         self.assertEqual(len(i.es), expected_edges)  # should have expected edges
         self.assertEqual(
-            len(i.es.select(owners_eq="imp")), expected_impedance_edges
+            len(i.es.select(owners_eq=IMPEDANCE_OWNER_MASK)), expected_impedance_edges
         )  # should have expected impedance edge, relies on 'owner' being the separation attribute
 
     def test_simple_graph_establishes_sensible_impedances(self):
         g = ig.Graph(directed=True)
         g.add_vertices(4)
         g.add_edges([(0, 1), (1, 2), (2, 3)])
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A", "B"}, {"A", "B"}, {"B"}]
+        _set_owners(g, [{"A", "B"}, {"A", "B"}, {"B"}])
         g.es["origin_coords"] = [(0, 0), (1, 1), (2, 2)]
         g.es["destination_coords"] = [(1, 1), (2, 2), (3, 3)]
         self._node_edge_impedance_confirmation(g, 7, 6, 1)
@@ -48,7 +61,7 @@ class TestImpedances(unittest.TestCase):
         g = ig.Graph(directed=True)
         g.add_vertices(4)
         g.add_edges([(0, 1), (1, 2), (1, 3)])
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A"}, {"A"}, {"C"}]
+        _set_owners(g, [{"A"}, {"A"}, {"C"}])
         g.es["origin_coords"] = [(0, 0), (1, 1), (1, 1)]
         g.es["destination_coords"] = [(1, 1), (2, 2), (3, 3)]
         self._node_edge_impedance_confirmation(g, 5, 4, 1)
@@ -57,7 +70,7 @@ class TestImpedances(unittest.TestCase):
         g = ig.Graph(directed=True)
         g.add_vertices(5)
         g.add_edges([(0, 1), (1, 2), (3, 1), (1, 4)])
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A"}, {"A"}, {"C"}, {"C"}]
+        _set_owners(g, [{"A"}, {"A"}, {"C"}, {"C"}])
         g.es["origin_coords"] = [(0, 0), (1, 1), (3, 3), (1, 1)]
         g.es["destination_coords"] = [(1, 1), (2, 2), (1, 1), (4, 4)]
         self._node_edge_impedance_confirmation(g, 6, 6, 2)
@@ -67,7 +80,7 @@ class TestImpedances(unittest.TestCase):
         g.add_vertices(5)
         edges = [(0, 1), (1, 0), (1, 2), (2, 1), (3, 1), (1, 3), (1, 4), (4, 1)]
         g.add_edges(edges)
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A"}, {"A"}, {"C"}, {"C"}]
+        _set_owners(g, [{"A"}, {"A"}, {"C"}, {"C"}])
         g.es["origin_coords"] = [(o, o) for o, _ in edges]
         g.es["destination_coords"] = [(d, d) for _, d in edges]
         self._node_edge_impedance_confirmation(g, 6, 10, 2)
@@ -77,7 +90,28 @@ class TestImpedances(unittest.TestCase):
         g.add_vertices(5)
         edges = [(0, 1), (1, 2), (2, 3), (2, 4)]
         g.add_edges(edges)
-        g.es[SEPARATION_ATTRIBUTE_NAME] = [{"A", "B"}, {"B"}, {"A", "B"}, {"C"}]
+        _set_owners(g, [{"A", "B"}, {"B"}, {"A", "B"}, {"C"}])
         g.es["origin_coords"] = [(o, o) for o, _ in edges]
         g.es["destination_coords"] = [(d, d) for _, d in edges]
         self._node_edge_impedance_confirmation(g, 10, 9, 3)
+
+
+class TestOwnerVocabulary(unittest.TestCase):
+
+    def test_masks_round_trip_owner_sets(self):
+        vocabulary = OwnerVocabulary.from_owners(["NS", "CSXT", "NS", "BNSF", "NS", "CSXT"])
+        self.assertEqual(vocabulary.owners, ("NS", "CSXT", "BNSF"))  # most frequent first
+        mask = vocabulary.encode({"CSXT", "BNSF", "UNKNOWN"})
+        self.assertEqual(mask, 0b110)
+        self.assertEqual(vocabulary.decode(mask), {"CSXT", "BNSF"})
+        self.assertEqual(vocabulary.from_bytes(vocabulary.to_bytes(mask)), mask)
+        self.assertEqual(vocabulary.label(mask), "BNSF,CSXT")
+
+    def test_masks_are_not_limited_to_64_owners(self):
+        vocabulary = OwnerVocabulary(tuple(f"RR{i}" for i in range(200)))
+        mask = vocabulary.encode(["RR0", "RR199"])
+        self.assertEqual(vocabulary.n_bytes, 25)
+        self.assertEqual(list(single_owner_masks(mask)), [1, 1 << 199])
+        self.assertEqual(
+            vocabulary.decode(vocabulary.from_bytes(vocabulary.to_bytes(mask))), {"RR0", "RR199"}
+        )
@@ -4,6 +4,7 @@ from ireiat.config.data_pipeline import RailImpedanceConfig
 from ireiat.data_pipeline.assets.rail_network.impedance import (
     generate_impedance_values,
 )
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary
 
 
 class TestImpedanceOverrides(unittest.TestCase):
@@ -17,24 +18,34 @@ class TestImpedanceOverrides(unittest.TestCase):
             }
         )
 
-        self.c1_to_c1_impedance = ("CSX", (1, 1), "BNSF", (2, 2))
-        self.short_to_c1_impedance = ("some_shortline", (1, 1), "BNSF", (2, 2))
-        self.c1_to_short_impedance = ("CSX", (1, 1), "some_shortline", (2, 2))
-        self.short_to_short_impedance = ("other_shortline", (1, 1), "some_shortline", (2, 2))
+        self.vocabulary = OwnerVocabulary(("CSX", "BNSF", "some_shortline", "other_shortline"))
+        csx, bnsf, some_shortline, other_shortline = [
+            self.vocabulary.encode([owner]) for owner in self.vocabulary.owners
+        ]
+        self.c1_to_c1_impedance = (csx, (1, 1), bnsf, (2, 2))
+        self.short_to_c1_impedance = (some_shortline, (1, 1), bnsf, (2, 2))
+        self.c1_to_short_impedance = (csx, (1, 1), some_shortline, (2, 2))
+        self.short_to_short_impedance = (other_shortline, (1, 1), some_shortline, (2, 2))
 
     def test_impedance_overrides_computes_correctly(self):
         # c1 -> c1
-        result = generate_impedance_values({self.c1_to_c1_impedance}, self.config)
+        result = generate_impedance_values({self.c1_to_c1_impedance}, self.vocabulary, self.config)
         self.assertEqual(result[0], self.config.class_1_to_class_1_impedance)
 
         # c1 -> shortline
-        result = generate_impedance_values({self.c1_to_short_impedance}, self.config)
+        result = generate_impedance_values(
+            {self.c1_to_short_impedance}, self.vocabulary, self.config
+        )
         self.assertEqual(result[0], self.config.default_impedance)
 
         # shortline -> c1
-        result = generate_impedance_values({self.short_to_c1_impedance}, self.config)
+        result = generate_impedance_values(
+            {self.short_to_c1_impedance}, self.vocabulary, self.config
+        )
         self.assertEqual(result[0], self.config.default_impedance)
 
         # shortline -> shortline
-        result = generate_impedance_values({self.short_to_short_impedance}, self.config)
+        result = generate_impedance_values(
+            {self.short_to_short_impedance}, self.vocabulary, self.config
+        )
         self.assertEqual(result[0], self.config.default_impedance)
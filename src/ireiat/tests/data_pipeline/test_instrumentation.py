@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Tuple
+from unittest.mock import patch
+
+import dagster
+import pandas as pd
+
+from ireiat.data_pipeline.instrumentation import (
+    INSTRUMENT_ENV_VAR,
+    PROFILE_ASSETS_ENV_VAR,
+    instrumented,
+    report_path,
+)
+
+
+@dagster.asset
+@instrumented
+def upstream_frame() -> pd.DataFrame:
+    return pd.DataFrame({"a": range(10)})
+
+
+@dagster.asset
+@instrumented
+def downstream_frame(context: dagster.AssetExecutionContext, upstream_frame: pd.DataFrame):
+    return upstream_frame.head(4)
+
+
+@dagster.multi_asset(outs={"first": dagster.AssetOut(), "second": dagster.AssetOut()})
+@instrumented
+def two_outputs(upstream_frame: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    return upstream_frame.head(2), {"x": 1, "y": 2, "z": 3}
+
+
+@dagster.asset
+@instrumented
+def failing_frame(upstream_frame: pd.DataFrame) -> pd.DataFrame:
+    raise ValueError("bad frame")
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_patch = patch(
+            "ireiat.data_pipeline.instrumentation.CACHE_PATH", Path(self.temp_dir.name)
+        )
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        self.temp_dir.cleanup()
+
+    def _materialize(self) -> dagster.ExecuteInProcessResult:
+        return dagster.materialize(
+            [upstream_frame, downstream_frame, two_outputs],
+            resources={"io_manager": dagster.mem_io_manager},
+        )
+
+    def _metadata(self, result, asset_name: str) -> dict:
+        return result.asset_materializations_for_node(asset_name)[0].metadata
+
+    def test_no_metadata_or_report_unless_enabled(self):
+        with patch.dict(os.environ, {INSTRUMENT_ENV_VAR: ""}):
+            result = self._materialize()
+        self.assertNotIn("wall_time_seconds", self._metadata(result, "downstream_frame"))
+        self.assertFalse(report_path(result.run_id).exists())
+
+    def test_enabled_instrumentation_publishes_metadata_and_report(self):
+        with patch.dict(os.environ, {INSTRUMENT_ENV_VAR: "1"}):
+            result = self._materialize()
+        metadata = self._metadata(result, "downstream_frame")
+        self.assertEqual(metadata["output_rows"].value, 4)
+        self.assertEqual(metadata["input_rows"].value, {"upstream_frame": 10})
+        self.assertIn("wall_time_seconds", metadata)
+        self.assertIn("serialized_output_mb", metadata)
+
+        materializations = result.asset_materializations_for_node("two_outputs")
+        rows_by_output = {
+            m.asset_key.to_user_string(): m.metadata["output_rows"].value for m in materializations
+        }
+        self.assertEqual(rows_by_output, {"first": 2, "second": 3})
+
+        with open(report_path(result.run_id)) as fp:
+            records = [json.loads(line) for line in fp]
+        self.assertEqual(
+            {r["asset"] for r in records}, {"upstream_frame", "downstream_frame", "two_outputs"}
+        )
+
+    def test_requested_assets_are_profiled(self):
+        env = {INSTRUMENT_ENV_VAR: "true", PROFILE_ASSETS_ENV_VAR: "downstream_frame"}
+        with patch.dict(os.environ, env):
+            result = self._materialize()
+        profile_path = Path(self._metadata(result, "downstream_frame")["profile_path"].value)
+        self.assertTrue(profile_path.exists())
+        self.assertNotIn("profile_path", self._metadata(result, "upstream_frame"))
+
+    def test_failing_assets_are_profiled(self):
+        env = {INSTRUMENT_ENV_VAR: "true", PROFILE_ASSETS_ENV_VAR: "failing_frame"}
+        with patch.dict(os.environ, env):
+            result = dagster.materialize(
+                [upstream_frame, failing_frame],
+                resources={"io_manager": dagster.mem_io_manager},
+                raise_on_error=False,
+            )
+        self.assertFalse(result.success)
+        profiles = list(Path(self.temp_dir.name).rglob("failing_frame.prof"))
+        self.assertEqual(len(profiles), 1)
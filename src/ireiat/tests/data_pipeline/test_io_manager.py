@@ -1,16 +1,22 @@
 import tempfile
 import unittest
+import zipfile
 from pathlib import Path
-from unittest.mock import create_autospec
+from unittest.mock import create_autospec, patch
 
 import dagster
+import geopandas
 import pandas as pd
+from shapely.geometry import Point
 
 from ireiat.config.constants import CACHE_PATH
 from ireiat.data_pipeline.io_manager import (
     _get_read_function,
     _get_fs_path,
+    _geoparquet_sidecar_path,
+    _read_zip_with_geoparquet_cache,
     read_or_attempt_download,
+    prefetch_asset_specs,
 )
 from ireiat.util.http import download_uncached_file
 
@@ -61,3 +67,76 @@ class TestIOManager(unittest.TestCase):
             mock_download_func.assert_called_once_with("badurl", fpath)
         except IOError:
             pass
+
+    def test_prefetch_downloads_every_spec_with_a_url(self):
+        specs = [
+            dagster.AssetSpec(
+                key=dagster.AssetKey(f"dummy_{idx}_spec"),
+                metadata={
+                    "format": "csv",
+                    "dashboard_url": dagster.MetadataValue.url(f"http://localhost/{idx}.csv"),
+                },
+            )
+            for idx in range(3)
+        ]
+        specs.append(dagster.AssetSpec(key=dagster.AssetKey("no_url_spec"), metadata={}))
+        with patch(
+            "ireiat.data_pipeline.io_manager.download_uncached_file", return_value=True
+        ) as mock_download:
+            fpaths = prefetch_asset_specs(specs, max_workers=2)
+        self.assertEqual(len(fpaths), 3)
+        self.assertEqual(mock_download.call_count, 3)
+        called_urls = {c.args[0] for c in mock_download.call_args_list}
+        self.assertEqual(called_urls, {f"http://localhost/{idx}.csv" for idx in range(3)})
+
+    def test_zipped_shapefile_is_converted_once_to_geoparquet(self):
+        gdf = geopandas.GeoDataFrame(
+            {"name": ["a", "b", "c"], "value": [1, 2, 3]},
+            geometry=[Point(0, 0), Point(5, 5), Point(10, 10)],
+            crs="EPSG:4326",
+        )
+        with tempfile.TemporaryDirectory() as td:
+            shp_dir = Path(td) / "shp"
+            shp_dir.mkdir()
+            gdf.to_file(shp_dir / "points.shp")
+            zip_path = Path(td) / "points.zip"
+            with zipfile.ZipFile(zip_path, "w") as zf:
+                for f in shp_dir.iterdir():
+                    zf.write(f, f.name)
+
+            metadata = {"source_path": td, "filename": "points.zip"}
+            first_result = read_or_attempt_download(dagster.AssetKey("points"), metadata)
+            sidecar_path = _geoparquet_sidecar_path(str(zip_path))
+            self.assertTrue(sidecar_path.exists())
+            self.assertEqual(len(first_result), 3)
+
+            # later reads come from the sidecar, with columns and bbox pushed down
+            metadata["read_kwargs"] = dagster.MetadataValue.json(
+                {"columns": ["name"], "bbox": [-1, -1, 6, 6]}
+            )
+            with patch("ireiat.data_pipeline.io_manager.pyogrio.read_dataframe") as mock_read:
+                result = read_or_attempt_download(dagster.AssetKey("points"), metadata)
+                mock_read.assert_not_called()
+            self.assertIsInstance(result, geopandas.GeoDataFrame)
+            self.assertEqual(list(result.columns), ["name", "geometry"])
+            self.assertEqual(sorted(result["name"]), ["a", "b"])
+
+    def test_shapefile_read_options_get_their_own_sidecar(self):
+        gdf = geopandas.GeoDataFrame(
+            {"value": [1, 2, 3]},
+            geometry=[Point(0, 0), Point(5, 5), Point(10, 10)],
+            crs="EPSG:4326",
+        )
+        with tempfile.TemporaryDirectory() as td:
+            gdf.to_file(Path(td) / "points.shp")
+            zip_path = Path(td) / "points.zip"
+            with zipfile.ZipFile(zip_path, "w") as zf:
+                for f in Path(td).glob("points.*"):
+                    if f != zip_path:
+                        zf.write(f, f.name)
+
+            filtered = _read_zip_with_geoparquet_cache(str(zip_path), where="value > 1")
+            unfiltered = _read_zip_with_geoparquet_cache(str(zip_path))
+            self.assertEqual(sorted(filtered["value"]), [2, 3])
+            self.assertEqual(sorted(unfiltered["value"]), [1, 2, 3])
+            self.assertEqual(len(list(Path(td).glob("points.*.parquet"))), 2)
@@ -0,0 +1,35 @@
+import unittest
+
+import dagster
+import geopandas
+from shapely.geometry import LineString
+
+from ireiat.config.data_pipeline import NetworkSnapConfig
+from ireiat.data_pipeline.assets.marine_network.marine_graph import (
+    strongly_connected_marine_graph,
+    undirected_marine_edges,
+)
+
+
+class TestMarineGraph(unittest.TestCase):
+
+    def test_links_after_a_collapsed_link_keep_their_source_id(self):
+        # link 1 is about a meter long and collapses onto a single node when snapped
+        links = geopandas.GeoDataFrame(
+            {"ID": [10, 11, 12]},
+            geometry=[
+                LineString([(-90.0, 30.0), (-90.1, 30.0)]),
+                LineString([(-90.1, 30.0), (-90.10001, 30.0)]),
+                LineString([(-90.10001, 30.0), (-90.2, 30.0)]),
+            ],
+            crs="EPSG:4326",
+        )
+        context = dagster.build_asset_context()
+        edges = undirected_marine_edges(
+            context, links, NetworkSnapConfig(snap_tolerance_meters=5.0)
+        )
+        self.assertEqual(list(edges.index), [0, 2])
+        self.assertEqual(list(edges["ID"]), [10, 12])
+
+        graph = strongly_connected_marine_graph(context, edges)
+        self.assertEqual(set(graph.es["original_id"]), {0, 2})
@@ -0,0 +1,35 @@
+import unittest
+
+import dagster
+import numpy as np
+import pandas as pd
+
+from ireiat.data_pipeline.assets.tap.tons import _generate_tons_dataframe
+
+
+class TestTAPTons(unittest.TestCase):
+
+    def test_counties_sharing_a_node_are_compacted(self):
+        county_tons = pd.DataFrame(
+            {
+                "state_orig": ["01", "01", "06", "08"],
+                "county_orig": ["001", "003", "001", "001"],
+                "state_dest": ["06", "06", "01", "01"],
+                "county_dest": ["001", "001", "001", "001"],
+                "tons": [1.0, 2.0, 4.0, 8.0],
+            }
+        )
+        county_to_node = {("01", "001"): 0, ("01", "003"): 0, ("06", "001"): 1}
+        tons, county_pairs = _generate_tons_dataframe(
+            dagster.build_asset_context(), county_tons, county_to_node
+        )
+        self.assertEqual(tons["from"].dtype, np.int32)
+        self.assertEqual(tons[["from", "to"]].values.tolist(), [[0, 1], [1, 0]])
+        self.assertEqual(
+            tons["tons"].tolist(), [3.0, 4.0]
+        )  # the county of state 08 is not attached
+        self.assertEqual(county_pairs["od_index"].tolist(), [0, 0, 1])
+        self.assertEqual(county_pairs["county_orig"].tolist(), ["001", "003", "001"])
+        np.testing.assert_allclose(
+            county_pairs.groupby("od_index")["tons"].sum().to_numpy(), tons["tons"]
+        )
@@ -0,0 +1,80 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import igraph as ig
+import pandas as pd
+
+from ireiat.postprocessing.postprocessor import PostProcessor
+
+
+class TestPostProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        # a graph whose edges map back to (shp) links 10, 11 and 12; one edge without a link
+        g = ig.Graph(directed=True)
+        g.add_vertices(4)
+        g.add_edges([(0, 1), (1, 0), (1, 2), (2, 3)])
+        g.es["original_id"] = [10, 10, 11, None]
+        self.graph_path = self.path / "graph"
+        with open(self.graph_path, "wb") as fp:
+            pickle.dump(g, fp)
+
+        self.network_path = self.path / "network.parquet"
+        pd.DataFrame(
+            {"tail": [0, 1, 1, 2], "head": [1, 0, 2, 3], "original_id": [10, 10, 11, None]}
+        ).to_parquet(self.network_path)
+
+        # the solution is in a different order than the network edges
+        self.traffic_path = self.path / "traffic.parquet"
+        pd.DataFrame(
+            {
+                "from": [2.0, 1.0, 0.0, 1.0],
+                "to": [3.0, 2.0, 1.0, 0.0],
+                "flow": [1.0, 2.0, 3.0, 4.0],
+                "capacity": [10.0] * 4,
+            }
+        ).to_parquet(self.traffic_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _assert_expected_link_ids(self, traffic: pd.DataFrame):
+        self.assertEqual(len(traffic), 4)
+        link_ids = traffic.set_index(["from", "to"])["shp_link_id"]
+        self.assertIs(link_ids[(2, 3)], pd.NA)
+        self.assertEqual(link_ids[(1, 2)], 11)
+        self.assertEqual(link_ids[(0, 1)], 10)
+        self.assertEqual(link_ids[(1, 0)], 10)
+
+    def test_solution_is_joined_to_network_edge_table(self):
+        pp = PostProcessor(self.traffic_path, self.path / "missing_graph", None, self.network_path)
+        self._assert_expected_link_ids(pp._read_traffic())
+
+    def test_solution_is_joined_to_graph_edges_without_network_file(self):
+        pp = PostProcessor(self.traffic_path, self.graph_path, None)
+        self._assert_expected_link_ids(pp._read_traffic())
+
+    def test_contracted_links_expand_to_their_original_links(self):
+        contracted_path = self.path / "network_contracted.parquet"
+        pd.DataFrame(
+            {
+                "tail": [0, 1, 2],
+                "head": [2, 0, 3],
+                "original_id": [10, 10, None],
+                "original_ids": [[10, 11], [10], [None]],
+            }
+        ).to_parquet(contracted_path)
+        traffic_path = self.path / "contracted_traffic.parquet"
+        pd.DataFrame(
+            {"from": [0, 1, 2], "to": [2, 0, 3], "flow": [5.0, 4.0, 1.0], "capacity": [10.0] * 3}
+        ).to_parquet(traffic_path)
+
+        traffic = PostProcessor(traffic_path, None, None, contracted_path)._read_traffic()
+        flows = traffic.dropna(subset="shp_link_id").groupby("shp_link_id")["flow"].sum()
+        self.assertEqual(flows.to_dict(), {10: 9.0, 11: 5.0})
+        self.assertEqual(len(traffic), 4)
@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString
+
+from ireiat.postprocessing.tiles import (
+    downsample_pixels,
+    lonlat_to_pixels,
+    rasterize_lines,
+    write_congestion_tiles,
+)
+
+
+class TestTiles(unittest.TestCase):
+
+    def test_lonlat_to_pixels_matches_web_mercator_tile_origin(self):
+        x, y = lonlat_to_pixels(np.array([-180.0, 0.0]), np.array([0.0, 0.0]), zoom=1)
+        np.testing.assert_allclose(x, [0, 256])
+        np.testing.assert_allclose(y, [256, 256])
+
+    def test_rasterized_line_is_contiguous_and_keeps_max_value(self):
+        gdf = gpd.GeoDataFrame(
+            {"utilization": [0.2, 0.9]},
+            geometry=[LineString([(-90, 40), (-89, 40)]), LineString([(-89.5, 40), (-89.4, 40)])],
+            crs="EPSG:4326",
+        )
+        pixels = rasterize_lines(gdf, "utilization", zoom=8)
+        self.assertEqual(pixels["y"].nunique(), 1)
+        xs = np.sort(pixels["x"].to_numpy())
+        self.assertTrue(np.all(np.diff(xs) == 1))  # no gaps along the line
+        self.assertFalse(pixels.duplicated(["x", "y"]).any())
+        self.assertEqual(pixels["value"].max(), 0.9)
+        self.assertEqual(pixels["value"].min(), 0.2)
+
+    def test_downsample_aggregates_max(self):
+        pixels = pd.DataFrame({"x": [0, 1, 2], "y": [0, 1, 0], "value": [0.1, 0.5, 0.3]})
+        coarse = downsample_pixels(pixels)
+        self.assertEqual(
+            coarse.set_index(["x", "y"])["value"].to_dict(), {(0, 0): 0.5, (1, 0): 0.3}
+        )
+
+    def test_write_congestion_tiles_writes_pyramid(self):
+        gdf = gpd.GeoDataFrame(
+            {"utilization": [0.0, 1.5]},
+            geometry=[LineString([(-100, 35), (-80, 40)]), LineString([(-80, 40), (-75, 42)])],
+            crs="EPSG:4326",
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = Path(temp_dir)
+            n_tiles = write_congestion_tiles(gdf, output_dir, max_zoom=5, min_zoom=2)
+            written = list(output_dir.glob("*/*/*.png"))
+            self.assertEqual(len(written), n_tiles)
+            self.assertEqual({int(p.parts[-3]) for p in written}, {2, 3, 4, 5})
+            metadata = json.loads((output_dir / "tiles.json").read_text())
+            self.assertEqual((metadata["minzoom"], metadata["maxzoom"]), (2, 5))
+
+    def test_tiles_json_is_written_without_any_tile(self):
+        gdf = gpd.GeoDataFrame({"utilization": []}, geometry=[], crs="EPSG:4326")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = Path(temp_dir) / "tiles"
+            self.assertEqual(write_congestion_tiles(gdf, output_dir, max_zoom=5, min_zoom=2), 0)
+            self.assertTrue((output_dir / "tiles.json").exists())
@@ -0,0 +1,198 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import all_or_nothing, frank_wolfe, warm_start
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.io import (
+    class_flows_path,
+    horizon_output_path,
+    solve_files,
+    solve_horizon_files,
+)
+from ireiat.solver.network import TAPNetwork
+
+
+def _network(edges, fft, capacity=100.0) -> TAPNetwork:
+    edges = np.array(edges)
+    n_edges = len(edges)
+    return TAPNetwork.from_dataframe(
+        pd.DataFrame(
+            {
+                "tail": edges[:, 0],
+                "head": edges[:, 1],
+                "fft": fft,
+                "capacity": np.full(n_edges, capacity),
+                "alpha": np.full(n_edges, 0.15),
+                "beta": np.full(n_edges, 4.0),
+            }
+        )
+    )
+
+
+class TestAssignment(unittest.TestCase):
+
+    def setUp(self):
+        # two symmetric routes 0 -> 1 -> 3 and 0 -> 2 -> 3, plus 3 -> 0
+        self.network = _network([(0, 1), (1, 3), (0, 2), (2, 3), (3, 0)], [1.0, 1.0, 1.0, 1.0, 5.0])
+
+    def test_all_or_nothing_follows_shortest_path(self):
+        network = _network([(0, 1), (1, 2), (0, 2)], [1.0, 1.0, 3.0])
+        od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 0], "to": [2, 1], "tons": [5.0, 2.0]})
+        )
+        aon = all_or_nothing(network, od, network.fft)
+        np.testing.assert_allclose(aon.flow, [7.0, 5.0, 0.0])
+        self.assertAlmostEqual(aon.shortest_path_travel_time, 5.0 * 2 + 2.0 * 1)
+
+    def test_symmetric_routes_split_demand_evenly(self):
+        od = ODDemand.from_dataframe(pd.DataFrame({"from": [0], "to": [3], "tons": [200.0]}))
+        result = frank_wolfe(self.network, od, max_gap=1e-6, max_iterations=200)
+        np.testing.assert_allclose(result.flow, [100.0, 100.0, 100.0, 100.0, 0.0], rtol=1e-2)
+        self.assertLessEqual(result.relative_gap, 1e-6)
+
+    def test_parallel_edges_equalize_costs(self):
+        network = _network([(0, 1), (0, 1)], [1.0, 1.2])
+        od = ODDemand.from_dataframe(pd.DataFrame({"from": [0], "to": [1], "tons": [300.0]}))
+        result = frank_wolfe(network, od, max_gap=1e-8, max_iterations=500)
+        self.assertAlmostEqual(result.flow.sum(), 300.0)
+        self.assertAlmostEqual(result.cost[0], result.cost[1], places=3)
+
+    def test_class_flows_sum_to_total_flow(self):
+        od_df = pd.DataFrame(
+            {
+                "from": [0, 0, 1],
+                "to": [3, 3, 0],
+                "sctg2": ["01", "43", "43"],
+                "tons": [150.0, 50.0, 20.0],
+            }
+        )
+        od = ODDemand.from_dataframe(od_df)
+        self.assertEqual(list(od.classes), ["01", "43"])
+        result = frank_wolfe(self.network, od, max_gap=1e-6, max_iterations=100)
+        np.testing.assert_allclose(result.class_flows.sum(axis=1), result.flow)
+        # all tons of each class leave their origins
+        leaving_origin_0 = result.class_flows[self.network.tail == 0].sum(axis=0)
+        np.testing.assert_allclose(leaving_origin_0, [150.0, 50.0], rtol=1e-6)
+        # only the second class travels 1 -> 3 -> 0
+        np.testing.assert_allclose(result.class_flows[4], [0.0, 20.0])
+
+    def test_unreachable_pairs_are_dropped(self):
+        network = _network([(0, 1), (2, 1)], [1.0, 1.0])
+        od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 0], "to": [1, 2], "tons": [10.0, 20.0]})
+        )
+        with self.assertLogs("ireiat.solver.assignment", level="WARNING"):
+            result = frank_wolfe(network, od, max_iterations=10)
+        np.testing.assert_allclose(result.flow, [10.0, 0.0])
+
+    def test_solve_files_writes_solution_and_class_flows(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir)
+            network_df = pd.DataFrame(
+                {
+                    "tail": self.network.tail,
+                    "head": self.network.head,
+                    "fft": self.network.fft,
+                    "capacity": self.network.capacity,
+                    "alpha": self.network.alpha,
+                    "beta": self.network.beta,
+                }
+            )
+            network_df.to_parquet(path / "network.parquet")
+            pd.DataFrame(
+                {"from": [0, 0], "to": [3, 3], "sctg2": ["01", "43"], "tons": [10.0, 30.0]}
+            ).to_parquet(path / "od.parquet")
+            output = path / "traffic.parquet"
+            solve_files(path / "network.parquet", path / "od.parquet", output, 1e-6, 50)
+
+            traffic = pd.read_parquet(output)
+            self.assertEqual(
+                list(traffic.columns),
+                ["from", "to", "ftt", "cost", "flow", "capacity", "alpha", "beta"],
+            )
+            class_flows = np.load(class_flows_path(output))
+            self.assertEqual(list(class_flows["classes"]), ["01", "43"])
+            np.testing.assert_allclose(class_flows["flows"].sum(axis=1), traffic["flow"], rtol=1e-5)
+
+    def test_warm_start_is_feasible_for_the_new_demand(self):
+        od_df = pd.DataFrame(
+            {"from": [0, 3], "to": [3, 1], "tons": [200.0, 50.0], "tons_2030": [260.0, 50.0]}
+        )
+        od = ODDemand.from_dataframe(od_df)
+        od_2030 = ODDemand.from_dataframe(od_df, tons_column="tons_2030")
+        previous = frank_wolfe(self.network, od, max_gap=1e-6, keep_origin_flows=True)
+        initial = warm_start(self.network, od_2030, od, previous)
+        # 260 tons leave node 0 towards 3, and 50 leave node 3 towards 1 (via 0), each on 2 edges
+        np.testing.assert_allclose(initial.flow[[0, 2]].sum(), 310.0)
+        np.testing.assert_allclose(initial.flow[4], 50.0)
+        np.testing.assert_allclose(
+            initial.origin_flows.sum(axis=1).A.ravel(), [260.0 * 2, 50.0 * 2]
+        )
+
+    def test_horizon_columns_are_solved_in_turn(self):
+        od_df = pd.DataFrame(
+            {"from": [0, 3], "to": [3, 1], "tons": [200.0, 50.0], "tons_2030": [260.0, 60.0]}
+        )
+        network_df = pd.DataFrame(
+            {
+                "tail": self.network.tail,
+                "head": self.network.head,
+                "fft": self.network.fft,
+                "capacity": self.network.capacity,
+                "alpha": self.network.alpha,
+                "beta": self.network.beta,
+            }
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = Path(tmp_dir)
+            network_df.to_parquet(tmp_path / "network.parquet")
+            od_df.to_parquet(tmp_path / "od.parquet")
+            results = solve_horizon_files(
+                tmp_path / "network.parquet",
+                tmp_path / "od.parquet",
+                tmp_path / "traffic.parquet",
+                ["tons", "tons_2030"],
+                max_gap=1e-6,
+                max_iterations=200,
+            )
+            self.assertTrue(horizon_output_path(tmp_path / "traffic.parquet", "tons_2030").exists())
+        cold = frank_wolfe(
+            self.network,
+            ODDemand.from_dataframe(od_df, tons_column="tons_2030"),
+            max_gap=1e-6,
+            max_iterations=200,
+        )
+        np.testing.assert_allclose(results["tons_2030"].flow, cold.flow, rtol=1e-2)
+        self.assertLessEqual(results["tons_2030"].relative_gap, 1e-6)
+
+
+class TestODDemand(unittest.TestCase):
+
+    def test_single_class_aggregates_duplicate_pairs(self):
+        od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 0, 1], "to": [1, 1, 0], "tons": [1.0, 2.0, 4.0]})
+        )
+        self.assertEqual(od.n_classes, 1)
+        np.testing.assert_allclose(od.total, [3.0, 4.0])
+
+    def test_classes_are_pivoted_wide(self):
+        od = ODDemand.from_dataframe(
+            pd.DataFrame(
+                {"from": [0, 0, 1], "to": [1, 1, 0], "sctg2": ["a", "b", "b"], "tons": [1, 2, 4]}
+            )
+        )
+        np.testing.assert_allclose(od.demand, [[1.0, 2.0], [0.0, 4.0]])
+
+    def test_pairs_are_sorted_by_origin_with_offsets(self):
+        od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [2, 0, 2, 0], "to": [1, 3, 0, 1], "tons": [1.0, 2.0, 3.0, 4.0]})
+        )
+        np.testing.assert_array_equal(od.origin, [0, 0, 2, 2])
+        np.testing.assert_array_equal(od.destination, [1, 3, 0, 1])
+        np.testing.assert_array_equal(od.origins, [0, 2])
+        np.testing.assert_array_equal(od.origin_offsets, [0, 2, 4])
+        np.testing.assert_allclose(od.total, [4.0, 2.0, 3.0, 1.0])
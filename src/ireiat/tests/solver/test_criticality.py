@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import frank_wolfe
+from ireiat.solver.criticality import detour_costs, rank_links, screen_links
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.disruption import Baseline
+from ireiat.solver.network import TAPNetwork
+
+
+class TestCriticality(unittest.TestCase):
+
+    def setUp(self):
+        # 0 -> 1 -> 3 with a detour 1 -> 2 -> 3, a parallel route 0 -> 2 and a bridge 3 -> 4
+        self.network_df = pd.DataFrame(
+            {
+                "tail": [0, 1, 0, 2, 1, 3],
+                "head": [1, 3, 2, 3, 2, 4],
+                "fft": [1.0, 1.0, 3.0, 1.0, 0.5, 1.0],
+                "capacity": [100.0] * 6,
+                "alpha": [0.15] * 6,
+                "beta": [4.0] * 6,
+                "original_id": [10, 11, 12, 13, 14, 15],
+            }
+        )
+        network = TAPNetwork.from_dataframe(self.network_df)
+        od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 0], "to": [3, 4], "tons": [50.0, 20.0]})
+        )
+        result = frank_wolfe(network, od, max_gap=1e-6, max_iterations=100, keep_origin_flows=True)
+        self.baseline = Baseline.from_result(network, od, result)
+        self.costs = network.costs(result.flow)
+
+    def test_detour_costs(self):
+        detour = detour_costs(self.baseline, np.array([1, 5]))
+        self.assertAlmostEqual(detour[0], self.costs[4] + self.costs[3])
+        self.assertTrue(np.isinf(detour[1]))  # the bridge has no detour
+
+    def test_links_without_detour_screen_first(self):
+        links = screen_links(self.baseline, self.network_df)
+        without_detour = links.loc[np.isinf(links["screening_score"]), "original_id"]
+        self.assertEqual(list(without_detour), [10, 15])  # then by flow
+        self.assertEqual(links.loc[2, "original_id"], 11)
+
+    def test_links_are_screened_by_any_link_id(self):
+        network_df = self.network_df.rename(columns={"original_id": "fraarcid"})
+        links = screen_links(self.baseline, network_df)
+        self.assertEqual(list(links["fraarcid"][:3]), [10, 15, 11])
+        with self.assertRaises(ValueError):
+            screen_links(self.baseline, network_df.drop(columns="fraarcid"))
+
+    def test_rank_links_evaluates_top_k(self):
+        ranked = rank_links(self.baseline, self.network_df, top_k=2, max_workers=1)
+        self.assertEqual(list(ranked["rank"]), list(range(1, len(ranked) + 1)))
+        self.assertEqual(ranked["evaluated"].sum(), 2)
+        self.assertEqual(ranked.loc[0, "original_id"], 15)
+        self.assertAlmostEqual(ranked.loc[0, "unassigned_tons"], 20.0)
+        self.assertGreater(ranked.loc[1, "travel_time_increase"], 0)
+
+    def test_rank_links_in_worker_processes(self):
+        serial = rank_links(self.baseline, self.network_df, top_k=3, max_workers=1)
+        parallel = rank_links(self.baseline, self.network_df, top_k=3, max_workers=2)
+        pd.testing.assert_frame_equal(serial, parallel)
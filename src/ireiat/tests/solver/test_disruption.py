@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import frank_wolfe
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.disruption import (
+    Baseline,
+    EdgeChange,
+    apply_edge_changes,
+    edge_changes_from_dataframe,
+    resolve_disruption,
+)
+from ireiat.solver.network import TAPNetwork
+
+
+class TestDisruption(unittest.TestCase):
+
+    def setUp(self):
+        # origin 0 has two routes to 3 (via 1 or 2); origin 4 only uses 4 -> 5
+        self.network_df = pd.DataFrame(
+            {
+                "tail": [0, 1, 0, 2, 4],
+                "head": [1, 3, 2, 3, 5],
+                "fft": [1.0, 1.0, 1.0, 1.0, 1.0],
+                "capacity": [100.0] * 5,
+                "alpha": [0.15] * 5,
+                "beta": [4.0] * 5,
+                "original_id": [10, 11, 12, 13, 14],
+            }
+        )
+        self.network = TAPNetwork.from_dataframe(self.network_df)
+        self.od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 4], "to": [3, 5], "tons": [200.0, 50.0]})
+        )
+        result = frank_wolfe(
+            self.network, self.od, max_gap=1e-6, max_iterations=200, keep_origin_flows=True
+        )
+        self.baseline = Baseline.from_result(self.network, self.od, result)
+
+    def test_origin_flows_sum_to_flow(self):
+        np.testing.assert_allclose(
+            np.asarray(self.baseline.origin_flows.sum(axis=0)).ravel(), self.baseline.flow
+        )
+        self.assertEqual(list(self.baseline.origins), [0, 4])
+
+    def test_only_origins_using_changed_edges_are_affected(self):
+        affected = self.baseline.affected_origins([EdgeChange([0], "remove")])
+        self.assertEqual(list(affected), [True, False])
+        affected = self.baseline.affected_origins([EdgeChange([4], "scale_capacity", 2.0)])
+        self.assertTrue(affected.all())  # more capacity could attract any origin
+
+    def test_removed_edge_traffic_is_rerouted(self):
+        changes = [EdgeChange([0], "remove")]
+        result = resolve_disruption(self.baseline, changes, max_gap=1e-8)
+        np.testing.assert_allclose(result.flow, [0.0, 0.0, 200.0, 200.0, 50.0], atol=1e-6)
+        self.assertTrue(np.isinf(result.cost[0]))
+
+    def test_incremental_resolve_matches_full_resolve(self):
+        changes = [EdgeChange([1], "scale_capacity", 0.5)]
+        result = resolve_disruption(self.baseline, changes, max_gap=1e-8, max_iterations=500)
+        full = frank_wolfe(
+            apply_edge_changes(self.network, changes), self.od, max_gap=1e-8, max_iterations=500
+        )
+        np.testing.assert_allclose(result.flow, full.flow, rtol=1e-3)
+
+    def test_edge_changes_from_dataframe(self):
+        changes = edge_changes_from_dataframe(
+            pd.DataFrame(
+                {"original_id": [12, 14], "action": ["remove", "set_fft"], "value": [0, 3]}
+            ),
+            self.network_df,
+        )
+        self.assertEqual(
+            [(list(c.edges), c.action) for c in changes], [([2], "remove"), ([4], "set_fft")]
+        )
+        with self.assertRaises(ValueError):
+            edge_changes_from_dataframe(
+                pd.DataFrame({"original_id": [99], "action": ["remove"]}), self.network_df
+            )
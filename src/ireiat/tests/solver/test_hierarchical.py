@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import frank_wolfe
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.hierarchical import hierarchical_start, node_zones, zone_representatives
+from ireiat.solver.network import TAPNetwork
+
+
+class TestHierarchical(unittest.TestCase):
+
+    def setUp(self):
+        # nodes 0 and 1 (zone 0) reach 3 and 4 (zone 1) through 2, then either 5 or 6
+        edges = np.array([(0, 2), (1, 2), (2, 5), (5, 3), (2, 6), (6, 3), (3, 4)])
+        self.network = TAPNetwork.from_dataframe(
+            pd.DataFrame(
+                {
+                    "tail": edges[:, 0],
+                    "head": edges[:, 1],
+                    "fft": [1.0] * 7,
+                    "capacity": [100.0] * 7,
+                    "alpha": [0.15] * 7,
+                    "beta": [4.0] * 7,
+                }
+            )
+        )
+        self.od = ODDemand.from_dataframe(
+            pd.DataFrame({"from": [0, 1], "to": [3, 4], "tons": [150.0, 50.0]})
+        )
+        self.node_zone = np.array([0, 0, -1, 1, 1, -1, -1])
+
+    def test_nodes_take_the_zone_with_most_tons(self):
+        allocation_map = {
+            "11": {("01", "001"): 0.5, ("01", "003"): 0.5},
+            "12": {("02", "001"): 1.0},
+        }
+        county_pairs = pd.DataFrame(
+            {
+                "od_index": [0, 0, 1],
+                "from": [0, 0, 1],
+                "to": [3, 3, 0],
+                "state_orig": ["01", "02", "02"],
+                "county_orig": ["001", "001", "001"],
+                "state_dest": ["02", "02", "01"],
+                "county_dest": ["001", "001", "003"],
+                "tons": [10.0, 30.0, 5.0],
+            }
+        )
+        zones = node_zones(county_pairs, allocation_map, n_nodes=5)
+        # node 0 holds 10 tons of zone 11 (plus 5 inbound) and 30 of zone 12
+        np.testing.assert_array_equal(zones, [1, 1, -1, 1, -1])
+
+    def test_representatives_are_the_heaviest_node_of_each_zone(self):
+        np.testing.assert_array_equal(
+            zone_representatives(self.od, self.node_zone), [0, 0, 2, 3, 3, 5, 6]
+        )
+
+    def test_fine_solve_starts_from_coarse_costs(self):
+        initial, coarse = hierarchical_start(
+            self.network, self.od, self.node_zone, coarse_max_gap=1e-6
+        )
+        # the coarse demand is the 200 tons from 0 to 3, split over the two routes
+        np.testing.assert_allclose(coarse.flow[[2, 4]], [100.0, 100.0], rtol=1e-2)
+        self.assertAlmostEqual(initial.flow[[2, 4]].sum(), 200.0)
+        np.testing.assert_allclose(initial.flow[[0, 1, 6]], [150.0, 50.0, 50.0])
+
+        result = frank_wolfe(self.network, self.od, max_gap=1e-6, initial=initial)
+        cold = frank_wolfe(self.network, self.od, max_gap=1e-6)
+        np.testing.assert_allclose(result.flow, cold.flow, rtol=1e-2)
+        self.assertLessEqual(result.relative_gap, 1e-6)
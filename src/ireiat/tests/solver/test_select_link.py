@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.solver.assignment import frank_wolfe
+from ireiat.solver.demand import ODDemand
+from ireiat.solver.disruption import Baseline
+from ireiat.solver.network import TAPNetwork
+from ireiat.solver.select_link import select_link
+
+
+def _baseline(edges, fft, od_df) -> Baseline:
+    edges = np.array(edges)
+    network = TAPNetwork.from_dataframe(
+        pd.DataFrame(
+            {
+                "tail": edges[:, 0],
+                "head": edges[:, 1],
+                "fft": fft,
+                "capacity": 100.0,
+                "alpha": 0.15,
+                "beta": 4.0,
+            }
+        )
+    )
+    od = ODDemand.from_dataframe(od_df)
+    result = frank_wolfe(network, od, max_gap=1e-8, max_iterations=300, keep_origin_flows=True)
+    return Baseline.from_result(network, od, result)
+
+
+class TestSelectLink(unittest.TestCase):
+
+    def test_select_link_on_a_chain(self):
+        baseline = _baseline(
+            [(0, 1), (1, 2), (2, 1)],
+            [1.0, 1.0, 1.0],
+            pd.DataFrame({"from": [0, 0, 2], "to": [1, 2, 1], "tons": [30.0, 70.0, 5.0]}),
+        )
+        through_second_edge = select_link(baseline, np.array([1]))
+        self.assertEqual(
+            through_second_edge.to_dict("list"), {"from": [0], "to": [2], "tons": [70.0]}
+        )
+        through_first_edge = select_link(baseline, np.array([0]))
+        np.testing.assert_allclose(through_first_edge["tons"], [30.0, 70.0])
+
+    def test_split_routes_carry_their_share(self):
+        # two symmetric routes from 0 to 3, continuing to 4 or ending at 3
+        baseline = _baseline(
+            [(0, 1), (1, 3), (0, 2), (2, 3), (3, 4)],
+            [1.0, 1.0, 1.0, 1.0, 1.0],
+            pd.DataFrame({"from": [0, 0], "to": [3, 4], "tons": [120.0, 80.0]}),
+        )
+        od_tons = select_link(baseline, np.array([0]))
+        np.testing.assert_allclose(od_tons["tons"], [60.0, 40.0], rtol=1e-3)
+        # all flow through a single edge is attributed to some OD pair
+        for edge in range(5):
+            self.assertAlmostEqual(
+                select_link(baseline, np.array([edge]))["tons"].sum(),
+                baseline.flow[edge],
+                places=3,
+            )
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.util.contraction import contract_degree_two_chains
+
+
+def _network(edges, **columns) -> pd.DataFrame:
+    network = pd.DataFrame(edges, columns=["tail", "head"])
+    network["length"] = 2.0
+    network["fft"] = 1.0
+    network["capacity"] = 100.0
+    network["alpha"] = 0.15
+    network["beta"] = 4.0
+    network["original_id"] = np.arange(len(network))
+    for name, values in columns.items():
+        network[name] = values
+    return network
+
+
+class TestContraction(unittest.TestCase):
+
+    def test_one_way_chain(self):
+        network = _network([(0, 1), (1, 2), (2, 3)], capacity=[100.0, 50.0, 100.0])
+        contracted = contract_degree_two_chains(network)
+        self.assertEqual(len(contracted), 1)
+        link = contracted.iloc[0]
+        self.assertEqual((link["tail"], link["head"]), (0, 3))
+        self.assertEqual(link["fft"], 3.0)
+        self.assertEqual(link["length"], 6.0)
+        self.assertEqual(link["capacity"], 50.0)
+        self.assertEqual(list(link["original_ids"]), [0, 1, 2])
+
+    def test_two_way_chain_keeps_both_directions(self):
+        network = _network([(0, 1), (1, 0), (1, 2), (2, 1)])
+        contracted = contract_degree_two_chains(network).set_index(["tail", "head"])
+        self.assertEqual(len(contracted), 2)
+        self.assertEqual(list(contracted.loc[(0, 2), "original_ids"]), [0, 2])
+        self.assertEqual(list(contracted.loc[(2, 0), "original_ids"]), [3, 1])
+
+    def test_protected_nodes_and_junctions_are_kept(self):
+        # 1 is protected; 3 is a junction of three links
+        network = _network([(0, 1), (1, 2), (2, 3), (3, 4), (3, 5)])
+        contracted = contract_degree_two_chains(network, protected_nodes=[1])
+        links = set(zip(contracted["tail"], contracted["head"]))
+        self.assertEqual(links, {(0, 1), (1, 3), (3, 4), (3, 5)})
+
+    def test_different_bpr_parameters_are_not_merged(self):
+        network = _network([(0, 1), (1, 2)], beta=[4.0, 2.0])
+        self.assertEqual(len(contract_degree_two_chains(network)), 2)
+
+    def test_chains_that_would_loop_or_duplicate_links_are_left(self):
+        # two parallel routes 0 -> 1 -> 3 and 0 -> 2 -> 3, and a loop 3 -> 4 -> 3
+        network = _network([(0, 1), (1, 3), (0, 2), (2, 3), (3, 4), (4, 5), (5, 3)])
+        contracted = contract_degree_two_chains(network)
+        self.assertEqual(len(contracted), len(network))
@@ -0,0 +1,57 @@
+import unittest
+
+import igraph
+import numpy as np
+import pandas as pd
+
+from ireiat.util.csr_graph import CSRGraph, dijkstra_batch_size
+
+
+class TestCSRGraph(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # a 0 <-> 1 <-> 2 cycle (with a costly parallel 0->1 edge) plus a dangling 2 -> 3
+        self.edges = pd.DataFrame(
+            [(0, 1, 1.0), (1, 2, 1.0), (2, 0, 1.0), (0, 1, 5.0), (2, 3, 1.0)],
+            columns=["tail", "head", "fft"],
+        )
+        self.graph = CSRGraph.from_dataframe(self.edges, "fft")
+
+    def test_parallel_edges_collapse_to_the_cheapest(self):
+        self.assertEqual(self.graph.n_edges, 5)
+        self.assertEqual(self.graph.n_pairs, 4)
+        pair_weights, cheapest_edge = self.graph.pair_weights()
+        pair = self.graph.pair_index(np.array([0]), np.array([1]))
+        self.assertEqual(pair_weights[pair][0], 1.0)
+        self.assertEqual(cheapest_edge[pair][0], 0)
+
+    def test_strongly_connected_components(self):
+        np.testing.assert_array_equal(self.graph.largest_strongly_connected_component(), [0, 1, 2])
+        self.assertFalse(self.graph.is_strongly_connected())
+
+    def test_subgraph_renumbers_nodes_and_keeps_edges(self):
+        subgraph, kept_edges = self.graph.subgraph(np.array([2, 1, 0]))
+        np.testing.assert_array_equal(kept_edges, [0, 1, 2, 3])
+        self.assertEqual(subgraph.n_nodes, 3)
+        self.assertTrue(subgraph.is_strongly_connected())
+
+    def test_from_undirected_igraph_adds_both_directions(self):
+        g = igraph.Graph(edges=[(0, 1), (1, 2)])
+        graph = CSRGraph.from_igraph(g)
+        self.assertEqual(graph.n_edges, 4)
+        self.assertTrue(graph.is_strongly_connected())
+
+    def test_batched_dijkstra_matches_unbatched(self):
+        sources = np.array([0, 1, 2, 3])
+        batches = list(self.graph.batched_dijkstra(sources, memory_budget=12 * 4 * 2))
+        self.assertEqual(len(batches), 2)
+        distances = np.vstack([batch[2] for batch in batches])
+        self.assertEqual(distances[0, 3], 3.0)
+        self.assertTrue(np.isinf(distances[3, 0]))
+        self.assertEqual(dijkstra_batch_size(4, 12 * 4 * 2), 2)
+
+    def test_path_edges(self):
+        _, _, _, predecessors = next(self.graph.batched_dijkstra(np.array([0, 3])))
+        # paths 0 -> 3 (edges 0, 1, 4) and 0 -> 1 (edge 0); nothing reaches 0 from 3
+        edges = self.graph.path_edges(predecessors, np.array([0, 0, 1]), np.array([3, 1, 0]))
+        np.testing.assert_array_equal(edges, [0, 1, 4])
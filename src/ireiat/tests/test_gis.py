@@ -1,9 +1,20 @@
 import unittest
 
+import geopandas
 import igraph
+import numpy as np
 import pandas as pd
+from shapely.geometry import LineString, MultiLineString
 
-from ireiat.util.graph import generate_zero_based_node_maps, get_allowed_node_indices
+from ireiat.util.graph import (
+    explode_multilinestrings,
+    generate_strongly_connected_graph,
+    generate_zero_based_node_maps,
+    get_coordinates_from_geoframe,
+    get_allowed_node_indices,
+    prune_to_strongly_connected,
+    snap_link_coordinates,
+)
 
 
 class TestGIS(unittest.TestCase):
@@ -38,3 +49,80 @@ class TestGIS(unittest.TestCase):
         g = igraph.Graph(edges=[(1, 2), (2, 3), (5, 6)])
         result = get_allowed_node_indices(g)
         self.assertEqual(len(result), 3)  # nodes 1,2,3 all connected - nodes 5,6 not connected
+
+    def test_prune_to_strongly_connected_reports_exclusions(self):
+        # 1 <-> 2 <-> 3 is strongly connected; 0 -> 1 and 3 -> 4 are not part of it
+        tail, head = np.array([0, 1, 2, 2, 3, 3]), np.array([1, 2, 1, 3, 2, 4])
+        pruned = prune_to_strongly_connected(tail, head, 5)
+        np.testing.assert_array_equal(pruned.node_indices, [1, 2, 3])
+        np.testing.assert_array_equal(pruned.edge_indices, [1, 2, 3, 4])
+        np.testing.assert_array_equal(pruned.tail, [0, 1, 1, 2])
+        self.assertEqual(pruned.metadata()["excluded_nodes"], 2)
+        self.assertEqual(pruned.metadata()["excluded_edges"], 2)
+
+    def test_strongly_connected_graph_keeps_attributes_of_retained_edges(self):
+        coords = [(0.0, 0.0), (1.0, 1.0), (2.0, 2.0)]
+        g, pruned = generate_strongly_connected_graph(
+            coords, [(0, 1), (1, 2), (2, 1)], {"original_id": [10, 11, 12]}
+        )
+        self.assertEqual(g.vs["coords"], coords[1:])
+        self.assertEqual(g.es["original_id"], [11, 12])
+        self.assertEqual(g.get_edgelist(), [(0, 1), (1, 0)])
+
+    def test_snapping_merges_nearby_endpoints(self):
+        # the second link starts ~1m north of where the first ends; the third ends ~1m from where it starts
+        links = pd.DataFrame(
+            [
+                (40.0, -100.0, 40.001, -100.0),
+                (40.00101, -100.0, 40.002, -100.0),
+                (40.1, -100.0, 40.10001, -100.0),
+            ],
+            columns=self.duplicate_origin_df.columns,
+        )
+        snapped, n_snapped = snap_link_coordinates(links, tolerance_meters=5.0)
+        self.assertEqual(n_snapped, 2)
+        self.assertEqual(list(snapped.index), [0, 1])  # the third link collapses onto a single node
+        self.assertEqual(len(generate_zero_based_node_maps(snapped)), 3)
+
+    def test_snapping_within_zero_tolerance_is_a_no_op(self):
+        snapped, n_snapped = snap_link_coordinates(self.duplicate_origin_df, tolerance_meters=0.0)
+        self.assertEqual(n_snapped, 0)
+        pd.testing.assert_frame_equal(snapped, self.duplicate_origin_df)
+
+    def test_coordinates_are_the_endpoints_of_lines_and_multilines(self):
+        geometry = [
+            LineString([(-100.0, 40.0), (-100.5, 40.5), (-101.0, 41.0)]),
+            MultiLineString([[(-90.0, 30.0), (-90.5, 30.0)], [(-90.5, 30.0), (-91.0, 31.0)]]),
+        ]
+        gdf = geopandas.GeoDataFrame(geometry=geometry, index=[3, 7], crs="EPSG:4326")
+        expected = pd.DataFrame(
+            {
+                "origin_longitude": [-100.0, -90.0],
+                "destination_longitude": [-101.0, -91.0],
+                "origin_latitude": [40.0, 30.0],
+                "destination_latitude": [41.0, 31.0],
+            },
+            index=[3, 7],
+        )
+        pd.testing.assert_frame_equal(get_coordinates_from_geoframe(gdf), expected)
+        # only the endpoints are converted back from a projected CRS
+        pd.testing.assert_frame_equal(
+            get_coordinates_from_geoframe(gdf.to_crs("EPSG:5070")), expected, atol=1e-6
+        )
+
+    def test_explode_splits_multilines_in_place_and_only_updates_their_length(self):
+        geometry = [
+            LineString([(-100.0, 40.0), (-101.0, 40.0)]),
+            MultiLineString([[(-90.0, 30.0), (-90.0, 31.0)], [(-90.0, 31.0), (-90.0, 31.5)]]),
+            LineString([(-80.0, 35.0), (-81.0, 35.0)]),
+        ]
+        gdf = geopandas.GeoDataFrame(
+            {"dir": [1, 0, -1], "length": [-1.0, -1.0, -1.0]}, geometry=geometry, crs="EPSG:4326"
+        )
+        exploded = explode_multilinestrings(gdf)
+        self.assertEqual(list(exploded["dir"]), [1, 0, 0, -1])
+        self.assertEqual(list(exploded.geom_type), ["LineString"] * 4)
+        self.assertEqual(exploded.loc[[0, 3], "length"].tolist(), [-1.0, -1.0])
+        # one degree of latitude is ~69 miles
+        self.assertAlmostEqual(exploded.loc[1, "length"] / exploded.loc[2, "length"], 2.0, places=2)
+        self.assertAlmostEqual(exploded.loc[1, "length"], 69.0, delta=1.0)
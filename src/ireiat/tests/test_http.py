@@ -0,0 +1,125 @@
+import hashlib
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from ireiat.util.http import download_uncached_file, read_sentinel, sentinel_path
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB of non-trivial content
+ETAG = '"test-etag"'
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD at any path, honouring single byte ranges unless the path starts with /norange"""
+
+    requested_ranges: list = []
+
+    def do_GET(self):
+        supports_ranges = not self.path.startswith("/norange")
+        range_header = self.headers.get("Range")
+        _RangeRequestHandler.requested_ranges.append(range_header)
+        if supports_ranges and range_header:
+            start, end = range_header.removeprefix("bytes=").split("-")
+            start, end = int(start), int(end) if end else len(PAYLOAD) - 1
+            body = PAYLOAD[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+            self.send_header("Accept-Ranges", "bytes")
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTP(unittest.TestCase):
+
+    base_url: str
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _RangeRequestHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _RangeRequestHandler.requested_ranges = []
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.save_path = Path(self.temp_dir.name) / "nested" / "file.zip"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _download(self, path: str = "/file.zip", **kwargs):
+        return download_uncached_file(
+            f"{self.base_url}{path}", self.save_path, show_progress=False, **kwargs
+        )
+
+    def test_download_writes_file_and_sentinel_with_integrity_information(self):
+        self.assertTrue(self._download())
+        self.assertEqual(self.save_path.read_bytes(), PAYLOAD)
+        sentinel = read_sentinel(self.save_path)
+        self.assertEqual(sentinel["size"], len(PAYLOAD))
+        self.assertEqual(sentinel["etag"], ETAG)
+        self.assertEqual(sentinel["sha256"], hashlib.sha256(PAYLOAD).hexdigest())
+
+    def test_large_file_is_split_into_concurrent_ranges(self):
+        self._download(part_size=len(PAYLOAD) // 8, max_workers=4)
+        self.assertEqual(self.save_path.read_bytes(), PAYLOAD)
+        # one probe plus one request per range
+        self.assertEqual(len(_RangeRequestHandler.requested_ranges), 9)
+        self.assertEqual(list(self.save_path.parent.glob("*.part*")), [])
+
+    def test_partial_download_resumes_where_it_left_off(self):
+        part_size = len(PAYLOAD) // 4
+        self.save_path.parent.mkdir(parents=True)
+        state = {"url": f"{self.base_url}/file.zip", "size": len(PAYLOAD), "etag": ETAG, "parts": 4}
+        (self.save_path.parent / "file.zip.resume").write_text(json.dumps(state))
+        # first part complete, second part half-way
+        (self.save_path.parent / "file.zip.part0").write_bytes(PAYLOAD[:part_size])
+        (self.save_path.parent / "file.zip.part1").write_bytes(PAYLOAD[part_size : part_size + 100])
+
+        self._download(part_size=part_size)
+        self.assertEqual(self.save_path.read_bytes(), PAYLOAD)
+        requested = set(_RangeRequestHandler.requested_ranges)
+        self.assertNotIn(f"bytes=0-{part_size - 1}", requested)
+        self.assertIn(f"bytes={part_size + 100}-{2 * part_size - 1}", requested)
+
+    def test_server_without_range_support_downloads_in_a_single_stream(self):
+        self._download(path="/norange/file.zip", part_size=len(PAYLOAD) // 8)
+        self.assertEqual(self.save_path.read_bytes(), PAYLOAD)
+        self.assertEqual(len(_RangeRequestHandler.requested_ranges), 2)  # probe and download
+
+    def test_intact_file_is_not_downloaded_again(self):
+        self._download()
+        _RangeRequestHandler.requested_ranges = []
+        self._download(verify_checksum=True)
+        self.assertEqual(_RangeRequestHandler.requested_ranges, [])
+
+    def test_file_not_matching_sentinel_is_downloaded_again(self):
+        self._download()
+        self.save_path.write_bytes(PAYLOAD[:10])
+        self._download()
+        self.assertEqual(self.save_path.read_bytes(), PAYLOAD)
+
+    def test_legacy_timestamp_sentinel_is_still_honoured(self):
+        self.save_path.parent.mkdir(parents=True)
+        self.save_path.write_bytes(b"old")
+        sentinel_path(self.save_path).write_text("2024-01-01 00:00:00")
+        self._download()
+        self.assertEqual(self.save_path.read_bytes(), b"old")
+        self.assertEqual(_RangeRequestHandler.requested_ranges, [])
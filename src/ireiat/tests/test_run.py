@@ -0,0 +1,143 @@
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+from click.testing import CliRunner
+
+from ireiat.run import cli
+
+#: packages that only the commands needing them may import
+HEAVY_PACKAGES = [
+    "dagster",
+    "geopandas",
+    "igraph",
+    "matplotlib",
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "requests",
+    "shapely",
+]
+IMPORT_TIME_BUDGET_SECONDS = 0.5
+
+
+def _run_python(code: str, *flags: str, cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True, check=True, cwd=cwd
+    )
+
+
+def _help_code(args: List[str]) -> str:
+    """Code printing the top-level packages loaded by the CLI help of `args`"""
+    return (
+        "import json, sys\n"
+        "from click.testing import CliRunner\n"
+        "from ireiat.run import cli\n"
+        f"result = CliRunner().invoke(cli, {args!r})\n"
+        "assert result.exit_code == 0, result.output\n"
+        "print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))"
+    )
+
+
+class TestCLIStartup(unittest.TestCase):
+
+    def test_cli_import_does_not_load_heavy_packages(self):
+        for args in [["--help"], ["solve", "--help"]]:
+            loaded = set(json.loads(_run_python(_help_code(args)).stdout))
+            self.assertEqual(loaded & set(HEAVY_PACKAGES), set(), args)
+
+    def test_cli_import_time_is_within_budget(self):
+        stderr = _run_python("import ireiat.run", "-X", "importtime").stderr
+        # lines look like "import time: self [us] | cumulative | imported package"
+        cumulative_us = re.search(r"\|\s*(\d+)\s*\|\s*ireiat\.run$", stderr, re.M).group(1)
+        self.assertLess(int(cumulative_us) / 1e6, IMPORT_TIME_BUDGET_SECONDS)
+
+    def test_command_help_is_within_budget_and_creates_no_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stderr = _run_python(
+                _help_code(["solve", "--help"]), "-X", "importtime", cwd=temp_dir
+            ).stderr
+            self.assertEqual(list(Path(temp_dir).iterdir()), [])
+        # the cumulative time of each import made at the top level (no indentation before its name)
+        top_level_us = re.findall(r"\|\s*(\d+)\s*\| \S+$", stderr, re.M)
+        self.assertLess(sum(map(int, top_level_us)) / 1e6, IMPORT_TIME_BUDGET_SECONDS)
+
+
+class TestSolve(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+        # the CLI would log to a file under the working directory
+        self.logging_patch = patch("ireiat.run.configure_logging")
+        self.logging_patch.start()
+        pd.DataFrame(
+            {
+                "tail": [0],
+                "head": [1],
+                "fft": [1.0],
+                "capacity": [1.0],
+                "alpha": [0.15],
+                "beta": [4],
+            }
+        ).to_parquet(self.path / "network.parquet")
+        pd.DataFrame(
+            {"from": [0, 0], "to": [1, 1], "sctg2": ["01", "43"], "tons": [1.0, 2.0]}
+        ).to_parquet(self.path / "od.parquet")
+        self.files = [
+            "-n",
+            str(self.path / "network.parquet"),
+            "-d",
+            str(self.path / "od.parquet"),
+            "-o",
+            str(self.path / "traffic.parquet"),
+        ]
+
+    def tearDown(self):
+        self.logging_patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_python_engine_has_its_own_defaults(self):
+        with patch("ireiat.solver.io.solve_files") as solve_files:
+            result = CliRunner().invoke(cli, ["solve", "-e", "python", *self.files])
+        self.assertEqual(result.exit_code, 0, result.output)
+        kwargs = solve_files.call_args.kwargs
+        self.assertEqual((kwargs["max_gap"], kwargs["max_iterations"]), (1e-4, 100))
+
+    def test_r_engine_gets_commodities_summed(self):
+        od_files = []
+
+        def popen(cmd, **kwargs):
+            od_files.append(pd.read_parquet(cmd[3]))
+            return MagicMock(stdout=[])
+
+        with patch("ireiat.run.CACHE_PATH", self.path), patch("subprocess.Popen", popen):
+            result = CliRunner().invoke(cli, ["solve", *self.files])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(od_files[0].to_dict("list"), {"from": [0], "to": [1], "tons": [3.0]})
+        self.assertEqual(list(self.path.glob("local_tap_*")), [])
+
+    def test_tons_columns_are_rejected_where_they_would_be_ignored(self):
+        for flags in [
+            ["-t", "tons"],
+            ["-e", "python", "-t", "tons", "--keep-origin-flows"],
+            ["-e", "python", "-t", "tons", "--hierarchical"],
+        ]:
+            with patch("ireiat.solver.io.solve_horizon_files") as solve_horizon_files:
+                result = CliRunner().invoke(cli, ["solve", *self.files, *flags])
+            self.assertEqual(result.exit_code, 2, result.output)
+            solve_horizon_files.assert_not_called()
+
+    def test_hierarchical_is_rejected_where_it_would_be_ignored(self):
+        for flags in [["--hierarchical"], ["-e", "python", "--hierarchical"]]:
+            with patch("ireiat.solver.io.solve_files") as solve_files:
+                result = CliRunner().invoke(cli, ["solve", *self.files, *flags])
+            self.assertEqual(result.exit_code, 2, result.output)
+            solve_files.assert_not_called()
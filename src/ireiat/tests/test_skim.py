@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ireiat.util.csr_graph import CSRGraph
+from ireiat.util.skim import TerminalSkim, compute_terminal_skim
+
+
+class TestTerminalSkim(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # terminals at nodes 0, 2 and 4 of a two-way line 0 - 1 - 2 - 3 with node 4 only reachable from 3
+        tail = np.array([0, 1, 1, 2, 2, 3, 3])
+        head = np.array([1, 0, 2, 1, 3, 2, 4])
+        weights = np.array([1.0, 1.0, 2.0, 2.0, 3.0, 3.0, 4.0])
+        self.graph = CSRGraph.from_edges(tail, head, weights)
+        self.terminals = pd.DataFrame({"vertex": [0, 2, 4], "terminal_name": ["a", "b", "c"]})
+
+    def test_costs(self):
+        skim = compute_terminal_skim(self.graph, self.terminals)
+        expected = np.array([[0.0, 3.0, 10.0], [3.0, 0.0, 7.0], [np.inf, np.inf, 0.0]])
+        np.testing.assert_array_equal(skim.cost, expected)
+        self.assertFalse(skim.has_paths)
+
+    def test_paths_are_in_order(self):
+        skim = compute_terminal_skim(self.graph, self.terminals, keep_path_edges=True)
+        np.testing.assert_array_equal(skim.path(0, 2), [0, 2, 4, 6])
+        np.testing.assert_array_equal(skim.path(1, 0), [3, 1])
+        self.assertEqual(len(skim.path(2, 0)), 0)  # unreachable
+        self.assertEqual(len(skim.path(1, 1)), 0)
+        for i in range(3):
+            for j in range(3):
+                if np.isfinite(skim.cost[i, j]):
+                    path_cost = self.graph.weights[skim.path(i, j)].sum()
+                    self.assertAlmostEqual(path_cost, skim.cost[i, j])
+
+    def test_save_and_memory_map(self):
+        skim = compute_terminal_skim(self.graph, self.terminals, keep_path_edges=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            skim.save(tmp_dir)
+            loaded = TerminalSkim.load(tmp_dir)
+            self.assertIsInstance(loaded.cost, np.memmap)
+            np.testing.assert_array_equal(loaded.cost, skim.cost)
+            np.testing.assert_array_equal(loaded.path(0, 2), skim.path(0, 2))
+            self.assertEqual(list(loaded.terminals["terminal_name"]), ["a", "b", "c"])
+            del loaded
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from ireiat.util.spatial import HaversineKDTree
+
+
+def _haversine_radians(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Great circle angles between every (latitude, longitude) of `a` and of `b`, in radians"""
+    lat_a, lon_a = a[:, [0]], a[:, [1]]
+    lat_b, lon_b = b[:, 0], b[:, 1]
+    h = (
+        np.sin((lat_b - lat_a) / 2) ** 2
+        + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2
+    )
+    return 2 * np.arcsin(np.sqrt(h))
+
+
+class TestHaversineKDTree(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.points = np.deg2rad(np.c_[rng.uniform(25, 49, 500), rng.uniform(-124, -67, 500)])
+        self.queries = np.deg2rad(np.c_[rng.uniform(25, 49, 50), rng.uniform(-124, -67, 50)])
+        self.distances = _haversine_radians(self.queries, self.points)
+        self.tree = HaversineKDTree(self.points)
+
+    def test_query_returns_the_nearest_points_by_haversine_distance(self):
+        distances, indices = self.tree.query(self.queries, k=3)
+        expected_indices = np.argsort(self.distances, axis=1)[:, :3]
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(
+            distances, np.take_along_axis(self.distances, expected_indices, axis=1), atol=1e-12
+        )
+
+    def test_query_radius_returns_points_within_the_radius_nearest_first(self):
+        radius = 100 / 3958.8  # 100 miles
+        indices, distances = self.tree.query_radius(
+            self.queries, r=radius, return_distance=True, sort_results=True
+        )
+        self.assertEqual(len(indices), len(self.queries))
+        for query_distances, found, found_distances in zip(self.distances, indices, distances):
+            expected = np.flatnonzero(query_distances <= radius)
+            expected = expected[np.argsort(query_distances[expected])]
+            np.testing.assert_array_equal(found, expected)
+            np.testing.assert_allclose(found_distances, query_distances[expected], atol=1e-12)
+
+    def test_query_is_capped_at_the_number_of_points(self):
+        tree = HaversineKDTree(self.points[:2])
+        distances, indices = tree.query(self.queries[:1], k=10)
+        self.assertEqual(indices.shape, (1, 2))
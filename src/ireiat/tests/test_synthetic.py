@@ -0,0 +1,61 @@
+import unittest
+
+import dagster
+import pandas as pd
+
+from ireiat.benchmarks import synthetic
+from ireiat.benchmarks.synthetic import SyntheticSize
+from ireiat.data_pipeline.assets.highway_network.highway_graph import undirected_highway_edges
+from ireiat.data_pipeline.assets.marine_network.marine_graph import undirected_marine_edges
+from ireiat.data_pipeline.assets.rail_network.owners import OwnerVocabulary
+from ireiat.data_pipeline.assets.rail_network.rail_graph import undirected_rail_edges
+
+TINY = SyntheticSize(
+    rows=10,
+    cols=12,
+    n_counties=20,
+    n_county_pairs=50,
+    n_faf_zones=4,
+    n_terminals=3,
+    n_rail_owners=3,
+)
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_edges_have_the_schema_of_the_undirected_edge_assets(self):
+        context = dagster.build_asset_context()
+        for asset, links, edges in [
+            (undirected_highway_edges, synthetic.highway_links, synthetic.highway_edges),
+            (undirected_rail_edges, synthetic.rail_links, synthetic.rail_edges),
+            (undirected_marine_edges, synthetic.marine_links, synthetic.marine_edges),
+        ]:
+            expected = asset(context, links(TINY))
+            self.assertEqual(list(edges(TINY).columns), list(expected.columns))
+
+    def test_generators_are_deterministic(self):
+        pd.testing.assert_frame_equal(synthetic.county_tons(TINY), synthetic.county_tons(TINY))
+        self.assertTrue(synthetic.highway_links(TINY).equals(synthetic.highway_links(TINY)))
+
+    def test_rail_has_multiple_owners_and_terminals_served_by_them(self):
+        links = synthetic.rail_links(TINY)
+        vocabulary = OwnerVocabulary.from_frame(links)
+        owner_sets = [vocabulary.decode(vocabulary.from_bytes(mask)) for mask in links["owners"]]
+        self.assertEqual(set().union(*owner_sets), set(synthetic.RAIL_OWNERS[:3]))
+        self.assertTrue(any(len(owner_set) > 1 for owner_set in owner_sets))
+        terminals = synthetic.intermodal_terminals(TINY)
+        self.assertEqual(len(terminals), TINY.n_terminals)
+
+    def test_county_tons_exclude_self_flows(self):
+        tons = synthetic.county_tons(TINY)
+        self.assertEqual(len(tons), TINY.n_county_pairs)
+        is_self_flow = (tons["state_orig"] == tons["state_dest"]) & (
+            tons["county_orig"] == tons["county_dest"]
+        )
+        self.assertFalse(is_self_flow.any())
+
+    def test_faf_allocation_sums_to_one_per_zone(self):
+        demand, allocation = synthetic.faf_demand(TINY)
+        self.assertEqual(set(demand["dms_orig"]), set(allocation))
+        for shares in allocation.values():
+            self.assertAlmostEqual(sum(shares.values()), 1.0)
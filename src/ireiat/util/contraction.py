@@ -0,0 +1,158 @@
+"""Contraction of degree-2 chains of a TAP network into single links.
+
+Most nodes of the digitized highway and marine networks are shape points: nodes with exactly one way in and
+one way out (one-way), or exactly two neighbours connected both ways (two-way). Every such node costs a node
+and an edge (or two) in each shortest path tree, without changing any route. Contracting a chain of them
+into one link sums its free flow times (and lengths) and keeps the minimum capacity, which is exact when
+capacities along the chain are equal. Chains only run through edges sharing `alpha` and `beta`.
+
+Node indices are kept as they are (contracted shape points become isolated nodes), so O-D tables built on
+the uncontracted network stay valid. The original links of each contracted link are listed in its
+`original_ids` column, which expands solver flows back onto the original network."""
+
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CONTRACTED_SUM_COLUMNS = ["length", "fft"]
+CONTRACTED_MIN_COLUMNS = ["capacity"]
+CONTRACTED_LAST_COLUMNS = ["head", "destination_latitude", "destination_longitude"]
+ORIGINAL_IDS_COLUMN = "original_ids"
+
+
+def _contractible_nodes(network_df: pd.DataFrame, protected_nodes: np.ndarray) -> np.ndarray:
+    """Mask of the nodes that are one-way or two-way pass-throughs of edges sharing alpha and beta"""
+    tail, head = network_df["tail"].to_numpy(), network_df["head"].to_numpy()
+    n_nodes = int(max(tail.max(), head.max())) + 1
+    in_degree = np.bincount(head, minlength=n_nodes)
+    out_degree = np.bincount(tail, minlength=n_nodes)
+
+    # distinct neighbours, counting each neighbour once whether it is reached in, out or both ways
+    neighbours = pd.DataFrame(
+        {"node": np.concatenate([tail, head]), "neighbour": np.concatenate([head, tail])}
+    ).drop_duplicates()
+    neighbours = neighbours.loc[neighbours["node"] != neighbours["neighbour"]]
+    n_neighbours = np.bincount(neighbours["node"].to_numpy(), minlength=n_nodes)
+
+    one_way = (in_degree == 1) & (out_degree == 1) & (n_neighbours == 2)
+    two_way = (in_degree == 2) & (out_degree == 2) & (n_neighbours == 2)
+    has_reverse = pd.MultiIndex.from_arrays([head, tail]).isin(
+        pd.MultiIndex.from_arrays([tail, head])
+    )
+    is_two_way_edge = np.zeros(n_nodes, dtype=np.int64)
+    np.add.at(is_two_way_edge, head, has_reverse)
+    two_way &= is_two_way_edge == 2  # i.e. both in-edges are reversed by the out-edges
+
+    # the BPR parameters must agree on all edges at the node
+    bpr = network_df[["alpha", "beta"]].to_numpy()
+    incident = pd.DataFrame(
+        {
+            "node": np.concatenate([tail, head]),
+            "alpha": np.concatenate([bpr[:, 0], bpr[:, 0]]),
+            "beta": np.concatenate([bpr[:, 1], bpr[:, 1]]),
+        }
+    )
+    n_parameters = incident.drop_duplicates().groupby("node").size()
+    uniform = np.zeros(n_nodes, dtype=bool)
+    uniform[n_parameters.index.to_numpy()] = n_parameters.to_numpy() == 1
+
+    contractible = (one_way | two_way) & uniform
+    contractible[np.asarray(protected_nodes, dtype=np.int64)] = False
+    return contractible
+
+
+def _next_edges(network_df: pd.DataFrame, contractible: np.ndarray) -> np.ndarray:
+    """The edge continuing each edge through its head if the head is contractible (-1 otherwise): the
+    out-edge of the head that does not turn back to the edge's tail"""
+    tail, head = network_df["tail"].to_numpy(), network_df["head"].to_numpy()
+    edges = np.arange(len(tail))
+    into = pd.DataFrame({"edge": edges, "node": head, "from_node": tail}).loc[contractible[head]]
+    out_of = pd.DataFrame({"next_edge": edges, "node": tail, "to_node": head}).loc[
+        contractible[tail]
+    ]
+    continuations = into.merge(out_of, on="node")
+    continuations = continuations.loc[continuations["to_node"] != continuations["from_node"]]
+    next_edge = np.full(len(tail), -1, dtype=np.int64)
+    next_edge[continuations["edge"].to_numpy()] = continuations["next_edge"].to_numpy()
+    return next_edge
+
+
+def _chains(next_edge: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Chain (link) index and position within the chain of every edge, following `next_edge` from the
+    edges no other edge continues into. Edges on closed rings of contractible nodes are their own chains.
+    """
+    n_edges = len(next_edge)
+    is_continued = np.zeros(n_edges, dtype=bool)
+    is_continued[next_edge[next_edge >= 0]] = True
+    link = np.full(n_edges, -1, dtype=np.int64)
+    position = np.zeros(n_edges, dtype=np.int64)
+
+    current = np.flatnonzero(~is_continued)
+    chain = np.arange(len(current))
+    step = 0
+    while len(current):
+        link[current], position[current] = chain, step
+        continues = next_edge[current] >= 0
+        current, chain = next_edge[current[continues]], chain[continues]
+        step += 1
+
+    on_rings = np.flatnonzero(link < 0)
+    link[on_rings] = link.max(initial=-1) + 1 + np.arange(len(on_rings))
+    return link, position
+
+
+def contract_degree_two_chains(
+    network_df: pd.DataFrame, protected_nodes: Iterable[int] = ()
+) -> pd.DataFrame:
+    """Contracts the chains of degree-2 nodes of a TAP network dataframe (tail, head, fft, capacity, alpha,
+    beta and optionally length, original_id and coordinates), other than `protected_nodes` (e.g. the nodes
+    demand is attached to). Returns one row per link with the `original_ids` of the edges it replaces.
+
+    A chain whose link would duplicate another link (same tail and head) or loop back to its tail is left
+    uncontracted, so that every (tail, head) link maps to a single path of original edges."""
+    network_df = network_df.reset_index(drop=True)
+    contractible = _contractible_nodes(network_df, np.fromiter(protected_nodes, dtype=np.int64))
+    link, position = _chains(_next_edges(network_df, contractible))
+
+    # undo chains that would become self loops or parallel links
+    edge_order = np.lexsort((position, link))
+    link_size = np.bincount(link)
+    is_first = np.r_[True, link[edge_order][1:] != link[edge_order][:-1]]
+    is_last = np.r_[link[edge_order][1:] != link[edge_order][:-1], True]
+    link_tail = network_df["tail"].to_numpy()[edge_order][is_first]
+    link_head = network_df["head"].to_numpy()[edge_order][is_last]
+    links = pd.DataFrame({"tail": link_tail, "head": link_head})
+    undo = (link_size > 1) & (
+        (link_tail == link_head) | links.duplicated(["tail", "head"], keep=False).to_numpy()
+    )
+    if undo.any():
+        undone_edges = np.flatnonzero(undo[link])
+        link[undone_edges] = link.max() + 1 + np.arange(len(undone_edges))
+        position[undone_edges] = 0
+        _, link = np.unique(link, return_inverse=True)
+
+    edges = network_df.assign(_link=link, _position=position).sort_values(["_link", "_position"])
+    grouped = edges.groupby("_link", sort=True)
+    aggregations = {}
+    for column in network_df.columns:
+        if column in CONTRACTED_SUM_COLUMNS:
+            aggregations[column] = "sum"
+        elif column in CONTRACTED_MIN_COLUMNS:
+            aggregations[column] = "min"
+        elif column in CONTRACTED_LAST_COLUMNS:
+            aggregations[column] = "last"
+        else:
+            aggregations[column] = "first"
+    contracted = grouped.agg(aggregations)
+    if "speed" in contracted.columns and "length" in contracted.columns:
+        contracted["speed"] = contracted["length"] / contracted["fft"]
+    contracted = contracted.reset_index(drop=True)
+    if "original_id" in network_df.columns:
+        offsets = np.concatenate([[0], np.cumsum(grouped.size().to_numpy())])
+        original_ids = pa.array(edges["original_id"], from_pandas=True)
+        contracted[ORIGINAL_IDS_COLUMN] = pa.ListArray.from_arrays(
+            offsets, original_ids
+        ).to_pandas()
+    return contracted
@@ -0,0 +1,203 @@
+"""Compact CSR graph kernel shared by the data pipeline, the solver and postprocessing.
+
+A `CSRGraph` holds a directed graph as flat NumPy arrays: the edges (in their source order) and a CSR
+adjacency structure over the distinct (tail, head) node pairs, which is what shortest path and connectivity
+routines run on. Parallel edges collapse into one pair whose weight is the minimum of theirs. Memory is a
+few int32/float64 arrays per edge, independent of any Python attributes of the graph it was built from."""
+
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Tuple
+
+import igraph as ig
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+# memory budget (bytes) for the distance and predecessor matrices of a batch of shortest path trees
+DIJKSTRA_MEMORY_BUDGET = 256 * 1024**2
+
+
+def dijkstra_batch_size(n_nodes: int, memory_budget: int = DIJKSTRA_MEMORY_BUDGET) -> int:
+    """Number of shortest path trees (float64 distances, int32 predecessors) fitting in the memory budget"""
+    return max(1, memory_budget // (12 * max(n_nodes, 1)))
+
+
+@dataclass
+class CSRGraph:
+    """Directed graph over nodes 0..n_nodes-1 with a weight on each edge"""
+
+    n_nodes: int
+    tail: np.ndarray
+    head: np.ndarray
+    weights: np.ndarray
+
+    # distinct (tail, head) pairs, sorted by tail then head, in CSR form
+    indptr: np.ndarray = field(init=False, repr=False)
+    indices: np.ndarray = field(init=False, repr=False)
+    pair_tail: np.ndarray = field(init=False, repr=False)
+    _pair_keys: np.ndarray = field(init=False, repr=False)
+    _pair_of_edge: np.ndarray = field(init=False, repr=False)
+    _has_parallel_edges: bool = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.tail = np.asarray(self.tail, dtype=np.int32)
+        self.head = np.asarray(self.head, dtype=np.int32)
+        self.weights = np.asarray(self.weights, dtype=np.float64)
+
+        edge_keys = self.tail.astype(np.int64) * self.n_nodes + self.head
+        self._pair_keys, pair_of_edge = np.unique(edge_keys, return_inverse=True)
+        self._pair_of_edge = pair_of_edge.astype(np.int64)
+        self._has_parallel_edges = len(self._pair_keys) < self.n_edges
+        self.pair_tail = (self._pair_keys // self.n_nodes).astype(np.int32)
+        self.indices = (self._pair_keys % self.n_nodes).astype(np.int32)
+        self.indptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.pair_tail, minlength=self.n_nodes))]
+        ).astype(np.int32 if len(self._pair_keys) < np.iinfo(np.int32).max else np.int64)
+
+    @classmethod
+    def from_edges(
+        cls,
+        tail: np.ndarray,
+        head: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        n_nodes: Optional[int] = None,
+    ) -> "CSRGraph":
+        tail, head = np.asarray(tail), np.asarray(head)
+        if n_nodes is None:
+            n_nodes = int(max(tail.max(), head.max())) + 1 if len(tail) else 0
+        return cls(n_nodes, tail, head, np.ones(len(tail)) if weights is None else weights)
+
+    @classmethod
+    def from_dataframe(
+        cls, network_df: pd.DataFrame, weight_column: Optional[str] = None
+    ) -> "CSRGraph":
+        """Graph of a (tail, head, ...) network dataframe such as a `tap_*_network_dataframe`"""
+        return cls.from_edges(
+            network_df["tail"].to_numpy(),
+            network_df["head"].to_numpy(),
+            network_df[weight_column].to_numpy() if weight_column else None,
+        )
+
+    @classmethod
+    def from_igraph(cls, g: ig.Graph, weight_attribute: Optional[str] = None) -> "CSRGraph":
+        """Graph of an igraph graph, with the same edge indices. The edges of an undirected graph are
+        added in both directions; edge i + g.ecount() is the reverse of edge i."""
+        edge_list = np.array(g.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        tail, head = edge_list[:, 0], edge_list[:, 1]
+        weights = np.array(g.es[weight_attribute], dtype=np.float64) if weight_attribute else None
+        if not g.is_directed():
+            tail, head = np.concatenate([tail, head]), np.concatenate([head, tail])
+            weights = None if weights is None else np.concatenate([weights, weights])
+        return cls.from_edges(tail, head, weights, n_nodes=g.vcount())
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.tail)
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self._pair_keys)
+
+    @property
+    def pair_head(self) -> np.ndarray:
+        return self.indices
+
+    def pair_index(self, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+        """Index of the (tail, head) pairs, which must exist in the graph"""
+        return np.searchsorted(
+            self._pair_keys, np.asarray(tail, dtype=np.int64) * self.n_nodes + head
+        )
+
+    def pair_weights(self, weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Weight of each pair (the minimum of its parallel edges) and the edge that attains it"""
+        weights = self.weights if weights is None else weights
+        if not self._has_parallel_edges:
+            order = np.empty(self.n_edges, dtype=np.int64)
+            order[self._pair_of_edge] = np.arange(self.n_edges)
+            return weights[order], order
+        order = np.lexsort((weights, self._pair_of_edge))
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = self._pair_of_edge[order[1:]] != self._pair_of_edge[order[:-1]]
+        cheapest_edge = order[is_first]
+        return weights[cheapest_edge], cheapest_edge
+
+    def matrix(self, pair_weights: Optional[np.ndarray] = None) -> sp.csr_matrix:
+        """Sparse adjacency matrix weighted by `pair_weights` (by default the minimum edge weights), for use
+        with `scipy.sparse.csgraph`. Zero weights are kept as explicit entries (i.e. edges)."""
+        if pair_weights is None:
+            pair_weights, _ = self.pair_weights()
+        return sp.csr_matrix(
+            (pair_weights, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes)
+        )
+
+    def batched_dijkstra(
+        self,
+        sources: np.ndarray,
+        pair_weights: Optional[np.ndarray] = None,
+        memory_budget: int = DIJKSTRA_MEMORY_BUDGET,
+    ) -> Iterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+        """Shortest path trees from `sources`, in batches whose distance and predecessor matrices fit in
+        `memory_budget`. Yields the position of the batch in `sources`, its sources, their distances and
+        predecessors (-9999 where there is none)."""
+        graph = self.matrix(pair_weights)
+        sources = np.asarray(sources)
+        batch_size = dijkstra_batch_size(self.n_nodes, memory_budget)
+        for batch_start in range(0, len(sources), batch_size):
+            batch_sources = sources[batch_start : batch_start + batch_size]
+            distances, predecessors = dijkstra(
+                graph, indices=batch_sources, return_predecessors=True
+            )
+            yield batch_start, batch_sources, distances, predecessors
+
+    def path_edges(
+        self,
+        predecessors: np.ndarray,
+        tree: np.ndarray,
+        targets: np.ndarray,
+        pair_weights: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Distinct edges on the tree paths to `targets` (of the trees `tree`, rows of `predecessors`),
+        walking all paths simultaneously. Unreachable targets are ignored."""
+        _, cheapest_edge = self.pair_weights(pair_weights)
+        tree, node = np.asarray(tree, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        pairs = []
+        while len(node):
+            keys = np.unique(tree * self.n_nodes + node)
+            tree, node = keys // self.n_nodes, keys % self.n_nodes
+            predecessor = predecessors[tree, node].astype(np.int64)
+            has_predecessor = predecessor >= 0
+            tree, node, predecessor = (
+                tree[has_predecessor],
+                node[has_predecessor],
+                predecessor[has_predecessor],
+            )
+            pairs.append(self.pair_index(predecessor, node))
+            node = predecessor
+        return np.unique(cheapest_edge[np.concatenate(pairs)]) if pairs else np.zeros(0, np.int64)
+
+    def strongly_connected_components(self) -> Tuple[int, np.ndarray]:
+        """Number of strongly connected components and the component label of each node"""
+        return connected_components(self.matrix(), directed=True, connection="strong")
+
+    def largest_strongly_connected_component(self) -> np.ndarray:
+        """Sorted node indices of the largest strongly connected component"""
+        _, labels = self.strongly_connected_components()
+        return np.flatnonzero(labels == np.bincount(labels).argmax())
+
+    def is_strongly_connected(self) -> bool:
+        return self.n_nodes == 0 or self.strongly_connected_components()[0] == 1
+
+    def subgraph(self, nodes: np.ndarray) -> Tuple["CSRGraph", np.ndarray]:
+        """Graph induced by `nodes` (renumbered in sorted order) and the indices of the edges it keeps"""
+        nodes = np.unique(nodes)
+        new_index = np.full(self.n_nodes, -1, dtype=np.int64)
+        new_index[nodes] = np.arange(len(nodes))
+        kept_edges = np.flatnonzero((new_index[self.tail] >= 0) & (new_index[self.head] >= 0))
+        subgraph = CSRGraph(
+            len(nodes),
+            new_index[self.tail[kept_edges]],
+            new_index[self.head[kept_edges]],
+            self.weights[kept_edges],
+        )
+        return subgraph, kept_edges
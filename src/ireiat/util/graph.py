@@ -1,62 +1,123 @@
-from collections import Counter
-from itertools import chain
+from dataclasses import dataclass
 from typing import Dict, Tuple, List
 
 import geopandas
 import igraph as ig
 import numpy as np
 import pandas as pd
-from shapely.geometry import MultiLineString
-from sklearn.neighbors import BallTree
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 
 from ireiat.config.constants import LATLONG_CRS, ALBERS_CRS, METERS_PER_MILE
+from ireiat.util.csr_graph import CSRGraph
+from ireiat.util.spatial import HaversineKDTree
 
 
 # break out each multiline
 def explode_multilinestrings(gdf: geopandas.GeoDataFrame):
     """If a dataframe contains shapely.MultiLineString geometries, return a record in the dataframe
     for each line with the multiline string. Additionally, recompute the `length` field in miles
-    for each row"""
-    multiline_locs, line_locs = [], []
-    for row in gdf.itertuples():
-        if isinstance(row.geometry, MultiLineString):
-            multiline_locs.append(row.Index)
-        else:
-            line_locs.append(row.Index)
-    if not multiline_locs:
+    for each of these lines (the length of single lines is kept)"""
+    geometry = np.asarray(gdf.geometry.values)
+    is_multiline = shapely.get_type_id(geometry) == shapely.GeometryType.MULTILINESTRING
+    if not is_multiline.any():
         return gdf
 
-    concatenated_df = pd.concat(
-        [gdf.loc[multiline_locs].explode("geometry"), gdf.loc[line_locs]], axis=0, ignore_index=True
+    # every line of a multiline takes the place of its multiline, keeping the row order
+    n_parts = np.where(is_multiline, shapely.get_num_geometries(geometry), 1)
+    rows = np.repeat(np.arange(len(gdf)), n_parts)
+    is_part = is_multiline[rows]
+    parts = geopandas.GeoSeries(shapely.get_parts(geometry[is_multiline]), crs=gdf.crs)
+    exploded_geometry = geometry[rows]
+    exploded_geometry[is_part] = parts.values
+
+    exploded_df = gdf.iloc[rows].reset_index(drop=True)
+    exploded_df[gdf.geometry.name] = geopandas.GeoSeries(exploded_geometry, crs=gdf.crs)
+    exploded_df.loc[is_part, "length"] = (
+        parts.to_crs(ALBERS_CRS).length.to_numpy() / METERS_PER_MILE
     )
-    concatenated_df["length"] = concatenated_df.to_crs(ALBERS_CRS).geometry.length / METERS_PER_MILE
-    return concatenated_df
+    return exploded_df
 
 
 def get_coordinates_from_geoframe(gdf: geopandas.GeoDataFrame) -> pd.DataFrame:
     """Given a GeoDataFrame of line segments, returns the origin and destination coordinates of each line segment
     in a pandas DataFrame. Returned fields are origin_latitude, origin_longitude, destination_latitude, destination_longitude.
     Will ensure that the CRS for lat/longs are equal to EPSG:4326"""
+    # the first point of the first part and the last point of the last part (parts only for multi-lines)
+    geometry = np.asarray(gdf.geometry.values)
+    first_points = shapely.get_point(shapely.get_geometry(geometry, 0), 0)
+    last_points = shapely.get_point(shapely.get_geometry(geometry, -1), -1)
+    endpoints = geopandas.GeoSeries(np.concatenate([first_points, last_points]), crs=gdf.crs)
     if gdf.crs != LATLONG_CRS:
-        gdf = gdf.to_crs(LATLONG_CRS)
-    link_coords = (
-        gdf.geometry.get_coordinates()
-        .reset_index()
-        .groupby("index")
-        .agg({"x": ["first", "last"], "y": ["first", "last"]})
+        endpoints = endpoints.to_crs(LATLONG_CRS)  # only the endpoints are reprojected
+
+    n_links = len(gdf)
+    xy = shapely.get_coordinates(endpoints.values)
+    link_coords = pd.DataFrame(
+        {
+            "origin_longitude": xy[:n_links, 0],
+            "destination_longitude": xy[n_links:, 0],
+            "origin_latitude": xy[:n_links, 1],
+            "destination_latitude": xy[n_links:, 1],
+        },
+        index=gdf.index,
     )
-    link_coords = link_coords.droplevel(0, axis=1)
-    link_coords.columns = [
-        "origin_longitude",
-        "destination_longitude",
-        "origin_latitude",
-        "destination_latitude",
-    ]
     link_coords = np.round(link_coords, 6)  # round to 6 decimal places of lat long
     assert len(link_coords) == len(gdf)
     return link_coords
 
 
+def snap_link_coordinates(
+    link_coords: pd.DataFrame, tolerance_meters: float
+) -> Tuple[pd.DataFrame, int]:
+    """Merges link endpoints lying within `tolerance_meters` of each other (measured in ALBERS_CRS), so that
+    nearly coincident endpoints are identified as a single node when building the graph. Endpoints are
+    clustered transitively with a KD-tree and each cluster takes the coordinates of one of its endpoints.
+    Links whose endpoints merge into the same node are dropped. Returns the snapped links and the number of
+    endpoints merged away."""
+    if tolerance_meters <= 0 or link_coords.empty:
+        return link_coords, 0
+    latitudes = np.concatenate(
+        [link_coords["origin_latitude"], link_coords["destination_latitude"]]
+    )
+    longitudes = np.concatenate(
+        [link_coords["origin_longitude"], link_coords["destination_longitude"]]
+    )
+    endpoints, endpoint_idx = np.unique(
+        np.stack([latitudes, longitudes], axis=1), axis=0, return_inverse=True
+    )
+    endpoint_idx = endpoint_idx.reshape(-1)
+    projected = geopandas.GeoSeries(
+        geopandas.points_from_xy(endpoints[:, 1], endpoints[:, 0]), crs=LATLONG_CRS
+    ).to_crs(ALBERS_CRS)
+    pairs = cKDTree(np.stack([projected.x, projected.y], axis=1)).query_pairs(
+        tolerance_meters, output_type="ndarray"
+    )
+    if not len(pairs):
+        return link_coords, 0
+
+    n_endpoints = len(endpoints)
+    adjacency = coo_matrix(
+        (np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n_endpoints, n_endpoints)
+    )
+    n_clusters, cluster = connected_components(adjacency, directed=False)
+    _, representative = np.unique(cluster, return_index=True)
+    snapped = endpoints[representative[cluster]][endpoint_idx]
+
+    n_links = len(link_coords)
+    link_coords = link_coords.copy()
+    link_coords["origin_latitude"] = snapped[:n_links, 0]
+    link_coords["origin_longitude"] = snapped[:n_links, 1]
+    link_coords["destination_latitude"] = snapped[n_links:, 0]
+    link_coords["destination_longitude"] = snapped[n_links:, 1]
+    is_loop = (link_coords["origin_latitude"] == link_coords["destination_latitude"]) & (
+        link_coords["origin_longitude"] == link_coords["destination_longitude"]
+    )
+    return link_coords.loc[~is_loop], n_endpoints - n_clusters
+
+
 def generate_zero_based_node_maps(link_coords: pd.DataFrame) -> Dict[Tuple[float, float], int]:
     """Returns a dictionary of (lat,long)->index based on each row in the dataframe.
     The final index in the dictionary represents the count-1 of the identified nodes.
@@ -78,29 +139,84 @@ def generate_zero_based_node_maps(link_coords: pd.DataFrame) -> Dict[Tuple[float
     return latlong_node_idx_dict
 
 
-def get_allowed_node_indices(g: ig.Graph) -> List[int]:
-    """Given a graph, checks its connectedness and returns the indices of the
-    nodes of the largest connected component"""
-    # filter for the largest connected component (we are basically throwing away the weakly connected nodes)
-    connected_component_length = Counter([len(f) for f in g.connected_components()])
-    biggest_connected_component = max(connected_component_length)
-
-    print(f"Number of nodes in largest connected component {connected_component_length}")
-    count_of_excluded_nodes = sum(
-        [k * v for k, v in connected_component_length.items() if k != biggest_connected_component]
+@dataclass
+class StronglyConnectedEdges:
+    """Edges of the largest strongly connected component of a directed graph. Node i of the pruned graph
+    is node `node_indices[i]` of the original graph; its edges are the original `edge_indices`."""
+
+    node_indices: np.ndarray
+    edge_indices: np.ndarray
+    tail: np.ndarray
+    head: np.ndarray
+    n_components: int
+    n_excluded_nodes: int
+    n_excluded_edges: int
+
+    def metadata(self) -> Dict[str, int]:
+        return {
+            "strongly_connected_components": self.n_components,
+            "excluded_nodes": self.n_excluded_nodes,
+            "excluded_edges": self.n_excluded_edges,
+        }
+
+
+def prune_to_strongly_connected(
+    tail: np.ndarray, head: np.ndarray, n_nodes: int
+) -> StronglyConnectedEdges:
+    """Restricts the directed edges (tail, head) over nodes 0..n_nodes-1 to the largest strongly connected
+    component. Components are computed once; nodes and edges outside the largest are excluded."""
+    tail, head = np.asarray(tail, dtype=np.int64), np.asarray(head, dtype=np.int64)
+    n_components, labels = CSRGraph.from_edges(
+        tail, head, n_nodes=n_nodes
+    ).strongly_connected_components()
+    node_indices = np.flatnonzero(labels == np.bincount(labels).argmax())
+    new_index = np.full(n_nodes, -1, dtype=np.int64)
+    new_index[node_indices] = np.arange(len(node_indices))
+    edge_indices = np.flatnonzero((new_index[tail] >= 0) & (new_index[head] >= 0))
+    return StronglyConnectedEdges(
+        node_indices=node_indices,
+        edge_indices=edge_indices,
+        tail=new_index[tail[edge_indices]],
+        head=new_index[head[edge_indices]],
+        n_components=int(n_components),
+        n_excluded_nodes=n_nodes - len(node_indices),
+        n_excluded_edges=len(tail) - len(edge_indices),
+    )
+
+
+def generate_strongly_connected_graph(
+    vertex_coords: List[Tuple[float, float]],
+    edge_tuples: List[Tuple[int, int]],
+    edge_attributes: Dict[str, list],
+) -> Tuple[ig.Graph, StronglyConnectedEdges]:
+    """Builds the directed graph of the largest strongly connected component of the graph with vertices at
+    `vertex_coords` and edges `edge_tuples` (with the per-edge `edge_attributes`). Only the retained vertices
+    and edges are added, so the full graph is never materialized."""
+    edges = np.array(edge_tuples, dtype=np.int64).reshape(-1, 2)
+    pruned = prune_to_strongly_connected(edges[:, 0], edges[:, 1], len(vertex_coords))
+    g = ig.Graph(directed=True)
+    g.add_vertices(
+        len(pruned.node_indices),
+        attributes={"coords": [vertex_coords[i] for i in pruned.node_indices]},
     )
-    print(f"Excluded # of nodes that are not strongly connected {count_of_excluded_nodes}")
-    allowed_node_indices = list(
-        chain.from_iterable(
-            [x for x in g.connected_components() if len(x) == biggest_connected_component]
-        )
+    kept = pruned.edge_indices.tolist()
+    g.add_edges(
+        zip(pruned.tail.tolist(), pruned.head.tolist()),
+        attributes={name: [values[i] for i in kept] for name, values in edge_attributes.items()},
     )
-    return allowed_node_indices
+    return g, pruned
+
+
+def get_allowed_node_indices(g: ig.Graph) -> List[int]:
+    """Given a graph, returns the indices of the nodes of its largest strongly connected component"""
+    graph = CSRGraph.from_igraph(g)
+    return prune_to_strongly_connected(graph.tail, graph.head, g.vcount()).node_indices.tolist()
 
 
-def generate_ball_tree(g: ig.Graph) -> BallTree:
-    """Generates a ball tree from a graph assuming that vertices all have a 'coords' attribute"""
+def generate_ball_tree(g: ig.Graph) -> HaversineKDTree:
+    """Generates a (haversine) nearest neighbour tree from a graph assuming that vertices all have a 'coords'
+    attribute"""
     # stack unique origins / destinations by lat/long
     vertex_coords = g.vs["coords"]
     node_lat_long_radians = np.deg2rad(np.array(vertex_coords))
-    return BallTree(node_lat_long_radians, metric="haversine")
+    return HaversineKDTree(node_lat_long_radians)
@@ -1,51 +1,287 @@
 import datetime
+import hashlib
+import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional, List, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+BUFFER_SIZE = 1024 * 1024  # 1 MiB read/write buffer
+PART_SIZE = 32 * 1024 * 1024  # files larger than this are downloaded as concurrent byte ranges
+MAX_WORKERS = 4  # concurrent connections (and byte ranges) per file
+TIMEOUT_SECONDS = 10  # timeout for connect or read
 
-def download_uncached_file(url: str, save_path: Path | str, force: bool = False) -> bool:
-    """Simple download helper to stream the contents of `url` to `save_path`.
+
+@dataclass
+class RemoteFile:
+    """What the server tells us about a file before we download it"""
+
+    size: Optional[int] = None
+    etag: Optional[str] = None
+    accepts_ranges: bool = False
+
+
+def create_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """Returns a `requests.Session` with a connection pool large enough for `pool_size` concurrent
+    range requests and retries on transient server errors."""
+    session = requests.Session()
+    session.verify = False
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def sentinel_path(save_path: Path | str) -> Path:
+    """Location of the sentinel file marking a completed download of `save_path`"""
+    save_path = Path(save_path)
+    return save_path.parent / f"{save_path.name}.sentinel"
+
+
+def read_sentinel(save_path: Path | str) -> Optional[dict]:
+    """Returns the contents of the sentinel for `save_path` (size, etag, sha256, downloaded_at) or None
+    if there is no sentinel. Sentinels written by older versions only contain a timestamp, in which case
+    only `downloaded_at` is returned."""
+    path = sentinel_path(save_path)
+    if not path.exists():
+        return None
+    text = path.read_text()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return {"downloaded_at": text.strip()}
+
+
+def file_sha256(path: Path | str) -> str:
+    """SHA-256 hex digest of the file at `path`"""
+    with open(path, "rb") as fp:
+        return hashlib.file_digest(fp, "sha256").hexdigest()
+
+
+def _is_intact(save_path: Path, sentinel: dict, verify_checksum: bool) -> bool:
+    """Checks the file on disk against what was recorded in its sentinel"""
+    expected_size = sentinel.get("size")
+    if expected_size is not None and save_path.stat().st_size != expected_size:
+        return False
+    if verify_checksum and sentinel.get("sha256"):
+        return file_sha256(save_path) == sentinel["sha256"]
+    return True
+
+
+def _probe_remote_file(session: requests.Session, url: str) -> RemoteFile:
+    """Asks the server for the size and ETag of `url` and whether it supports byte ranges. Uses a
+    one-byte range request since several of our sources redirect and do not answer HEAD reliably."""
+    response = session.get(
+        url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT_SECONDS
+    )
+    response.close()
+    response.raise_for_status()
+    etag = response.headers.get("ETag")
+    if response.status_code == 206:
+        # Content-Range: bytes 0-0/12345 (the total may be '*' if unknown)
+        total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+        size = int(total) if total.isdigit() else None
+        return RemoteFile(size=size, etag=etag, accepts_ranges=size is not None)
+    content_length = response.headers.get("Content-Length")
+    return RemoteFile(size=int(content_length) if content_length else None, etag=etag)
+
+
+def _plan_parts(remote: RemoteFile, part_size: int) -> List[Tuple[int, Optional[int]]]:
+    """Splits the file into inclusive (start, end) byte ranges. Files of unknown size or on servers
+    without range support are downloaded as a single part with an open end."""
+    if not remote.accepts_ranges or remote.size is None or remote.size <= part_size:
+        return [(0, remote.size - 1 if remote.size else None)]
+    return [
+        (start, min(start + part_size, remote.size) - 1)
+        for start in range(0, remote.size, part_size)
+    ]
+
+
+def _part_path(save_path: Path, idx: int) -> Path:
+    return save_path.parent / f"{save_path.name}.part{idx}"
+
+
+def _state_path(save_path: Path) -> Path:
+    return save_path.parent / f"{save_path.name}.resume"
+
+
+def _prepare_resume_state(save_path: Path, url: str, remote: RemoteFile, n_parts: int) -> None:
+    """Keeps previously downloaded parts only if they belong to the same remote file (url, size, ETag)
+    and were split the same way. Otherwise stale parts are removed."""
+    state_file = _state_path(save_path)
+    state = {"url": url, "size": remote.size, "etag": remote.etag, "parts": n_parts}
+    previous_state = json.loads(state_file.read_text()) if state_file.exists() else None
+    if previous_state != state or not remote.accepts_ranges:
+        for stale_part in save_path.parent.glob(f"{save_path.name}.part*"):
+            stale_part.unlink()
+    state_file.write_text(json.dumps(state))
+
+
+def _download_part(
+    session: requests.Session,
+    url: str,
+    part_path: Path,
+    byte_range: Tuple[int, Optional[int]],
+    remote: RemoteFile,
+    progress_bar: tqdm,
+    lock: threading.Lock,
+) -> None:
+    """Streams a single byte range of `url` to `part_path`, continuing from whatever is already in
+    `part_path` if the server supports ranges"""
+    start, end = byte_range
+    already_downloaded = part_path.stat().st_size if part_path.exists() else 0
+    if end is not None and already_downloaded == end - start + 1:
+        return
+
+    headers = {}
+    if remote.accepts_ranges:
+        headers["Range"] = f"bytes={start + already_downloaded}-{'' if end is None else end}"
+        if remote.etag:
+            headers["If-Range"] = remote.etag
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        if "Range" in headers and response.status_code != 206:
+            # the server ignored our range (e.g. the file changed underneath us)
+            if start != 0 or end != remote.size - 1:
+                raise IOError(f"Server ignored range request for {url}; cannot resume part.")
+            with lock:
+                progress_bar.update(-already_downloaded)
+            already_downloaded = 0
+        mode = "ab" if already_downloaded else "wb"
+        with open(part_path, mode) as file:
+            for data in response.iter_content(BUFFER_SIZE):
+                file.write(data)
+                with lock:
+                    progress_bar.update(len(data))
+
+
+def _assemble_parts(save_path: Path, n_parts: int) -> str:
+    """Concatenates downloaded parts into `save_path`, returning the SHA-256 of the result"""
+    if n_parts == 1:
+        _part_path(save_path, 0).replace(save_path)
+        return file_sha256(save_path)
+
+    digest = hashlib.sha256()
+    with open(save_path, "wb") as out:
+        for idx in range(n_parts):
+            part = _part_path(save_path, idx)
+            with open(part, "rb") as fp:
+                while data := fp.read(BUFFER_SIZE):
+                    digest.update(data)
+                    out.write(data)
+            part.unlink()
+    return digest.hexdigest()
+
+
+def download_uncached_file(
+    url: str,
+    save_path: Path | str,
+    force: bool = False,
+    max_workers: int = MAX_WORKERS,
+    part_size: int = PART_SIZE,
+    verify_checksum: bool = False,
+    session: Optional[requests.Session] = None,
+    show_progress: bool = True,
+) -> bool:
+    """Download helper to stream the contents of `url` to `save_path`.
     If `save_path` does not exist (including parent directories) on the filesystem, it will be created.
 
-    After downloading, this method creates a "{save_path}.sentinel" file to indicate that the
-    download was complete. If the sentinel file is not present, the download is assumed
-    to have been partial and the file is re-downloaded.
+    If the server supports HTTP ranges, files larger than `part_size` are split into byte ranges that are
+    downloaded concurrently over a pooled session (`max_workers` connections). Each range is streamed to a
+    "{save_path}.partN" file so that an interrupted download resumes where it left off on the next call,
+    provided the remote file (size, ETag) has not changed.
+
+    After downloading, this method creates a "{save_path}.sentinel" file recording the size, ETag and
+    SHA-256 of the download. If the sentinel file is not present or the file on disk does not match it,
+    the download is assumed to have been partial and the file is re-downloaded. With `verify_checksum`,
+    the SHA-256 of an existing file is recomputed and compared as well.
     """
 
     # assume save_path is a fully qualified filename x/y/z.ending
     if isinstance(save_path, str):
         save_path = Path(save_path)
     save_path.parent.mkdir(parents=True, exist_ok=True)
-    sentinel_file_path = save_path.parent / f"{save_path.name}.sentinel"
+    sentinel_file_path = sentinel_path(save_path)
 
     if not force:
         if save_path.exists():
-            if sentinel_file_path.exists():
+            sentinel = read_sentinel(save_path)
+            if sentinel is None:
+                logger.info("Sentinel not found! Re-downloading file...")
+            elif _is_intact(save_path, sentinel, verify_checksum):
                 logger.info(f"File {save_path} and sentinel exists - skipping download.")
                 return True
             else:
-                logger.info("Sentinel not found! Re-downloading file...")
+                logger.info(f"File {save_path} does not match its sentinel! Re-downloading file...")
 
-    # remove the file and its sentinel
+    # remove the file and its sentinel (but not partially downloaded parts, which may be resumed)
     save_path.unlink(missing_ok=True)
     sentinel_file_path.unlink(missing_ok=True)
-    response = requests.get(
-        url, stream=True, verify=False, timeout=10
-    )  # 10 second timeout for connect or read
-    total_size_in_bytes = int(response.headers.get("content-length", 0))
-    block_size = 1024  # 1 kb
-    progress_bar = tqdm(total=total_size_in_bytes, unit="iB", unit_scale=True)
-    with open(save_path, "wb") as file:
-        for data in response.iter_content(block_size):
-            progress_bar.update(len(data))
-            file.write(data)
+
+    session = session or create_session(max_workers)
+    remote = _probe_remote_file(session, url)
+    parts = _plan_parts(remote, part_size)
+    _prepare_resume_state(save_path, url, remote, len(parts))
+
+    already_downloaded = sum(
+        _part_path(save_path, idx).stat().st_size
+        for idx in range(len(parts))
+        if _part_path(save_path, idx).exists()
+    )
+    if already_downloaded:
+        logger.info(f"Resuming download of {save_path} from {already_downloaded} bytes")
+    progress_bar = tqdm(
+        total=remote.size,
+        initial=already_downloaded,
+        unit="iB",
+        unit_scale=True,
+        disable=not show_progress,
+    )
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(parts)))) as executor:
+        futures = [
+            executor.submit(
+                _download_part,
+                session,
+                url,
+                _part_path(save_path, idx),
+                byte_range,
+                remote,
+                progress_bar,
+                lock,
+            )
+            for idx, byte_range in enumerate(parts)
+        ]
+        for future in futures:
+            future.result()  # re-raise any download error
     progress_bar.close()
+
+    sha256 = _assemble_parts(save_path, len(parts))
+    size = save_path.stat().st_size
+    if remote.size is not None and size != remote.size:
+        raise IOError(f"Downloaded {size} bytes from {url} but expected {remote.size}!")
+    _state_path(save_path).unlink(missing_ok=True)
+
     with open(sentinel_file_path, "w") as fp:
-        fp.write(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        json.dump(
+            {
+                "url": url,
+                "size": size,
+                "etag": remote.etag,
+                "sha256": sha256,
+                "downloaded_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            fp,
+        )
 
     return True
@@ -0,0 +1,141 @@
+"""Terminal-to-terminal skim: the shortest path cost between every pair of a set of terminals of a graph.
+
+A skim is persisted as a directory of `.npy` files (plus a parquet table of the terminals), so that the cost
+matrix and the optional path edge lists can be memory-mapped and looked up without loading them or rerunning
+any shortest path search."""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ireiat.util.csr_graph import CSRGraph
+
+TERMINALS_FILE = "terminals.parquet"
+COST_FILE = "cost.npy"
+PATH_INDPTR_FILE = "path_indptr.npy"
+PATH_EDGES_FILE = "path_edges.npy"
+
+MmapMode = Literal["r+", "r", "w+", "c"]
+
+
+@dataclass
+class TerminalSkim:
+    """Shortest path costs between `terminals` (a table with a `vertex` column and any identifying columns).
+    `cost[i, j]` is the cost from terminal i to terminal j (inf if unreachable). If paths are kept, the edges of
+    the path from i to j, in order, are `path_edges[path_indptr[k]:path_indptr[k + 1]]` with k = i * n + j.
+    """
+
+    terminals: pd.DataFrame
+    cost: np.ndarray
+    path_indptr: Optional[np.ndarray] = None
+    path_edges: Optional[np.ndarray] = None
+
+    @property
+    def n_terminals(self) -> int:
+        return len(self.terminals)
+
+    @property
+    def has_paths(self) -> bool:
+        return self.path_indptr is not None
+
+    def path(self, origin: int, destination: int) -> np.ndarray:
+        """Edges (graph edge indices) of the path between the terminals at positions `origin` and
+        `destination`"""
+        if not self.has_paths:
+            raise ValueError("The skim was computed without path edges")
+        k = origin * self.n_terminals + destination
+        return self.path_edges[self.path_indptr[k] : self.path_indptr[k + 1]]
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.terminals.to_parquet(directory / TERMINALS_FILE)
+        np.save(directory / COST_FILE, self.cost)
+        for file_name, array in [
+            (PATH_INDPTR_FILE, self.path_indptr),
+            (PATH_EDGES_FILE, self.path_edges),
+        ]:
+            if array is not None:
+                np.save(directory / file_name, array)
+            else:
+                (directory / file_name).unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[MmapMode] = "r") -> "TerminalSkim":
+        """Reads a skim, memory-mapping its arrays unless `mmap_mode` is None"""
+        directory = Path(directory)
+        has_paths = (directory / PATH_INDPTR_FILE).exists()
+        return cls(
+            terminals=pd.read_parquet(directory / TERMINALS_FILE),
+            cost=np.load(directory / COST_FILE, mmap_mode=mmap_mode),
+            path_indptr=(
+                np.load(directory / PATH_INDPTR_FILE, mmap_mode=mmap_mode) if has_paths else None
+            ),
+            path_edges=(
+                np.load(directory / PATH_EDGES_FILE, mmap_mode=mmap_mode) if has_paths else None
+            ),
+        )
+
+
+def _tree_paths(
+    graph: CSRGraph, predecessors: np.ndarray, sources: np.ndarray, targets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Edges of the shortest path tree paths from each of `sources` (rows of `predecessors`) to each of
+    `targets`, as the number of edges of every (source, target) path and their concatenated edges in path
+    order"""
+    _, cheapest_edge = graph.pair_weights()
+    n_targets = len(targets)
+    path = np.arange(len(sources) * n_targets)
+    tree, node = path // n_targets, targets[path % n_targets].astype(np.int64)
+    walk_paths, walk_steps, walk_edges = [], [], []
+    step = 0
+    while len(path):
+        predecessor = predecessors[tree, node].astype(np.int64)
+        on_path = (predecessor >= 0) & (node != sources[tree])
+        path, tree, node, predecessor = (
+            path[on_path],
+            tree[on_path],
+            node[on_path],
+            predecessor[on_path],
+        )
+        walk_paths.append(path)
+        walk_steps.append(np.full(len(path), step))
+        walk_edges.append(cheapest_edge[graph.pair_index(predecessor, node)])
+        node = predecessor
+        step += 1
+
+    path_ids, steps, edges = (
+        np.concatenate(walk_paths),
+        np.concatenate(walk_steps),
+        np.concatenate(walk_edges),
+    )
+    order = np.lexsort((-steps, path_ids))  # paths were walked backwards from the targets
+    path_lengths = np.bincount(path_ids, minlength=len(sources) * n_targets)
+    return path_lengths, edges[order]
+
+
+def compute_terminal_skim(
+    graph: CSRGraph, terminals: pd.DataFrame, keep_path_edges: bool = False
+) -> TerminalSkim:
+    """Skim of the shortest path costs (edge weights of `graph`) between the `vertex` of every row of
+    `terminals`, computed with batched Dijkstra"""
+    vertices = terminals["vertex"].to_numpy().astype(np.int64)
+    n_terminals = len(vertices)
+    cost = np.full((n_terminals, n_terminals), np.inf)
+    path_lengths, path_edges = [], []
+    for batch_start, batch_vertices, distances, predecessors in graph.batched_dijkstra(vertices):
+        cost[batch_start : batch_start + len(batch_vertices)] = distances[:, vertices]
+        if keep_path_edges:
+            lengths, edges = _tree_paths(graph, predecessors, batch_vertices, vertices)
+            path_lengths.append(lengths)
+            path_edges.append(edges.astype(np.int32))
+
+    skim = TerminalSkim(terminals.reset_index(drop=True), cost)
+    if keep_path_edges:
+        all_path_lengths = np.concatenate(path_lengths) if path_lengths else np.zeros(0, np.int64)
+        skim.path_indptr = np.concatenate([[0], np.cumsum(all_path_lengths)]).astype(np.int64)
+        skim.path_edges = np.concatenate(path_edges) if path_edges else np.zeros(0, np.int32)
+    return skim
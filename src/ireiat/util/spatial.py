@@ -0,0 +1,127 @@
+"""Nearest neighbour search over latitude/longitude points by great circle (haversine) distance.
+
+Points are mapped to 3-D unit vectors and indexed with a scipy KD-tree. The straight line (chord) distance
+between two unit vectors, 2 * sin(angle / 2), increases with the great circle angle between them, so the
+Euclidean neighbours of the KD-tree are the haversine neighbours. Radii are converted to chords before a
+search and chord distances back to angles after it."""
+
+from typing import Literal, Tuple, overload
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def lat_long_radians_to_unit_vectors(lat_longs_radians: np.ndarray) -> np.ndarray:
+    """(n, 2) array of (latitude, longitude) in radians to an (n, 3) array of unit vectors"""
+    lat_longs_radians = np.atleast_2d(np.asarray(lat_longs_radians, dtype=np.float64))
+    latitude, longitude = lat_longs_radians[:, 0], lat_longs_radians[:, 1]
+    cos_latitude = np.cos(latitude)
+    return np.stack(
+        [cos_latitude * np.cos(longitude), cos_latitude * np.sin(longitude), np.sin(latitude)],
+        axis=1,
+    )
+
+
+def _angle_to_chord(angle: float) -> float:
+    return 2 * np.sin(min(angle, np.pi) / 2)
+
+
+def _chord_to_angle(chord: np.ndarray) -> np.ndarray:
+    return 2 * np.arcsin(np.minimum(chord, 2.0) / 2)
+
+
+def _object_array(arrays) -> np.ndarray:
+    """1-D object array holding each of `arrays` (as BallTree returns per-query results)"""
+    result = np.empty(len(arrays), dtype=object)
+    for i, array in enumerate(arrays):
+        result[i] = array
+    return result
+
+
+class HaversineKDTree:
+    """Drop-in for `sklearn.neighbors.BallTree(lat_longs_radians, metric="haversine")`: points and queries
+    are (latitude, longitude) in radians and distances are great circle angles in radians (multiply by
+    the earth's radius for a distance). Queries run on all cores."""
+
+    def __init__(self, lat_longs_radians: np.ndarray):
+        self.tree = cKDTree(lat_long_radians_to_unit_vectors(lat_longs_radians))
+
+    @property
+    def n_points(self) -> int:
+        return self.tree.n
+
+    @overload
+    def query(
+        self, lat_longs_radians: np.ndarray, k: int = ..., return_distance: Literal[True] = ...
+    ) -> Tuple[np.ndarray, np.ndarray]: ...
+
+    @overload
+    def query(
+        self, lat_longs_radians: np.ndarray, k: int, return_distance: Literal[False]
+    ) -> np.ndarray: ...
+
+    @overload
+    def query(
+        self, lat_longs_radians: np.ndarray, *, return_distance: Literal[False]
+    ) -> np.ndarray: ...
+
+    def query(
+        self, lat_longs_radians: np.ndarray, k: int = 1, return_distance: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray] | np.ndarray:
+        """The (at most) `k` nearest points of each query point, nearest first, as (n_queries, k) arrays of
+        distances and indices"""
+        k = min(k, self.n_points)
+        chords, indices = self.tree.query(
+            lat_long_radians_to_unit_vectors(lat_longs_radians), k=[*range(1, k + 1)], workers=-1
+        )
+        if return_distance:
+            return _chord_to_angle(chords), indices
+        return indices
+
+    @overload
+    def query_radius(
+        self,
+        lat_longs_radians: np.ndarray,
+        r: float,
+        return_distance: Literal[False] = ...,
+        sort_results: Literal[False] = ...,
+    ) -> np.ndarray: ...
+
+    @overload
+    def query_radius(
+        self,
+        lat_longs_radians: np.ndarray,
+        r: float,
+        return_distance: Literal[True],
+        sort_results: bool = ...,
+    ) -> Tuple[np.ndarray, np.ndarray]: ...
+
+    def query_radius(
+        self,
+        lat_longs_radians: np.ndarray,
+        r: float,
+        return_distance: bool = False,
+        sort_results: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray] | np.ndarray:
+        """The points within `r` radians of each query point, as object arrays of per-query index arrays (and
+        distance arrays if `return_distance`), nearest first if `sort_results`"""
+        if sort_results and not return_distance:
+            raise ValueError("return_distance must be True if sort_results is True")
+        vectors = lat_long_radians_to_unit_vectors(lat_longs_radians)
+        neighbours = self.tree.query_ball_point(vectors, r=_angle_to_chord(r), workers=-1)
+
+        n_neighbours = np.array([len(n) for n in neighbours], dtype=np.int64)
+        query_idx = np.repeat(np.arange(len(vectors)), n_neighbours)
+        point_idx = np.concatenate([*neighbours, []]).astype(np.int64)
+        distances = _chord_to_angle(
+            np.linalg.norm(self.tree.data[point_idx] - vectors[query_idx], axis=1)
+        )
+        if sort_results:
+            order = np.lexsort((distances, query_idx))
+            point_idx, distances = point_idx[order], distances[order]
+
+        splits = np.cumsum(n_neighbours)[:-1]
+        indices = _object_array(np.split(point_idx, splits))
+        if not return_distance:
+            return indices
+        return indices, _object_array(np.split(distances, splits))